@@ -7,29 +7,98 @@ Reconocimiento de voz médico con Azure Speech SDK y envío automático a Claude
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import tkinter.font
-import azure.cognitiveservices.speech as speechsdk
 import json
 import os
 import sys
 import time
 import threading
 import logging
+import logging.handlers
+import atexit
+import gzip
+import hashlib
+import io
+import shutil
 import queue
 import subprocess
 import re
+import math
+import bisect
+import sqlite3
+import unicodedata
+import traceback
+import signal
+import wave
+import mmap
+import itertools
+import argparse
+import abc
 import requests
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime
 from difflib import SequenceMatcher
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Azure Speech SDK: opcional para poder reproducir trazas sin conexión
+try:
+    import azure.cognitiveservices.speech as speechsdk
+except ImportError:
+    speechsdk = None
+
+# Dependencias opcionales de la captura de audio propia
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
 
 # ===== CONFIGURACIONES GLOBALES =====
 VERSION = "2.2.5"
 CONFIG_FILE = "voice_bridge_config.json"
-MEDICAL_TERMS_FILE = "medical_terms.json"
+SESSIONS_DIR = "sessions"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MEDICAL_TERMS_FILE = os.path.join(BASE_DIR, "medical_terms.json")
+TEMPLATES_DIR = os.path.join(BASE_DIR, "config", "plantillas")
+DICTIONARIES_DIR = os.path.join(BASE_DIR, "config", "diccionarios")
+NORMALIZATION_DIR = os.path.join(BASE_DIR, "config", "normalizacion")
+ARCHIVE_FILE = os.path.join(SESSIONS_DIR, "archive.sqlite3")
+TTS_CACHE_DIR = os.path.join("cache", "tts")
+CLAUDE_BASE_URL = "https://api.anthropic.com"
+LOG_GUI_MAX_LINES = 100
 
 
 # ===== CONFIGURACIÓN DE LOGGING =====
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+_log_listener = None
+
+
+def _gzip_namer(name):
+    """Nombre de los logs rotados (comprimidos)"""
+    return name + ".gz"
+
+
+def _gzip_rotator(source, dest):
+    """Comprimir el log rotado con gzip"""
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
 def setup_logger():
-    """Configurar logging del sistema"""
+    """Configurar logging del sistema
+
+    Los hilos solo encolan registros (QueueHandler); un QueueListener escribe en
+    consola y en un archivo con rotación por tamaño y compresión de los antiguos.
+    """
+    global _log_listener
     logger = logging.getLogger('VoiceBridge')
     logger.setLevel(logging.DEBUG)
 
@@ -38,9 +107,16 @@ def setup_logger():
         console_handler = logging.StreamHandler()
         console_handler.setLevel(logging.INFO)
 
-        # Handler para archivo
+        # Handler para archivo con rotación por tamaño
         os.makedirs('logs', exist_ok=True)
-        file_handler = logging.FileHandler(f'logs/voice_bridge_{datetime.now().strftime("%Y%m%d")}.log')
+        file_handler = logging.handlers.RotatingFileHandler(
+            f'logs/voice_bridge_{datetime.now().strftime("%Y%m%d")}.log',
+            maxBytes=LOG_MAX_BYTES,
+            backupCount=LOG_BACKUP_COUNT,
+            encoding='utf-8'
+        )
+        file_handler.namer = _gzip_namer
+        file_handler.rotator = _gzip_rotator
         file_handler.setLevel(logging.DEBUG)
 
         # Formato
@@ -48,20 +124,72 @@ def setup_logger():
         console_handler.setFormatter(formatter)
         file_handler.setFormatter(formatter)
 
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+        # Escritura asíncrona: los hilos solo encolan
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        _log_listener = logging.handlers.QueueListener(
+            log_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        _log_listener.start()
+        atexit.register(_log_listener.stop)
 
     return logger
 
 
+# ===== SINK DE LOG PARA LA GUI =====
+_EMOJI_RE = re.compile(
+    "[\U0001F000-\U0001FAFF\u2139\u2190-\u21FF\u2300-\u23FF\u2460-\u27BF"
+    "\u2B00-\u2BFF\uFE0F\u200D]+"
+)
+
+
+def strip_emojis(text):
+    """Eliminar emojis y símbolos gráficos de un mensaje"""
+    return _EMOJI_RE.sub('', text).strip()
+
+
+class LogRingBuffer:
+    """Buffer circular de mensajes de log sin bloqueos
+
+    ``append`` y ``popleft`` de ``deque`` son atómicos, así que cualquier hilo puede
+    escribir sin lock; la UI vacía el buffer en un temporizador. Si se llena, se
+    descartan los mensajes más antiguos.
+    """
+
+    def __init__(self, capacity=100):
+        self._messages = deque(maxlen=capacity)
+
+    def append(self, message):
+        """Añadir mensaje (desde cualquier hilo)"""
+        self._messages.append(message)
+
+    def drain(self):
+        """Extraer todos los mensajes pendientes en orden"""
+        messages = []
+        pop = self._messages.popleft
+        try:
+            while True:
+                messages.append(pop())
+        except IndexError:
+            pass
+        return messages
+
+
 # ===== INTEGRACIÓN CLAUDE =====
 class ClaudeIntegration:
-    """Integración con Claude API"""
+    """Integración con Claude API
+
+    ``base_url`` permite apuntar a un servidor compatible (p. ej. el sustituto local
+    de ``tools/anthropic_standin.py``); por defecto ``ANTHROPIC_BASE_URL`` o la API real.
+    """
 
-    def __init__(self, api_key=None, model="claude-3-sonnet-20240229"):
+    def __init__(self, api_key=None, model="claude-3-sonnet-20240229", base_url=None, timeout=30):
         self.api_key = api_key
         self.model = model
-        self.base_url = "https://api.anthropic.com/v1/messages"
+        base_url = base_url or os.environ.get('ANTHROPIC_BASE_URL') or CLAUDE_BASE_URL
+        self.base_url = base_url.rstrip('/')
+        self.messages_url = f"{self.base_url}/v1/messages"
+        self.timeout = timeout
         self.session = requests.Session()
         self.session.headers.update({
             "Content-Type": "application/json",
@@ -70,11 +198,19 @@ class ClaudeIntegration:
         if self.api_key:
             self.session.headers.update({"x-api-key": self.api_key})
 
+    @classmethod
+    def from_config(cls, config, api_key=None, base_url=None):
+        """Instancia con la clave, el modelo, la URL base y el timeout de la configuración"""
+        return cls(api_key if api_key is not None else config.get('claude_api_key'),
+                   model=config.get('claude_model', "claude-3-sonnet-20240229"),
+                   base_url=base_url if base_url is not None else config.get('claude_base_url'),
+                   timeout=config.get('claude_timeout', 30))
+
     def is_configured(self):
         """Verificar si Claude está configurado"""
         return bool(self.api_key)
 
-    def send_medical_text(self, text, context="transcription"):
+    def send_medical_text(self, text, context="transcription", timings=None):
         """Enviar texto médico a Claude"""
         if not self.is_configured():
             raise Exception("Claude API key no configurada")
@@ -92,9 +228,37 @@ class ClaudeIntegration:
 
         user_prompt = f"Analiza y mejora esta transcripción médica:\n\n{text}"
 
+        return self.send_prompt(system_prompt, user_prompt, timings=timings)
+
+    def complete_template_slots(self, slots, context):
+        """Generar solo los campos de una plantilla que requieren redacción"""
+        system_prompt = """Eres un asistente de patología que completa campos de informes.
+        Responde únicamente con una línea por campo, numerada igual que la lista recibida,
+        usando solo la información dictada. Si no hay información, escribe "No consignado"."""
+
+        numbered = "\n".join(f"{index}. {slot}" for index, slot in enumerate(slots, 1))
+        user_prompt = f"Dictado del caso:\n{context}\n\nCampos a completar:\n{numbered}"
+
+        reply = self.send_prompt(system_prompt, user_prompt, max_tokens=512)
+        values = {}
+        for line in reply.splitlines():
+            match = re.match(r'^\s*(\d+)[.)]\s*(.*)$', line)
+            if match:
+                values[int(match.group(1))] = match.group(2).strip()
+        return [values.get(index, "No consignado") for index in range(1, len(slots) + 1)]
+
+    def send_prompt(self, system_prompt, user_prompt, max_tokens=1024, timings=None):
+        """Enviar un prompt a Claude y devolver el texto de la respuesta
+
+        Si se pasa ``timings`` (dict) se rellena con ``start``, ``first_byte`` y ``end``
+        en ``perf_counter_ns``; el primer byte es la llegada de las cabeceras.
+        """
+        if not self.is_configured():
+            raise Exception("Claude API key no configurada")
+
         payload = {
             "model": self.model,
-            "max_tokens": 1024,
+            "max_tokens": max_tokens,
             "system": system_prompt,
             "messages": [
                 {
@@ -105,7 +269,12 @@ class ClaudeIntegration:
         }
 
         try:
-            response = self.session.post(self.base_url, json=payload, timeout=30)
+            start = time.perf_counter_ns()
+            response = self.session.post(self.messages_url, json=payload, timeout=self.timeout)
+            if timings is not None:
+                timings['start'] = start
+                timings['first_byte'] = start + int(response.elapsed.total_seconds() * 1e9)
+                timings['end'] = time.perf_counter_ns()
             response.raise_for_status()
 
             data = response.json()
@@ -232,17 +401,24 @@ class ThemeSystem:
                 "corrections": "Correcciones:",
                 "repetitions": "Repeticiones:",
                 "session_time": "Tiempo sesión:",
+                "latency": "Latencia p95:",
                 "claude_calls": "Llamadas Claude:",
                 "azure_config": "Configuración Azure",
                 "claude_config": "Configuración Claude",
                 "azure_key": "Clave API Azure:",
                 "claude_key": "Clave API Claude:",
+                "claude_base_url": "URL base (vacía = api.anthropic.com):",
                 "azure_region": "Región:",
                 "azure_language": "Idioma:",
                 "auto_send_claude": "Envío automático a Claude",
                 "test_connection": "Probar Conexión",
                 "save_config": "Guardar Configuración",
-                "cancel": "Cancelar"
+                "cancel": "Cancelar",
+                "search": "Buscar",
+                "profile": "Perfilar",
+                "profile_stop": "Detener perfil",
+                "search_title": "Buscar en sesiones anteriores",
+                "import_txt": "Importar .txt"
             }
         }
         return texts.get(self.current_language, texts["es"])
@@ -309,14 +485,443 @@ class MedicalCorrector:
         return corrected_text
 
 
+# ===== NORMALIZACIÓN DE FORMAS HABLADAS =====
+_ACCENTS = str.maketrans("áéíóúüÁÉÍÓÚÜ", "aeiouuAEIOUU")
+
+# Tablas por idioma (claves en minúsculas y sin tildes)
+NORMALIZATION_RULES = {
+    'es': {
+        'numbers': {
+            'cero': 0, 'un': 1, 'uno': 1, 'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4,
+            'cinco': 5, 'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10,
+            'once': 11, 'doce': 12, 'trece': 13, 'catorce': 14, 'quince': 15,
+            'dieciseis': 16, 'diecisiete': 17, 'dieciocho': 18, 'diecinueve': 19,
+            'veinte': 20, 'veintiun': 21, 'veintiuno': 21, 'veintiuna': 21, 'veintidos': 22,
+            'veintitres': 23, 'veinticuatro': 24, 'veinticinco': 25, 'veintiseis': 26,
+            'veintisiete': 27, 'veintiocho': 28, 'veintinueve': 29,
+            'treinta': 30, 'cuarenta': 40, 'cincuenta': 50, 'sesenta': 60,
+            'setenta': 70, 'ochenta': 80, 'noventa': 90,
+            'cien': 100, 'ciento': 100, 'doscientos': 200, 'doscientas': 200,
+            'trescientos': 300, 'trescientas': 300, 'cuatrocientos': 400, 'cuatrocientas': 400,
+            'quinientos': 500, 'quinientas': 500, 'seiscientos': 600, 'seiscientas': 600,
+            'setecientos': 700, 'setecientas': 700, 'ochocientos': 800, 'ochocientas': 800,
+            'novecientos': 900, 'novecientas': 900, 'mil': 1000,
+        },
+        # Números que solo se convierten con unidad o decimal ("un fragmento" no cambia)
+        'weak_numbers': ['un', 'una'],
+        'number_joiner': 'y',
+        'thousand': 'mil',
+        'decimal_words': ['punto', 'coma'],
+        'decimal_mark': '.',
+        # Conectores entre cantidades: "tres por dos" → "3 x 2"
+        'connectors': {'por': ' x '},
+        # Conectores que solo se aplican tras una palabra de contexto numérico
+        'context_connectors': {'mas': ' + ', 'igual a': ' = '},
+        'fraction_word': 'de',
+        # Palabras tras las que un número se escribe siempre en cifras
+        'numeric_context': ['grado', 'grados', 'nivel', 'estadio', 'tipo', 'gleason', 'clark',
+                            'frasco', 'bloque', 'lamina', 'fragmento'],
+        # Contextos en los que "N de M" se escribe como fracción
+        'fraction_context': ['grado', 'nivel'],
+        # Unidades (frases habladas → símbolo); un símbolo que empieza por % va pegado
+        'units': {
+            'por ciento': '%',
+            'centimetro': 'cm', 'centimetros': 'cm',
+            'centimetro cuadrado': 'cm²', 'centimetros cuadrados': 'cm²',
+            'centimetro cubico': 'cm³', 'centimetros cubicos': 'cm³',
+            'milimetro': 'mm', 'milimetros': 'mm',
+            'micra': 'µm', 'micras': 'µm', 'micrometro': 'µm', 'micrometros': 'µm',
+            'metro': 'm', 'metros': 'm',
+            'gramo': 'g', 'gramos': 'g', 'kilogramo': 'kg', 'kilogramos': 'kg',
+            'miligramo': 'mg', 'miligramos': 'mg',
+            'mililitro': 'mL', 'mililitros': 'mL',
+        },
+        'ordinals': {
+            'primer': '1.er', 'primero': '1.º', 'primera': '1.ª',
+            'segundo': '2.º', 'segunda': '2.ª',
+            'tercer': '3.er', 'tercero': '3.º', 'tercera': '3.ª',
+            'cuarto': '4.º', 'cuarta': '4.ª', 'quinto': '5.º', 'quinta': '5.ª',
+            'sexto': '6.º', 'sexta': '6.ª', 'septimo': '7.º', 'septima': '7.ª',
+            'octavo': '8.º', 'octava': '8.ª', 'noveno': '9.º', 'novena': '9.ª',
+            'decimo': '10.º', 'decima': '10.ª',
+        },
+        # Sustantivos ante los que un ordinal se escribe abreviado ("segundo fragmento")
+        'ordinal_nouns': ['fragmento', 'fragmentos', 'grado', 'nivel', 'espacio', 'cuadrante',
+                          'porcion', 'corte', 'bloque', 'lamina', 'muestra', 'frasco',
+                          'segmento', 'dedo', 'arco', 'costilla', 'vertebra', 'molar', 'premolar'],
+        # Los números sueltos a partir de este valor se escriben en cifras
+        'min_standalone': 10,
+    },
+}
+
+
+class SpokenFormNormalizer:
+    """Normalizador de formas habladas: números, medidas, unidades, porcentajes y ordinales
+
+    Las tablas del idioma se compilan al crear el objeto en un diccionario
+    palabra → clase, y ``normalize`` recorre los tokens una sola vez como un
+    autómata con lectura anticipada: cantidad [unidad] (por cantidad [unidad])*.
+    Solo se reescriben los tramos reconocidos; el resto del texto se copia tal cual.
+    Las tablas pueden ampliarse con ``config/normalizacion/<idioma>.json``.
+
+    Ejemplo: "tres por dos por uno punto cinco centímetros" → "3 x 2 x 1.5 cm"
+    """
+
+    TOKEN_RE = re.compile(r'\d+(?:[.,]\d+)?|\w+|[^\w\s]')
+    DIGITS_RE = re.compile(r'\d+(?:[.,]\d+)?$')
+
+    # Clases de palabra del autómata
+    NUMBER, DECIMAL, DIMENSION, ORDINAL, CONTEXT = range(5)
+
+    def __init__(self, language='es', rules_dir=NORMALIZATION_DIR):
+        if language not in NORMALIZATION_RULES:
+            raise ValueError(f"Idioma de normalización no soportado: {language}")
+        rules = {key: (dict(value) if isinstance(value, dict) else value)
+                 for key, value in NORMALIZATION_RULES[language].items()}
+        path = os.path.join(rules_dir, f"{language}.json") if rules_dir else None
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for key, value in json.load(f).items():
+                    if isinstance(rules.get(key), dict):
+                        rules[key].update(value)
+                    elif isinstance(rules.get(key), list):
+                        rules[key] = rules[key] + list(value)
+                    else:
+                        rules[key] = value
+        self.language = language
+        self.normalized = 0
+        self._compile(rules)
+
+    def _compile(self, rules):
+        """Compilar las tablas en estructuras de consulta O(1)"""
+        key = self.key
+        self.numbers = {key(word): value for word, value in rules['numbers'].items()}
+        self.weak_numbers = {key(word) for word in rules['weak_numbers']}
+        self.joiner = key(rules['number_joiner'])
+        self.thousand = key(rules['thousand'])
+        self.decimal_words = {key(word) for word in rules['decimal_words']}
+        self.decimal_mark = rules['decimal_mark']
+        self.connectors = self._phrase_table(rules['connectors'])
+        self.context_connectors = self._phrase_table(rules['context_connectors'])
+        self.fraction_word = key(rules['fraction_word'])
+        self.numeric_context = {key(word) for word in rules['numeric_context']}
+        self.fraction_context = {key(word) for word in rules['fraction_context']}
+        self.ordinals = {key(word): value for word, value in rules['ordinals'].items()}
+        self.ordinal_nouns = {key(word) for word in rules['ordinal_nouns']}
+        self.min_standalone = rules['min_standalone']
+
+        # Las unidades ya escritas como símbolo ("3 cm por 2 cm") también se reconocen
+        units = dict(rules['units'])
+        for symbol in set(units.values()):
+            units.setdefault(symbol, symbol)
+        self.units = self._phrase_table(units)
+
+    @classmethod
+    def _phrase_table(cls, phrases):
+        """Frases de varias palabras: primera palabra → [(resto, valor)] de mayor a menor"""
+        table = {}
+        for phrase, value in phrases.items():
+            words = tuple(cls.key(word) for word in phrase.split())
+            table.setdefault(words[0], []).append((words[1:], value))
+        for options in table.values():
+            options.sort(key=lambda option: len(option[0]), reverse=True)
+        return table
+
+    @staticmethod
+    def key(word):
+        return word.lower().translate(_ACCENTS)
+
+    @staticmethod
+    def _read_phrase(table, keys, position):
+        """Frase de ``table`` en ``position``: (valor, siguiente posición) o (None, posición)"""
+        if position >= len(keys):
+            return None, position
+        for rest, value in table.get(keys[position], ()):
+            end = position + 1 + len(rest)
+            if tuple(keys[position + 1:end]) == rest:
+                return value, end
+        return None, position
+
+    def normalize(self, text):
+        """Reescribir en forma escrita las cantidades habladas de ``text``"""
+        if not text:
+            return text
+        matches = list(self.TOKEN_RE.finditer(text))
+        keys = [self.key(match.group(0)) for match in matches]
+        pieces = []
+        copied = 0
+        i = 0
+        total = len(matches)
+        while i < total:
+            replacement = None
+            token = keys[i]
+            previous = keys[i - 1] if i else None
+
+            if token in self.ordinals and i + 1 < total and keys[i + 1] in self.ordinal_nouns:
+                replacement, end = self.ordinals[token], i + 1
+            elif token in self.numbers or self.DIGITS_RE.match(token):
+                replacement, end = self._read_measure(matches, keys, i, previous)
+
+            if replacement is None:
+                i += 1
+                continue
+            pieces.append(text[copied:matches[i].start()])
+            pieces.append(replacement)
+            copied = matches[end - 1].end()
+            self.normalized += 1
+            i = end
+
+        if not pieces:
+            return text
+        pieces.append(text[copied:])
+        return "".join(pieces)
+
+    def _read_measure(self, matches, keys, i, previous):
+        """Cantidad [unidad] (conector cantidad [unidad])* o fracción "N de M" desde ``i``"""
+        in_context = previous in self.numeric_context
+        pieces = []
+        parts = 0
+        convert = False
+        position = i
+        while True:
+            quantity = self._read_quantity(matches, keys, position)
+            if quantity is None:
+                break
+            value, position, weak, is_decimal, is_large = quantity
+            unit, position = self._read_phrase(self.units, keys, position)
+            if unit is None and weak and not is_decimal and not parts:
+                return None, i
+            convert = convert or unit is not None or is_decimal or is_large
+            if unit is None:
+                pieces.append(value)
+            elif unit.startswith('%'):
+                pieces.append(value + unit)
+            else:
+                pieces.append(f"{value} {unit}")
+            parts += 1
+
+            mark, after = self._read_phrase(self.connectors, keys, position)
+            if mark is None and in_context:
+                mark, after = self._read_phrase(self.context_connectors, keys, position)
+            if mark is None or after >= len(keys) or not self._starts_quantity(keys, after):
+                break
+            pieces.append(mark)
+            position = after
+
+        if not parts:
+            return None, i
+        if parts > 1:
+            return "".join(pieces), position
+
+        if in_context:
+            convert = True
+            # "grado dos de tres" → "grado 2/3"
+            if previous in self.fraction_context and position + 1 < len(keys) \
+                    and keys[position] == self.fraction_word \
+                    and self._starts_quantity(keys, position + 1):
+                denominator = self._read_quantity(matches, keys, position + 1)
+                if denominator is not None:
+                    return f"{pieces[0]}/{denominator[0]}", denominator[1]
+        if not convert:
+            return None, i
+        return pieces[0], position
+
+    def _starts_quantity(self, keys, position):
+        token = keys[position]
+        if token in self.numbers and token not in self.weak_numbers:
+            return True
+        return bool(self.DIGITS_RE.match(token))
+
+    def _read_quantity(self, matches, keys, position):
+        """(texto, siguiente posición, débil, decimal, >= min_standalone) o None"""
+        number = self._read_number(matches, keys, position)
+        if number is None:
+            return None
+        value, end = number
+        weak = end == position + 1 and keys[position] in self.weak_numbers
+        text = str(value) if not isinstance(value, str) else value
+
+        # Parte decimal: "uno punto cinco", "cero coma cero cinco"
+        has_decimals = '.' in text or ',' in text
+        if end + 1 < len(keys) and keys[end] in self.decimal_words and not has_decimals:
+            digits = []
+            cursor = end + 1
+            while cursor < len(keys):
+                group = self._read_number(matches, keys, cursor)
+                if group is None or isinstance(group[0], str):
+                    break
+                digits.append(str(group[0]))
+                cursor = group[1]
+            if digits:
+                return text + self.decimal_mark + "".join(digits), cursor, False, True, True
+        is_large = isinstance(value, str) or value >= self.min_standalone
+        return text, end, weak, False, is_large
+
+    def _read_number(self, matches, keys, position):
+        """Número cardinal (valor, siguiente posición) en palabras o cifras, o None"""
+        token = keys[position]
+        if self.DIGITS_RE.match(token):
+            digits = matches[position].group(0)
+            if digits.isdigit():
+                return int(digits), position + 1
+            return digits.replace(',', self.decimal_mark), position + 1
+        if token not in self.numbers:
+            return None
+
+        total = 0
+        current = 0
+        last = None
+        end = position
+        while end < len(keys):
+            token = keys[end]
+            if token == self.joiner:
+                # "treinta y dos": la conjunción solo une decenas con unidades
+                if not (30 <= self.numbers.get(last, 0) <= 90 and end + 1 < len(keys)
+                        and 1 <= self.numbers.get(keys[end + 1], 0) <= 9):
+                    break
+            elif token == self.thousand:
+                if total:
+                    break
+                total = max(current, 1) * 1000
+                current = 0
+            elif token in self.numbers:
+                value = self.numbers[token]
+                if value == 0:
+                    # "cero" siempre es un número por sí solo
+                    if end == position:
+                        end += 1
+                    break
+                if value >= 100:
+                    if current:
+                        break
+                elif value >= 30 and value % 10 == 0:
+                    if current % 100:
+                        break
+                elif current % 100 and last != self.joiner:
+                    break
+                current += value
+            else:
+                break
+            last = token
+            end += 1
+        return total + current, end
+
+
+# ===== RESCORING DE HIPÓTESIS N-BEST =====
+class HypothesisRescorer:
+    """Reordenación local de la lista N-best del reconocedor
+
+    Cada hipótesis se puntúa como su confianza más la fracción de palabras que
+    pertenecen al léxico de patología y la fracción de bigramas conocidos (del
+    léxico y de lo ya dictado en la sesión). Las palabras se comparan con
+    operaciones de conjunto, de modo que puntuar una lista de 5 hipótesis cuesta
+    decenas de microsegundos.
+    """
+
+    WORD_RE = re.compile(r'\w+')
+    MIN_LEXICON_WORD = 4
+    MAX_LEARNED_BIGRAMS = 50000
+
+    def __init__(self, lexicon_weight=0.15, bigram_weight=0.15, confidence_threshold=0.0):
+        self.lexicon_weight = lexicon_weight
+        self.bigram_weight = bigram_weight
+        self.confidence_threshold = confidence_threshold
+        self.vocabulary = set()
+        self.bigrams = set()
+        self.rescored = 0
+        self.reordered = 0
+        self.rejected = 0
+
+    def tokens(self, text):
+        return self.WORD_RE.findall(text.lower().translate(_ACCENTS))
+
+    def add_phrases(self, phrases):
+        """Incorporar frases al léxico (palabras y bigramas)"""
+        for phrase in phrases:
+            words = self.tokens(phrase)
+            self.vocabulary.update(word for word in words if len(word) >= self.MIN_LEXICON_WORD)
+            self.bigrams.update(zip(words, words[1:]))
+
+    def load_dictionaries(self, directory=DICTIONARIES_DIR):
+        """Cargar las frases de los diccionarios personalizados (*.txt)"""
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.txt'):
+                continue
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                self.add_phrases(line.strip() for line in f
+                                 if line.strip() and not line.startswith('#'))
+
+    def learn(self, text):
+        """Aprender los bigramas de una frase aceptada"""
+        if len(self.bigrams) < self.MAX_LEARNED_BIGRAMS:
+            words = self.tokens(text)
+            self.bigrams.update(zip(words, words[1:]))
+
+    def score(self, text, confidence):
+        words = self.tokens(text)
+        if not words:
+            return confidence
+        lexicon = sum(1 for word in words if word in self.vocabulary) / len(words)
+        pairs = set(zip(words, words[1:]))
+        bigrams = len(pairs & self.bigrams) / len(pairs) if pairs else 0.0
+        return confidence + self.lexicon_weight * lexicon + self.bigram_weight * bigrams
+
+    def choose(self, hypotheses):
+        """Mejor hipótesis de [(texto, confianza, palabras)] o None si ninguna supera el umbral
+
+        El umbral se aplica a cada hipótesis antes de reordenar: el léxico puede
+        elegir entre las que lo superan, pero no rescatar una por debajo de él.
+        """
+        if not hypotheses:
+            return None
+        self.rescored += 1
+        candidates = [index for index, hypothesis in enumerate(hypotheses)
+                      if hypothesis[1] >= self.confidence_threshold]
+        if not candidates:
+            self.rejected += 1
+            return None
+        best = max(candidates, key=lambda index: self.score(*hypotheses[index][:2]))
+        hypothesis = hypotheses[best]
+        if best:
+            self.reordered += 1
+        self.learn(hypothesis[0])
+        return hypothesis
+
+    @staticmethod
+    def parse_nbest(result_json):
+        """Lista [(texto, confianza, palabras)] del JSON detallado del SDK (vacía si no hay N-best)
+
+        ``palabras`` es [(palabra, offset_ms, duración_ms)] cuando se pidieron marcas
+        de tiempo por palabra, o None.
+        """
+        try:
+            data = json.loads(result_json) if result_json else {}
+        except ValueError:
+            return []
+        hypotheses = []
+        for entry in data.get('NBest') or []:
+            text = entry.get('Display') or entry.get('ITN') or entry.get('Lexical')
+            if not text:
+                continue
+            # El SDK expresa offsets y duraciones en unidades de 100 ns
+            words = [(word.get('Word', ''), word.get('Offset', 0) // 10000,
+                      word.get('Duration', 0) // 10000)
+                     for word in entry.get('Words') or []] or None
+            hypotheses.append((text, float(entry.get('Confidence', 0.0)), words))
+        return hypotheses
+
+
 # ===== DETECTOR DE REPETICIONES =====
 class RepetitionDetector:
     """Detector de frases repetidas"""
 
-    def __init__(self):
+    def __init__(self, window=10):
         self.recent_phrases = []
         self.repetitions_found = 0
         self.similarity_threshold = 0.8
+        self.window = window
 
     def is_repetition(self, new_phrase):
         """Verificar si la frase es una repetición"""
@@ -329,46 +934,3644 @@ class RepetitionDetector:
                 self.repetitions_found += 1
                 return True
 
-        # Agregar frase a la lista (mantener solo las últimas 10)
+        # Agregar frase a la lista (mantener solo las últimas ``window``)
         self.recent_phrases.append(new_phrase)
-        if len(self.recent_phrases) > 10:
+        if len(self.recent_phrases) > self.window:
             self.recent_phrases.pop(0)
 
         return False
 
 
+# ===== REGISTRO DE MÉTRICAS =====
+class Counter:
+    """Contador monotónico
+
+    Cada métrica lleva su propio lock (un incremento es una sección crítica de dos
+    sumas) y un número de versión que la UI compara para repintar solo lo que cambió.
+    """
+
+    kind = 'counter'
+    __slots__ = ('name', 'help', 'value', 'version', '_lock')
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if amount:
+            with self._lock:
+                self.value += amount
+                self.version += 1
+
+
+class Gauge(Counter):
+    """Valor instantáneo; solo cambia de versión si cambia el valor"""
+
+    kind = 'gauge'
+    __slots__ = ()
+
+    def set(self, value):
+        if value != self.value:
+            with self._lock:
+                self.value = value
+                self.version += 1
+
+
+class Histogram:
+    """Histograma de cubetas fijas en un array de enteros
+
+    ``observe`` es una bisección sobre los límites y un incremento; las cubetas no
+    son acumulativas en memoria (se acumulan al exportar, como pide Prometheus).
+    """
+
+    kind = 'histogram'
+    __slots__ = ('name', 'help', 'bounds', 'counts', 'sum', 'version', '_lock')
+
+    def __init__(self, name, help='', buckets=()):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(sorted(buckets))
+        self.counts = array('q', [0] * (len(self.bounds) + 1))
+        self.sum = 0.0
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    @property
+    def value(self):
+        return self.count
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.version += 1
+
+    def cumulative(self):
+        """[(límite, observaciones <= límite)] terminando en +Inf"""
+        with self._lock:
+            counts = list(self.counts)
+        return list(zip(self.bounds + (math.inf,), itertools.accumulate(counts)))
+
+    def quantile(self, q):
+        """Estimación del cuantil ``q`` (límite superior de la cubeta que lo contiene)"""
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank and total:
+                return bound
+        return None
+
+
+class MetricsRegistry:
+    """Registro de métricas de la sesión (contadores, medidores e histogramas)
+
+    Cualquier hilo actualiza sus métricas sin pasar por un lock global; el registro
+    solo se bloquea al crear métricas. Se exporta en formato de texto de Prometheus
+    y como diccionario para los resúmenes.
+    """
+
+    def __init__(self, prefix='voicebridge'):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif type(metric) is not cls:
+                raise ValueError(f"Métrica {name} ya registrada como {metric.kind}")
+            return metric
+
+    def counter(self, name, help=''):
+        return self._get_or_create(Counter, name, help)
+
+    def gauge(self, name, help=''):
+        return self._get_or_create(Gauge, name, help)
+
+    def histogram(self, name, help='', buckets=()):
+        return self._get_or_create(Histogram, name, help, buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def __iter__(self):
+        return iter(list(self._metrics.values()))
+
+    def snapshot(self):
+        """{nombre: valor}, o {le: n, sum, count} para los histogramas"""
+        result = {}
+        for metric in self:
+            if metric.kind == 'histogram':
+                buckets = metric.cumulative()
+                result[metric.name] = {'buckets': {('+Inf' if bound == math.inf else bound): n
+                                                   for bound, n in buckets},
+                                       'sum': metric.sum, 'count': buckets[-1][1]}
+            else:
+                result[metric.name] = metric.value
+        return result
+
+    def render_prometheus(self):
+        """Texto de exposición de Prometheus (versión 0.0.4)"""
+        lines = []
+        for metric in self:
+            name = f"{self.prefix}_{metric.name}"
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            if metric.kind == 'histogram':
+                buckets = metric.cumulative()
+                for bound, n in buckets:
+                    le = '+Inf' if bound == math.inf else repr(float(bound))
+                    lines.append(f'{name}_bucket{{le="{le}"}} {n}')
+                lines.append(f"{name}_sum {metric.sum}")
+                lines.append(f"{name}_count {buckets[-1][1]}")
+            else:
+                lines.append(f"{name} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+
+class StatsView:
+    """Vista de diccionario sobre el registro: ``stats['phrases_count']`` sigue funcionando
+
+    Leer devuelve el valor actual de la métrica. Asignar a un medidor fija su valor;
+    en un contador solo puede subir y se aplica como incremento, de modo que
+    ``stats['phrases_count'] += 1`` sigue funcionando.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def __getitem__(self, name):
+        metric = self.registry.get(name)
+        if metric is None:
+            raise KeyError(name)
+        return metric.value
+
+    def __setitem__(self, name, value):
+        metric = self.registry.get(name)
+        if metric is None:
+            raise KeyError(name)
+        if metric.kind == 'gauge':
+            metric.set(value)
+        elif metric.kind == 'counter':
+            amount = value - metric.value
+            if amount < 0:
+                raise ValueError(f"{name} es un contador: no puede bajar "
+                                 f"de {metric.value} a {value}")
+            metric.inc(amount)
+        else:
+            raise TypeError(f"{name} es un {metric.kind}: no se puede asignar")
+
+    def __contains__(self, name):
+        return self.registry.get(name) is not None
+
+    def __iter__(self):
+        return (metric.name for metric in self.registry if metric.kind != 'histogram')
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(name, self[name]) for name in self]
+
+
+class MetricsExporter:
+    """Endpoint HTTP local de Prometheus e instantáneas periódicas a archivo
+
+    El servidor escucha solo en 127.0.0.1 (``port`` 0 lo desactiva); la instantánea
+    se escribe en formato de texto de Prometheus con reemplazo atómico, de modo que
+    un colector de archivos nunca lee un fichero a medias.
+    """
+
+    def __init__(self, registry, port=0, snapshot_path=None, interval=60.0, logger=None):
+        self.registry = registry
+        self.port = port
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.logger = logger or logging.getLogger('VoiceBridge')
+        self.server = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.port:
+            registry = self.registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = registry.render_prometheus().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+                self.server.daemon_threads = True
+                threading.Thread(target=self.server.serve_forever, name='metrics-http',
+                                 daemon=True).start()
+                port = self.server.server_address[1]
+                self.logger.info(f"Métricas en http://127.0.0.1:{port}/metrics")
+            except OSError as e:
+                self.logger.error(
+                    f"Endpoint de métricas no disponible en el puerto {self.port}: {e}")
+                self.server = None
+
+        if self.snapshot_path and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        if not self.snapshot_path:
+            return
+        try:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = self.snapshot_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(self.registry.render_prometheus())
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            self.logger.error(f"Error escribiendo instantánea de métricas: {e}")
+
+    def stop(self):
+        """Detener el servidor y escribir la última instantánea"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.write_snapshot()
+
+
 # ===== COLECTOR DE ESTADÍSTICAS =====
-class StatsCollector:
-    """Colector de estadísticas de sesión"""
+PHRASE_WORD_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0)
 
-    def __init__(self):
+
+class StatsCollector:
+    """Colector de estadísticas de sesión sobre un ``MetricsRegistry``
+
+    ``stats`` conserva la interfaz de diccionario de siempre (``stats['claude_calls']``).
+    Cada métrica se actualiza siempre con su propio lock, venga de ``update``, de
+    ``stats[...] += n`` o de ``inc`` directo, así que nunca se mezclan esquemas.
+    """
+
+    COUNTERS = (
+        ('phrases_count', "Frases transcritas"),
+        ('words_count', "Palabras transcritas"),
+        ('corrections_applied', "Correcciones médicas aplicadas"),
+        ('repetitions_detected', "Repeticiones descartadas"),
+        ('claude_calls', "Llamadas a Claude"),
+        ('chars_transcribed', "Caracteres transcritos"),
+    )
+
+    def __init__(self, registry=None):
         self.session_start = time.time()
-        self.stats = {
-            'phrases_count': 0,
-            'words_count': 0,
-            'corrections_applied': 0,
-            'repetitions_detected': 0,
-            'claude_calls': 0,
-            'session_duration': 0,
-            'chars_transcribed': 0
-        }
+        self.metrics = registry if registry is not None else MetricsRegistry()
+        (self._phrases, self._words, self._corrections, self._repetitions, self._claude_calls,
+         self._chars) = (self.metrics.counter(name, help) for name, help in self.COUNTERS)
+        self._duration = self.metrics.gauge('session_duration',
+                                            "Duración de la sesión en segundos")
+        self.phrase_words = self.metrics.histogram('phrase_words', "Palabras por frase",
+                                                   PHRASE_WORD_BUCKETS)
+        self.display_latency = self.metrics.histogram(
+            'display_latency_seconds', "Latencia de resultado reconocido a texto visible",
+            LATENCY_BUCKETS)
+        self.claude_latency = self.metrics.histogram(
+            'claude_request_seconds', "Duración de las peticiones a Claude", LATENCY_BUCKETS)
+        self.stats = StatsView(self.metrics)
 
     def update(self, phrase=None, corrections=0, is_repetition=False, claude_call=False):
-        """Actualizar estadísticas"""
+        """Actualizar estadísticas (seguro entre hilos)"""
         if phrase:
-            self.stats['phrases_count'] += 1
-            self.stats['words_count'] += len(phrase.split())
-            self.stats['chars_transcribed'] += len(phrase)
+            words = len(phrase.split())
+            self._phrases.inc()
+            self._words.inc(words)
+            self._chars.inc(len(phrase))
+            self.phrase_words.observe(words)
 
-        self.stats['corrections_applied'] += corrections
+        if corrections:
+            self._corrections.inc(corrections)
 
         if is_repetition:
-            self.stats['repetitions_detected'] += 1
+            self._repetitions.inc()
 
         if claude_call:
-            self.stats['claude_calls'] += 1
+            self._claude_calls.inc()
+
+    def tick(self):
+        """Actualizar la duración de la sesión (solo cambia de versión cada segundo)"""
+        self._duration.set(int(time.time() - self.session_start))
+
+
+# ===== MODELO DE TRANSCRIPCIÓN =====
+class WordTimings:
+    """Tiempos de palabra de un segmento en arrays compactos
+
+    ``char_starts`` es la posición de cada palabra en el texto corregido del
+    segmento; ``offsets`` y ``durations`` están en milisegundos desde el inicio del
+    flujo de audio del reconocedor. Las búsquedas son bisecciones O(log n).
+    """
+
+    __slots__ = ('char_starts', 'offsets', 'durations')
+
+    TOKEN_RE = re.compile(r'\d+(?:[.,]\d+)?|\w+')
+    SEARCH_WINDOW = 4
+
+    def __init__(self, char_starts=(), offsets=(), durations=()):
+        self.char_starts = array('l', char_starts)
+        self.offsets = array('q', offsets)
+        self.durations = array('l', durations)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def extend(self, other, char_shift=0):
+        """Añadir los tiempos de otro tramo desplazando sus posiciones de texto"""
+        self.char_starts.extend(start + char_shift for start in other.char_starts)
+        self.offsets.extend(other.offsets)
+        self.durations.extend(other.durations)
+
+    def at_position(self, position):
+        """(offset_ms, duración_ms) de la palabra en la posición ``position`` del texto"""
+        if not self.offsets:
+            return None
+        index = max(0, bisect.bisect_right(self.char_starts, position) - 1)
+        # Varias palabras habladas pueden compartir posición ("uno punto cinco" → "1.5")
+        index = bisect.bisect_left(self.char_starts, self.char_starts[index])
+        return self.offsets[index], self.durations[index]
+
+    def position_at(self, offset_ms):
+        """Posición en el texto de la palabra que suena en ``offset_ms``"""
+        if not self.offsets:
+            return None
+        index = max(0, bisect.bisect_right(self.offsets, offset_ms) - 1)
+        return self.char_starts[index]
+
+    def to_dict(self):
+        return {'c': self.char_starts.tolist(), 'o': self.offsets.tolist(),
+                'd': self.durations.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return None
+        return cls(data['c'], data['o'], data['d'])
+
+    @classmethod
+    def align(cls, text, words):
+        """Alinear palabras habladas [(palabra, offset_ms, duración_ms)] con el texto escrito
+
+        Las palabras que coinciden con un token del texto sirven de anclas; las que
+        la corrección o la normalización reescribieron ("tres por dos" → "3 x 2")
+        se reparten entre los tokens que quedan entre dos anclas.
+        """
+        tokens = [(match.start(), match.group(0).lower().translate(_ACCENTS))
+                  for match in cls.TOKEN_RE.finditer(text)]
+        keys = [word.lower().translate(_ACCENTS) for word, _, _ in words]
+        anchors = [(-1, -1)]
+        cursor = 0
+        for index, key in enumerate(keys):
+            for ahead in range(cursor, min(cursor + cls.SEARCH_WINDOW, len(tokens))):
+                if tokens[ahead][1] == key:
+                    anchors.append((index, ahead))
+                    cursor = ahead + 1
+                    break
+        anchors.append((len(words), len(tokens)))
+
+        token_of = [0] * len(words)
+        for (word_a, token_a), (word_b, token_b) in zip(anchors, anchors[1:]):
+            if word_a >= 0:
+                token_of[word_a] = token_a
+            gap_words = word_b - word_a - 1
+            gap_tokens = token_b - token_a - 1
+            for offset in range(gap_words):
+                if gap_tokens > 0:
+                    token_of[word_a + 1 + offset] = token_a + 1 + offset * gap_tokens // gap_words
+                else:
+                    token_of[word_a + 1 + offset] = min(max(token_b, 0), len(tokens) - 1)
+
+        timings = cls()
+        if not tokens:
+            return timings
+        for (_, offset, duration), token in zip(words, token_of):
+            timings.char_starts.append(tokens[token][0])
+            timings.offsets.append(offset)
+            timings.durations.append(duration)
+        return timings
+
+
+class TranscriptSegment:
+    """Segmento de transcripción (texto reconocido, corregido y respuesta de Claude)"""
+
+    __slots__ = ('segment_id', 'started_at', 'ended_at', 'raw_text', 'corrected_text',
+                 'claude_reply', 'replied_at', 'phrase_ids', 'timings')
+
+    def __init__(self, raw_text, corrected_text, started_at=None, ended_at=None,
+                 claude_reply=None, replied_at=None, segment_id=None, phrase_ids=None,
+                 timings=None):
+        now = time.time()
+        self.segment_id = segment_id
+        self.started_at = started_at if started_at is not None else now
+        self.ended_at = ended_at if ended_at is not None else self.started_at
+        self.raw_text = raw_text
+        self.corrected_text = corrected_text
+        self.claude_reply = claude_reply
+        self.replied_at = replied_at
+        self.phrase_ids = phrase_ids
+        self.timings = timings
+
+    def to_dict(self):
+        data = {slot: getattr(self, slot) for slot in self.__slots__}
+        data['timings'] = self.timings.to_dict() if self.timings else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        fields = {slot: data.get(slot) for slot in cls.__slots__}
+        fields['timings'] = WordTimings.from_dict(fields['timings'])
+        return cls(**fields)
+
+    def audio_time(self, position):
+        """(offset_ms, duración_ms) del audio de la palabra en ``position`` del texto corregido"""
+        return self.timings.at_position(position) if self.timings else None
+
+    def render(self):
+        """Texto del segmento tal como se muestra en la transcripción"""
+        if not self.corrected_text:
+            return ""
+        timestamp = datetime.fromtimestamp(self.ended_at).strftime("%H:%M:%S")
+        return f"[{timestamp}] {self.corrected_text}\n\n"
+
+    def render_reply(self):
+        """Respuesta de Claude tal como se muestra en su panel"""
+        if not self.claude_reply:
+            return ""
+        timestamp = datetime.fromtimestamp(self.replied_at or self.ended_at).strftime("%H:%M:%S")
+        return f"[{timestamp}] {self.claude_reply}\n\n"
+
+
+class SegmentSpillStore:
+    """Almacén en disco (JSONL) de los segmentos expulsados de memoria
+
+    Solo se añade al final; un índice de offsets permite recargar cualquier
+    segmento con un ``seek``. Si un segmento ya expulsado cambia (respuesta de
+    Claude tardía) se escribe una nueva versión y se actualiza su offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'w+b')
+        self.offsets = array('q')
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def write(self, segment):
+        """Guardar un segmento (nuevo o nueva versión)"""
+        line = json.dumps(segment.to_dict(), ensure_ascii=False).encode('utf-8') + b"\n"
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(line)
+            if segment.segment_id < len(self.offsets):
+                self.offsets[segment.segment_id] = offset
+            else:
+                self.offsets.append(offset)
+
+    def read_range(self, start, stop):
+        """Recargar los segmentos [start, stop)"""
+        segments = []
+        with self._lock:
+            self._file.flush()
+            for index in range(start, min(stop, len(self.offsets))):
+                self._file.seek(self.offsets[index])
+                segments.append(TranscriptSegment.from_dict(json.loads(self._file.readline())))
+        return segments
+
+    def close(self, remove=True):
+        with self._lock:
+            self._file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class TranscriptModel:
+    """Lista de segmentos de la sesión con memoria acotada
+
+    Solo los ``memory_limit`` segmentos más recientes viven en memoria; los
+    anteriores se vuelcan a un ``SegmentSpillStore`` y se recargan bajo demanda.
+    """
+
+    def __init__(self, spill_dir=SESSIONS_DIR, memory_limit=200):
+        self.spill_dir = spill_dir
+        self.memory_limit = max(2, memory_limit)
+        self._lock = threading.RLock()
+        self._open_store()
+
+    def _open_store(self):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.spill_dir, f"transcript_{stamp}_{os.getpid()}.spill.jsonl")
+        self.store = SegmentSpillStore(path)
+        self.segments = []
+        self.first_in_memory = 0
+
+    def __len__(self):
+        with self._lock:
+            return self.first_in_memory + len(self.segments)
+
+    def append(self, segment):
+        """Añadir un segmento y asignarle su id (índice global)"""
+        with self._lock:
+            segment.segment_id = len(self)
+            self.segments.append(segment)
+            if len(self.segments) > self.memory_limit:
+                # Volcar la mitad más antigua de una vez para amortizar la escritura
+                count = len(self.segments) - self.memory_limit // 2
+                for old in self.segments[:count]:
+                    self.store.write(old)
+                del self.segments[:count]
+                self.first_in_memory += count
+        return segment
+
+    def set_claude_reply(self, segment, reply):
+        """Asociar la respuesta de Claude a un segmento"""
+        with self._lock:
+            segment.claude_reply = reply
+            segment.replied_at = time.time()
+            if segment.segment_id is not None and segment.segment_id < self.first_in_memory:
+                self.store.write(segment)
+
+    def range(self, start, stop):
+        """Segmentos [start, stop), recargando de disco los expulsados"""
+        with self._lock:
+            stop = min(stop, len(self))
+            result = []
+            if start < self.first_in_memory:
+                result.extend(self.store.read_range(start, min(stop, self.first_in_memory)))
+            if stop > self.first_in_memory:
+                first = self.first_in_memory
+                result.extend(self.segments[max(0, start - first):stop - first])
+            return result
+
+    def iter_all(self, page_size=500):
+        """Recorrer todos los segmentos por páginas"""
+        for start in range(0, len(self), page_size):
+            yield from self.range(start, start + page_size)
+
+    def full_text(self):
+        """Texto corregido completo de la sesión"""
+        return "\n".join(seg.corrected_text for seg in self.iter_all() if seg.corrected_text)
+
+    def clear(self):
+        """Vaciar el modelo y empezar un almacén nuevo"""
+        with self._lock:
+            self.store.close()
+            self._open_store()
+
+    def close(self):
+        with self._lock:
+            self.store.close()
+
+
+class TranscriptView:
+    """Vista con ventana del modelo: el widget solo contiene ``max_segments`` segmentos
+
+    Al llegar arriba del todo se cargan páginas anteriores del modelo (y de disco);
+    al volver abajo se recargan las siguientes. Se ejecuta en el hilo de Tk.
+    """
+
+    def __init__(self, widget, model, max_segments=100, page_size=25):
+        self.widget = widget
+        self.model = model
+        self.max_segments = max_segments
+        self.page_size = page_size
+        self.start = 0
+        self.end = 0
+        self.line_counts = deque()
+        self.following = True
+        self._loading = False
+        widget.configure(yscrollcommand=self._on_scroll)
+
+    def append(self, segments):
+        """Añadir segmentos nuevos si la vista sigue la cola de la sesión"""
+        last_id = max(seg.segment_id for seg in segments)
+        if not self.following or last_id < self.end:
+            return
+        # Se lee del modelo para cubrir segmentos añadidos desde otros hilos
+        self._insert_bottom(self.model.range(self.end, last_id + 1))
+        self._trim_top()
+        self.widget.see(tk.END)
+
+    def reset(self):
+        self.widget.delete(1.0, tk.END)
+        self.line_counts.clear()
+        self.start = self.end = len(self.model)
+        self.following = True
+
+    def show_tail(self):
+        """Mostrar los últimos segmentos del modelo (p. ej. tras recuperar una sesión)"""
+        self.reset()
+        self.start = self.end = max(0, len(self.model) - self.max_segments)
+        self._insert_bottom(self.model.range(self.end, len(self.model)))
+        self.widget.see(tk.END)
+
+    def locate(self, index):
+        """(segmento, posición en su texto corregido) para un índice "línea.columna" del widget"""
+        line, column = (int(part) for part in self.widget.index(index).split('.'))
+        first_line = 1
+        for offset, count in enumerate(self.line_counts):
+            if line < first_line + count:
+                segments = self.model.range(self.start + offset, self.start + offset + 1)
+                if not segments:
+                    return None
+                segment = segments[0]
+                lines = segment.render().split('\n')
+                position = sum(len(text) + 1 for text in lines[:line - first_line]) + column
+                # El texto se muestra tras el prefijo "[HH:MM:SS] "
+                prefix = len(segment.render()) - len(segment.corrected_text) - 2
+                return segment, max(0, position - prefix)
+            first_line += count
+        return None
+
+    def _insert_bottom(self, segments):
+        if not segments:
+            return
+        texts = [seg.render() for seg in segments]
+        self.widget.insert(tk.END, "".join(texts))
+        self.line_counts.extend(text.count('\n') for text in texts)
+        self.end = segments[-1].segment_id + 1
+
+    def _trim_top(self):
+        while len(self.line_counts) > self.max_segments:
+            count = self.line_counts.popleft()
+            if count:
+                self.widget.delete(1.0, f"{count + 1}.0")
+            self.start += 1
+
+    def _trim_bottom(self):
+        while len(self.line_counts) > self.max_segments:
+            count = self.line_counts.pop()
+            if count:
+                first_line = sum(self.line_counts) + 1
+                self.widget.delete(f"{first_line}.0", tk.END)
+            self.end -= 1
+            self.following = False
+
+    def _on_scroll(self, first, last):
+        self.widget.vbar.set(first, last)
+        if self._loading:
+            return
+        if float(first) <= 0.0 and self.start > 0:
+            self._loading = True
+            self.widget.after_idle(self._load_previous)
+        elif float(last) >= 1.0 and self.end < len(self.model):
+            self._loading = True
+            self.widget.after_idle(self._load_next)
+
+    def _load_previous(self):
+        try:
+            new_start = max(0, self.start - self.page_size)
+            segments = self.model.range(new_start, self.start)
+            texts = [seg.render() for seg in segments]
+            self.widget.insert(1.0, "".join(texts))
+            self.line_counts.extendleft(reversed([text.count('\n') for text in texts]))
+            self.start = new_start
+            self._trim_bottom()
+            self.widget.see(f"{sum(self.line_counts[i] for i in range(len(texts))) + 1}.0")
+        finally:
+            self._loading = False
+
+    def _load_next(self):
+        try:
+            segments = self.model.range(self.end, self.end + self.page_size)
+            if segments:
+                self._insert_bottom(segments)
+                self._trim_top()
+            self.following = self.end >= len(self.model)
+        finally:
+            self._loading = False
+
+
+# ===== DIARIO DE SESIÓN =====
+class SessionJournal:
+    """Diario de sesión append-only (JSONL) resistente a caídas
+
+    Registra cada frase reconocida, corregida y volcada, y cada respuesta de
+    Claude en cuanto ocurren. Un hilo escritor agrupa los registros (group
+    commit) y hace ``fsync`` como mucho ``commit_interval`` segundos después del
+    primer registro pendiente, fuera del hilo de la UI. Un diario sin registro
+    ``session_end`` indica una sesión interrumpida que se recupera al arrancar.
+    """
+
+    def __init__(self, path, commit_interval=0.2, max_batch=256):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'ab')
+        self._queue = queue.SimpleQueue()
+        self.closed = False
+
+        # Métricas para medir amplificación de escritura
+        self.records = 0
+        self.payload_bytes = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self.commit_latencies = deque(maxlen=1000)
+
+        self._writer = threading.Thread(target=self._run, name='session-journal', daemon=True)
+        self._writer.start()
+
+    @staticmethod
+    def new_path(directory=SESSIONS_DIR):
+        return os.path.join(directory, f"journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+    @staticmethod
+    def list_journals(directory=SESSIONS_DIR):
+        """Rutas de los diarios del directorio, de más antiguo a más reciente"""
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.startswith('journal_') and name.endswith('.jsonl')]
+
+    @staticmethod
+    def find_unfinished(directory=SESSIONS_DIR):
+        """Último diario sin ``session_end`` (sesión interrumpida) o None
+
+        Solo la sesión anterior puede haber quedado interrumpida: se recorren los
+        diarios del más reciente al más antiguo leyendo únicamente su último
+        registro y se para en el primero terminado (los vacíos se saltan).
+        """
+        for path in reversed(SessionJournal.list_journals(directory)):
+            last = SessionJournal.last_record(path)
+            if last is None:
+                continue
+            return None if last.get('type') == 'session_end' else path
+        return None
+
+    @staticmethod
+    def prune(directory=SESSIONS_DIR, keep_days=30):
+        """Borrar los diarios terminados de hace más de ``keep_days`` días
+
+        Nunca borra el diario más reciente ni uno sin ``session_end``; con
+        ``keep_days`` 0 se conservan todos. Devuelve cuántos se borraron.
+        """
+        if not keep_days:
+            return 0
+        cutoff = time.time() - keep_days * 86400
+        removed = 0
+        for path in SessionJournal.list_journals(directory)[:-1]:
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                last = SessionJournal.last_record(path)
+                if last is not None and last.get('type') == 'session_end':
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logging.getLogger('VoiceBridge').warning(f"No se pudo podar el diario {path}: {e}")
+        return removed
+
+    @staticmethod
+    def last_record(path, block=65536):
+        """Último registro válido de un diario leyendo solo el final del archivo"""
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            tail = b""
+            while end > 0:
+                start = max(0, end - block)
+                f.seek(start)
+                tail = f.read(end - start) + tail
+                end = start
+                lines = tail.split(b"\n")
+                # La primera línea puede estar cortada por el bloque salvo al principio del archivo
+                complete = lines if start == 0 else lines[1:]
+                for line in reversed(complete):
+                    if not line.strip():
+                        continue
+                    try:
+                        return json.loads(line)
+                    except ValueError:
+                        continue
+        return None
+
+    @staticmethod
+    def read(path):
+        """Leer los registros válidos de un diario (ignora una última línea truncada)"""
+        with open(path, 'rb') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    break
+
+    @staticmethod
+    def replay(path):
+        """Reconstruir (segmentos, frases pendientes, limpiezas, último phrase_id) de un diario
+
+        Las frases pendientes son ``{phrase_id: texto}``. Tras cada ``cleared`` la
+        numeración de segmentos vuelve a cero; el número de limpiezas permite a la
+        aplicación seguir en la misma parte del archivo. El último ``phrase_id`` visto
+        permite continuar la numeración de frases sin repetir identificadores.
+        """
+        segments = {}
+        pending = {}
+        clears = 0
+        last_phrase_id = 0
+        for record in SessionJournal.read(path):
+            kind = record.get('type')
+            if kind == 'recognized':
+                pending[record['phrase_id']] = record['text']
+                last_phrase_id = max(last_phrase_id, record['phrase_id'])
+            elif kind == 'corrected':
+                if record['phrase_id'] in pending:
+                    pending[record['phrase_id']] = record['text']
+            elif kind == 'dropped':
+                pending.pop(record['phrase_id'], None)
+            elif kind == 'flushed':
+                for phrase_id in record.get('phrase_ids', []):
+                    pending.pop(phrase_id, None)
+                segments[record['segment_id']] = TranscriptSegment.from_dict(record)
+            elif kind == 'claude' and record.get('segment_id') in segments:
+                segment = segments[record['segment_id']]
+                segment.claude_reply = record['reply']
+                segment.replied_at = record['t']
+            elif kind == 'cleared':
+                segments.clear()
+                pending.clear()
+                clears += 1
+        return [segments[key] for key in sorted(segments)], pending, clears, last_phrase_id
+
+    def record(self, kind, payload_size=0, **fields):
+        """Encolar un registro (desde cualquier hilo, no bloquea)"""
+        if self.closed:
+            return
+        fields = {key: value for key, value in fields.items() if value is not None}
+        fields['type'] = kind
+        fields['t'] = time.time()
+        self.payload_bytes += payload_size
+        self._queue.put((time.perf_counter(), fields))
+
+    def close(self, clean=True):
+        """Cerrar el diario; ``clean`` marca la sesión como terminada"""
+        if self.closed:
+            return
+        if clean:
+            self.record('session_end')
+        self.closed = True
+        self._queue.put(None)
+        self._writer.join(5)
+
+    def stats(self):
+        """Métricas de escritura del diario"""
+        latencies = sorted(self.commit_latencies)
+        return {
+            'records': self.records,
+            'payload_bytes': self.payload_bytes,
+            'bytes_written': self.bytes_written,
+            'fsyncs': self.fsyncs,
+            'write_amplification': (self.bytes_written / self.payload_bytes
+                                    if self.payload_bytes else 0.0),
+            'commit_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+            'commit_max_ms': latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+
+            # Agrupar hasta commit_interval desde el primer registro pendiente
+            deadline = time.monotonic() + self.commit_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
 
-        self.stats['session_duration'] = int(time.time() - self.session_start)
+            data = "".join(json.dumps(fields, ensure_ascii=False, separators=(',', ':')) + "\n"
+                           for _, fields in batch).encode('utf-8')
+            try:
+                self._file.write(data)
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except OSError as e:
+                logging.getLogger('VoiceBridge').error(f"Error escribiendo diario de sesión: {e}")
+                continue
+
+            done = time.perf_counter()
+            self.records += len(batch)
+            self.bytes_written += len(data)
+            self.fsyncs += 1
+            for queued_at, _ in batch:
+                self.commit_latencies.append(done - queued_at)
+
+        self._file.close()
+
+
+# ===== ARCHIVO HISTÓRICO DE SESIONES =====
+class SessionArchive:
+    """Archivo de sesiones con búsqueda de texto completo (SQLite FTS5)
+
+    Indexa de forma incremental cada segmento dictado y cada respuesta de Claude.
+    Las escrituras se hacen en un hilo propio; las búsquedas devuelven resultados
+    ordenados por BM25 con las coincidencias marcadas. Si SQLite no trae FTS5 se
+    usa una búsqueda LIKE sin ranking.
+    """
+
+    HIGHLIGHT_START = "\x02"
+    HIGHLIGHT_END = "\x03"
+    TIMESTAMP_RE = re.compile(r'^\[(\d{2}:\d{2}:\d{2})\]\s*(.*)$')
+
+    def __init__(self, path=ARCHIVE_FILE):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._session_ids = {}
+        self._queue = queue.SimpleQueue()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._create_schema()
+        self._writer = threading.Thread(target=self._run, name='session-archive', daemon=True)
+        self._writer.start()
+
+    def _create_schema(self):
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL,
+                started_at REAL,
+                source TEXT
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                session_id INTEGER NOT NULL REFERENCES sessions(id),
+                segment_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                created_at REAL,
+                text TEXT NOT NULL,
+                UNIQUE (session_id, segment_id, kind)
+            );
+        """)
+        try:
+            self._conn.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(
+                    text, content='entries', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
+                );
+                CREATE TRIGGER IF NOT EXISTS entries_ai AFTER INSERT ON entries BEGIN
+                    INSERT INTO entries_fts(rowid, text) VALUES (new.id, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_ad AFTER DELETE ON entries BEGIN
+                    INSERT INTO entries_fts(entries_fts, rowid, text)
+                    VALUES ('delete', old.id, old.text);
+                END;
+            """)
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+        self._conn.commit()
+
+    # ----- Indexación -----
+
+    def index_segment(self, session_name, segment, started_at=None):
+        """Encolar un segmento (y su respuesta de Claude) para indexar"""
+        self._queue.put((session_name, started_at, segment.segment_id, 'dictation',
+                         segment.ended_at, segment.corrected_text))
+        if segment.claude_reply:
+            self.index_reply(session_name, segment)
+
+    def index_reply(self, session_name, segment):
+        """Encolar la respuesta de Claude de un segmento"""
+        self._queue.put((session_name, None, segment.segment_id, 'claude',
+                         segment.replied_at or segment.ended_at, segment.claude_reply))
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(5)
+        with self._lock:
+            self._conn.close()
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                break
+            batch = [entry]
+            try:
+                while len(batch) < 500:
+                    entry = self._queue.get_nowait()
+                    if entry is None:
+                        self._write(batch)
+                        return
+                    batch.append(entry)
+            except queue.Empty:
+                pass
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            with self._lock:
+                for session_name, started_at, segment_id, kind, created_at, text in batch:
+                    if not text:
+                        continue
+                    session_id = self._get_session_id(session_name, started_at, 'journal')
+                    self._conn.execute(
+                        "DELETE FROM entries WHERE session_id=? AND segment_id=? AND kind=?",
+                        (session_id, segment_id, kind))
+                    self._conn.execute(
+                        "INSERT INTO entries(session_id, segment_id, kind, created_at, text) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (session_id, segment_id, kind, created_at, text))
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logging.getLogger('VoiceBridge').error(
+                f"Error indexando en el archivo de sesiones: {e}")
+
+    def _get_session_id(self, name, started_at, source):
+        session_id = self._session_ids.get(name)
+        if session_id is None:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sessions(name, started_at, source) VALUES (?, ?, ?)",
+                (name, started_at or time.time(), source))
+            session_id = self._conn.execute(
+                "SELECT id FROM sessions WHERE name=?", (name,)).fetchone()[0]
+            self._session_ids[name] = session_id
+        return session_id
+
+    # ----- Importación -----
+
+    def import_text_export(self, path):
+        """Importar un .txt generado por "Guardar"; devuelve el número de entradas
+
+        La sesión importada se identifica por la ruta absoluta: archivos con el
+        mismo nombre en carpetas distintas son sesiones distintas.
+        """
+        name = os.path.abspath(path)
+        started_at = os.path.getmtime(path)
+        day = datetime.fromtimestamp(started_at)
+        kind = 'dictation'
+        entries = []
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith("=== ANÁLISIS DE CLAUDE"):
+                    kind = 'claude'
+                    continue
+                if line.startswith("--- ESTADÍSTICAS"):
+                    break
+                match = self.TIMESTAMP_RE.match(line)
+                if match:
+                    hour = datetime.strptime(match.group(1), "%H:%M:%S")
+                    created_at = day.replace(hour=hour.hour, minute=hour.minute,
+                                             second=hour.second).timestamp()
+                    entries.append([kind, created_at, match.group(2)])
+                elif line and entries and not line.startswith("==="):
+                    entries[-1][2] += "\n" + line
+
+        with self._lock:
+            session_id = self._get_session_id(name, started_at, 'txt')
+            self._conn.execute("DELETE FROM entries WHERE session_id=?", (session_id,))
+            self._conn.executemany(
+                "INSERT INTO entries(session_id, segment_id, kind, created_at, text) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(session_id, index, kind, created_at, text)
+                 for index, (kind, created_at, text) in enumerate(entries)])
+            self._conn.commit()
+        return len(entries)
+
+    def import_directory(self, directory, progress=None):
+        """Importar todos los .txt de un directorio; devuelve (archivos, entradas)
+
+        ``progress(importados, total)`` se llama tras cada archivo.
+        """
+        paths = [os.path.join(root_dir, name)
+                 for root_dir, _, names in os.walk(directory)
+                 for name in sorted(names) if name.lower().endswith('.txt')]
+        entries = 0
+        for files, path in enumerate(paths, 1):
+            entries += self.import_text_export(path)
+            if progress:
+                progress(files, len(paths))
+        return len(paths), entries
+
+    # ----- Búsqueda -----
+
+    def search(self, query, limit=50):
+        """Buscar en todas las sesiones; devuelve resultados ordenados por relevancia"""
+        terms = re.findall(r'\w+', query.lower())
+        if not terms:
+            return []
+
+        with self._lock:
+            if self.fts_enabled:
+                match = " ".join(f'"{term}"*' for term in terms)
+                rows = self._conn.execute(
+                    "SELECT s.name, e.created_at, e.kind, "
+                    "snippet(entries_fts, 0, ?, ?, '…', 16), bm25(entries_fts) AS rank "
+                    "FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                    "JOIN sessions s ON s.id = e.session_id "
+                    "WHERE entries_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (self.HIGHLIGHT_START, self.HIGHLIGHT_END, match, limit)).fetchall()
+            else:
+                where = " AND ".join("lower(e.text) LIKE ?" for _ in terms)
+                rows = self._conn.execute(
+                    "SELECT s.name, e.created_at, e.kind, e.text, 0 FROM entries e "
+                    f"JOIN sessions s ON s.id = e.session_id WHERE {where} "
+                    "ORDER BY e.created_at DESC LIMIT ?",
+                    [f"%{term}%" for term in terms] + [limit]).fetchall()
+                rows = [(name, created_at, kind, self._highlight(text, terms), rank)
+                        for name, created_at, kind, text, rank in rows]
+
+        return [{'session': name, 'created_at': created_at, 'kind': kind, 'snippet': snippet,
+                 'rank': rank}
+                for name, created_at, kind, snippet, rank in rows]
+
+    def _highlight(self, text, terms):
+        pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+        return pattern.sub(lambda m: self.HIGHLIGHT_START + m.group(0) + self.HIGHLIGHT_END, text)
+
+
+# ===== BIBLIOTECA DE PLANTILLAS =====
+def normalize_for_search(text):
+    """Minúsculas sin tildes, para indexar y comparar"""
+    decomposed = unicodedata.normalize('NFD', text.lower())
+    return "".join(ch for ch in decomposed if unicodedata.category(ch) != 'Mn')
+
+
+class ReportTemplate:
+    """Plantilla de informe de patología"""
+
+    SLOT_RE = re.compile(r'\[\[(.+?)\]\]')
+
+    def __init__(self, name, title, keywords, body):
+        self.name = name
+        self.title = title
+        self.keywords = keywords
+        self.body = body
+
+    @classmethod
+    def from_file(cls, path):
+        """Leer una plantilla: cabeceras ``# Título:`` y ``# Palabras clave:`` y el cuerpo"""
+        title, keywords, body = None, [], []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    key, _, value = line.lstrip('# ').partition(':')
+                    key = normalize_for_search(key.strip())
+                    if key == 'titulo':
+                        title = value.strip()
+                    elif key == 'palabras clave':
+                        keywords = [word.strip() for word in value.split(',') if word.strip()]
+                    continue
+                body.append(line)
+        name = os.path.splitext(os.path.basename(path))[0]
+        return cls(name, title or name.replace('_', ' '), keywords, "".join(body).strip())
+
+    @property
+    def slots(self):
+        """Instrucciones de los campos que debe redactar Claude"""
+        return self.SLOT_RE.findall(self.body)
+
+    def render(self, values=None):
+        """Texto de la plantilla; los campos sin valor quedan marcados como pendientes"""
+        values = iter(values or [])
+        return self.SLOT_RE.sub(lambda m: next(values, None) or f"[pendiente: {m.group(1)}]",
+                                self.body)
+
+
+class TemplateLibrary:
+    """Plantillas locales con índice BM25 y similitud por trigramas
+
+    Resuelve en milisegundos órdenes como "consultar plantilla gástrica" sin
+    pasar por Claude. El título y las palabras clave pesan más que el cuerpo, y
+    los trigramas toleran variantes del reconocedor ("basocelulares", "urotelia").
+    """
+
+    TITLE_WEIGHT = 3
+
+    def __init__(self, directory=TEMPLATES_DIR, k1=1.5, b=0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self.templates = []
+        self.load()
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r'\w+', normalize_for_search(text))
+
+    @staticmethod
+    def trigrams(text):
+        padded = f"  {normalize_for_search(text)} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def load(self):
+        """Cargar e indexar todas las plantillas del directorio"""
+        self.templates = []
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith('.txt'):
+                    path = os.path.join(self.directory, name)
+                    self.templates.append(ReportTemplate.from_file(path))
+
+        self.postings = {}
+        self.doc_lengths = []
+        self.doc_trigrams = []
+        for index, template in enumerate(self.templates):
+            header = " ".join([template.title, template.name.replace('_', ' ')] + template.keywords)
+            tokens = self.tokenize(header) * self.TITLE_WEIGHT + self.tokenize(template.body)
+            for token in tokens:
+                postings = self.postings.setdefault(token, {})
+                postings[index] = postings.get(index, 0) + 1
+            self.doc_lengths.append(len(tokens))
+            self.doc_trigrams.append(self.trigrams(header))
+        self.avg_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def search(self, query, limit=3):
+        """Plantillas ordenadas por relevancia: [(puntuación, plantilla)]"""
+        if not self.templates:
+            return []
+        scores = [0.0] * len(self.templates)
+        total = len(self.templates)
+        for token in set(self.tokenize(query)):
+            postings = self.postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for index, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / self.avg_length)
+                scores[index] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        # Similitud por trigramas para variantes del reconocedor
+        query_trigrams = self.trigrams(query)
+        if query_trigrams:
+            for index, doc_trigrams in enumerate(self.doc_trigrams):
+                scores[index] += 2.0 * len(query_trigrams & doc_trigrams) / len(query_trigrams)
+
+        ranked = sorted(zip(scores, self.templates), key=lambda pair: pair[0], reverse=True)
+        return [(score, template) for score, template in ranked[:limit] if score > 0]
+
+    def find(self, query, min_score=1.0):
+        """Mejor plantilla para la consulta o None"""
+        results = self.search(query, limit=1)
+        if results and results[0][0] >= min_score:
+            return results[0][1]
+        return None
+
+
+# ===== MOTOR DE COMANDOS DE VOZ =====
+def edit_distance(a, b, limit):
+    """Distancia de Levenshtein con corte temprano (devuelve limit + 1 si la supera)"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class CommandMatch:
+    """Orden reconocida al inicio de una frase"""
+
+    def __init__(self, action, phrase, payload, cost):
+        self.action = action
+        self.phrase = phrase
+        self.payload = payload
+        self.cost = cost
+
+
+class CommandEngine:
+    """Reconocedor de órdenes de voz sobre un trie de palabras
+
+    La gramática combina las órdenes locales integradas con la sección
+    "COMANDOS CLAUDE" de ``frases_completas.txt``. La búsqueda recorre el trie
+    desde el inicio de la frase con tolerancia por palabra a variantes del
+    reconocedor (distancia de edición según longitud) y devuelve la orden más
+    larga con el texto restante como argumento.
+    """
+
+    BUILTIN_COMMANDS = {
+        'start': ["iniciar dictado", "empezar dictado", "comenzar dictado"],
+        'stop': ["detener dictado", "parar dictado", "pausar dictado"],
+        'clear': ["limpiar transcripción", "borrar transcripción"],
+        'confirm_clear': ["confirmar borrado", "confirmar limpieza"],
+        'save': ["guardar sesión", "guardar transcripción"],
+        'send': ["enviar a claude", "enviar transcripción a claude"],
+        'new_case': ["nuevo caso", "siguiente caso"],
+        # Sin "plantilla" sola: una frase dictada puede empezar así ("plantilla de parafina...")
+        'template': ["consultar plantilla"],
+        'report': ["generar informe"],
+    }
+    # Acción de cada orden del diccionario (por frase normalizada)
+    DICTIONARY_ACTIONS = {
+        "claude observo en la biopsia": 'observe',
+        "claude inicio analisis caso": 'new_case',
+        "claude agregar al informe": 'append',
+        "claude consultar plantilla": 'template',
+        "claude generar informe": 'report',
+    }
+    # Acciones que continúan por el pipeline para respetar el orden del dictado
+    PIPELINE_ACTIONS = ('observe', 'append', 'new_case')
+    # Órdenes locales que esperan a lo dictado antes: cruzan el pipeline y se ejecutan en dispatch
+    ORDERED_ACTIONS = ('template', 'report')
+    MAX_COST = 2
+
+    def __init__(self, dictionary_path=None):
+        self.root = {}
+        self.phrases = 0
+        for action, phrases in self.BUILTIN_COMMANDS.items():
+            for phrase in phrases:
+                self.add(phrase, action)
+                self.add("claude " + phrase, action)
+        if dictionary_path:
+            self.load_dictionary(dictionary_path)
+
+    def load_dictionary(self, path):
+        """Cargar las órdenes de la sección de comandos de un diccionario"""
+        if not os.path.exists(path):
+            return
+        in_commands = False
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('#'):
+                    in_commands = 'COMANDOS' in line.upper()
+                    continue
+                if in_commands and line:
+                    action = self.DICTIONARY_ACTIONS.get(" ".join(TemplateLibrary.tokenize(line)))
+                    if action:
+                        self.add(line, action)
+
+    def add(self, phrase, action):
+        """Añadir una orden al trie"""
+        node = self.root
+        for token in TemplateLibrary.tokenize(phrase):
+            node = node.setdefault(token, {})
+        if '' not in node:
+            self.phrases += 1
+        node[''] = (action, phrase)
+
+    @staticmethod
+    def tolerance(token):
+        if len(token) < 4:
+            return 0
+        return 1 if len(token) < 6 else 2
+
+    def match(self, text):
+        """Orden al inicio de ``text`` o None"""
+        spans = [(normalize_for_search(m.group(0)), m.end()) for m in re.finditer(r'\w+', text)]
+        if not spans:
+            return None
+
+        best = None
+        # (nodo, posición, coste acumulado)
+        stack = [(self.root, 0, 0)]
+        while stack:
+            node, position, cost = stack.pop()
+            # Como mucho una palabra aproximada por cada dos de la orden
+            if '' in node and position > 0 and cost <= position // 2:
+                candidate = (position, -cost, node[''])
+                if best is None or candidate[:2] > best[:2]:
+                    best = candidate
+            if position >= len(spans):
+                continue
+            token = spans[position][0]
+            for key, child in node.items():
+                if not key:
+                    continue
+                if key == token:
+                    stack.append((child, position + 1, cost))
+                    continue
+                limit = min(self.tolerance(key), self.MAX_COST - cost)
+                if limit > 0:
+                    distance = edit_distance(token, key, limit)
+                    if distance <= limit:
+                        stack.append((child, position + 1, cost + distance))
+
+        if best is None:
+            return None
+        position, negative_cost, (action, phrase) = best
+        payload = text[spans[position - 1][1]:].lstrip(" ,.;:").rstrip()
+        return CommandMatch(action, phrase, payload, -negative_cost)
+
+
+# ===== TRAZAS DE LATENCIA POR FRASE =====
+# Cubetas geométricas (x1.25) de 10 µs a ~50 s: error relativo de los cuantiles < 25 %
+SPAN_BUCKETS_MS = tuple(round(0.01 * 1.25 ** i, 4) for i in range(70))
+
+
+class PhraseTracer:
+    """Spans de latencia por frase, correlacionados por ``phrase_id``
+
+    Cada span es una tupla ``(phrase_id, etapa, inicio_ns, fin_ns)`` con reloj
+    monotónico (``perf_counter_ns``) en un deque acotado para exportar. Cubre la
+    recepción del resultado, las etapas del pipeline, la espera en el buffer, la
+    inserción en el widget y la petición a Claude (inicio, primer byte y respuesta
+    mostrada). Se exporta como JSON de Chrome trace (chrome://tracing, Perfetto) con
+    una pista por frase. Los p50/p95/p99 por etapa salen de un Histogram por etapa
+    que se actualiza al registrar, sin ordenar los spans.
+    """
+
+    STAGE_ORDER = ('rescore', 'stitch', 'correct', 'normalize', 'dedupe', 'buffer', 'dispatch',
+                   'render', 'end_to_end', 'claude_request', 'claude_response', 'claude_display')
+    MAX_OPEN = 1000
+
+    def __init__(self, capacity=50000, enabled=True):
+        self.enabled = enabled
+        self.spans = deque(maxlen=capacity)
+        self.histograms = {}
+        self.origin_ns = time.perf_counter_ns()
+        # Frases recibidas y segmentos registrados a la espera de mostrarse
+        self._received = {}
+        self._dispatched = {}
+        self.rendered_count = 0
+        self._lock = threading.Lock()
+
+    def span(self, phrase_id, stage, start_ns, end_ns=None):
+        if self.enabled:
+            if end_ns is None:
+                end_ns = time.perf_counter_ns()
+            self._add(phrase_id, stage, start_ns, end_ns)
+
+    def _add(self, phrase_id, stage, start_ns, end_ns):
+        self.spans.append((phrase_id, stage, start_ns, end_ns))
+        if end_ns > start_ns:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms.setdefault(
+                    stage, Histogram(stage, buckets=SPAN_BUCKETS_MS))
+            histogram.observe((end_ns - start_ns) / 1e6)
+
+    def received(self, phrase_id, at_ns):
+        """Resultado ``recognized`` del SDK convertido en frase del pipeline"""
+        if self.enabled:
+            self._add(phrase_id, 'recognized', at_ns, at_ns)
+            with self._lock:
+                self._remember(self._received, phrase_id, at_ns)
+
+    def dispatched(self, segment):
+        """Segmento registrado en el modelo; el render llega en el próximo frame"""
+        if self.enabled and segment.phrase_ids:
+            with self._lock:
+                self._remember(self._dispatched, segment.segment_id,
+                               (time.perf_counter_ns(), tuple(segment.phrase_ids)))
+
+    def rendered(self, segments):
+        """Segmentos insertados en el widget (hilo de Tk)"""
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        with self._lock:
+            self.rendered_count += 1
+            for segment in segments:
+                entry = self._dispatched.pop(segment.segment_id, None)
+                if entry is None:
+                    continue
+                dispatched_ns, phrase_ids = entry
+                for phrase_id in phrase_ids:
+                    self._add(phrase_id, 'render', dispatched_ns, now)
+                    received_ns = self._received.pop(phrase_id, None)
+                    if received_ns is not None:
+                        self._add(phrase_id, 'end_to_end', received_ns, now)
+
+    def claude(self, phrase_id, timings):
+        """Petición a Claude: hasta el primer byte y hasta la respuesta completa"""
+        if self.enabled and timings:
+            self.span(phrase_id, 'claude_request', timings['start'], timings['first_byte'])
+            self.span(phrase_id, 'claude_response', timings['first_byte'], timings['end'])
+
+    def _remember(self, table, key, value):
+        # Frases descartadas (repeticiones, órdenes) nunca se muestran: tabla acotada
+        table[key] = value
+        if len(table) > self.MAX_OPEN:
+            del table[next(iter(table))]
+
+    def quantile(self, stage, q):
+        """Cuantil ``q`` en ms de una etapa (límite superior de su cubeta) o None"""
+        histogram = self.histograms.get(stage)
+        return histogram.quantile(q) if histogram else None
+
+    def percentiles(self):
+        """{etapa: (n, p50_ms, p95_ms, p99_ms)} en el orden de STAGE_ORDER"""
+        def order(item):
+            return (self.STAGE_ORDER + (item[0],)).index(item[0])
+
+        summary = {}
+        # Copia: otro hilo puede añadir una etapa mientras se resume
+        for stage, histogram in sorted(list(self.histograms.items()), key=order):
+            quantiles = tuple(histogram.quantile(q) for q in (0.50, 0.95, 0.99))
+            summary[stage] = (histogram.count,) + quantiles
+        return summary
+
+    def summary_lines(self):
+        return [f"{stage}: p50 {p50:.1f} / p95 {p95:.1f} / p99 {p99:.1f} ms (n={n})"
+                for stage, (n, p50, p95, p99) in self.percentiles().items()]
+
+    def export_chrome_trace(self, path):
+        """Escribir los spans en formato Chrome trace (una pista por frase)
+
+        Devuelve el número de eventos escritos.
+        """
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid,
+                   'args': {'name': f"Voice Bridge v{VERSION}"}}]
+        for phrase_id, stage, start, end in list(self.spans):
+            event = {'name': stage, 'cat': 'phrase', 'pid': pid, 'tid': phrase_id,
+                     'ts': (start - self.origin_ns) / 1000, 'args': {'phrase_id': phrase_id}}
+            if end > start:
+                event.update(ph='X', dur=(end - start) / 1000)
+            else:
+                event.update(ph='i', s='t')
+            events.append(event)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return len(events) - 1
+
+
+# ===== PIPELINE DE PROCESAMIENTO =====
+_phrase_ids = itertools.count(1)
+_STOP = object()
+
+
+def continue_phrase_ids(last_phrase_id):
+    """Seguir numerando las frases después de ``last_phrase_id`` (diario reanudado)"""
+    global _phrase_ids
+    _phrase_ids = itertools.count(max(next(_phrase_ids), last_phrase_id + 1))
+
+
+class PipelineItem:
+    """Frase reconocida en tránsito por el pipeline"""
+
+    def __init__(self, text, received_at=None, hypotheses=None, spoken_at=None, audio_span=None):
+        self.phrase_id = next(_phrase_ids)
+        self.raw_text = text
+        self.text = text
+        self.hypotheses = hypotheses
+        self.confidence = None
+        self.words = None
+        self.received_at = received_at if received_at is not None else time.monotonic()
+        self.received_ns = time.perf_counter_ns()
+        self.buffered_ns = None
+        self.received_wall = spoken_at if spoken_at is not None else time.time()
+        self.audio_span = audio_span
+        self.corrections = 0
+        self.is_repetition = False
+        self.command = None
+
+
+class AdaptiveSegmenter:
+    """Decide cuándo vaciar el buffer médico según el ritmo del hablante
+
+    Aprende en línea la distribución de pausas entre frases (del final del audio
+    de una frase al inicio de la siguiente, según el reconocedor) y la combina con
+    señales de fin de oración ("punto", puntuación final, marcadores de lista)
+    y de continuación (coma, conectores) para vaciar en cuanto el segmento
+    probablemente está completo, o esperar más si probablemente continúa.
+    """
+
+    FINAL_WORDS = ('punto', 'punto y aparte', 'punto seguido', 'punto final')
+    # Palabras completas al final del texto: "contrapunto" no cierra la frase
+    FINAL_WORDS_RE = re.compile(r'(?<!\S)(?:' + '|'.join(map(re.escape, FINAL_WORDS)) + r')$')
+    CONTINUATION_WORDS = frozenset([
+        'y', 'e', 'o', 'u', 'de', 'del', 'con', 'sin', 'en', 'a', 'al', 'la', 'el', 'los',
+        'las', 'un', 'una', 'por', 'para', 'que', 'se', 'su', 'sus', 'como', 'entre', 'hacia',
+    ])
+    LIST_MARKER_RE = re.compile(
+        r'^(?:(?:primero|segundo|tercero|cuarto|quinto)\b|(?:uno|dos|tres|cuatro|cinco)[,.:]|'
+        r'número\s+\w+|\d+[.)]|[a-e]\))',
+        re.IGNORECASE
+    )
+
+    def __init__(self, base_delay=2.0, min_delay=0.25, max_delay=4.0, min_samples=8, window=200):
+        self.base_delay = base_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.gaps = deque(maxlen=window)
+        self.latencies = deque(maxlen=1000)
+        self._last_end = None
+
+    def observe(self, start, end):
+        """Registrar el audio de una frase y aprender la pausa desde el final de la anterior
+
+        ``start``/``end`` son segundos del flujo según el reconocedor; al reiniciarlo los
+        offsets vuelven a cero y la pausa negativa se ignora.
+        """
+        if self._last_end is not None:
+            gap = start - self._last_end
+            if 0 < gap <= self.max_delay * 2:
+                self.gaps.append(gap)
+        self._last_end = end
+
+    def quantile(self, q):
+        """Cuantil de las pausas observadas (None si no hay suficientes muestras)"""
+        if len(self.gaps) < self.min_samples:
+            return None
+        ordered = sorted(self.gaps)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def starts_new_item(self, text):
+        """La frase empieza con un marcador de lista: el segmento anterior está completo"""
+        return bool(self.LIST_MARKER_RE.match(text.strip()))
+
+    def flush_delay(self, text):
+        """Segundos a esperar antes de vaciar un buffer que termina en ``text``"""
+        tail = text.rstrip().lower()
+        if tail.endswith(('.', '?', '!', ':')) or self.FINAL_WORDS_RE.search(tail):
+            return self.min_delay
+
+        if tail.endswith((',', ';')) or tail.rsplit(' ', 1)[-1] in self.CONTINUATION_WORDS:
+            long_gap = self.quantile(0.9)
+            delay = long_gap * 1.5 if long_gap is not None else self.base_delay * 1.5
+        else:
+            typical_gap = self.quantile(0.75)
+            delay = typical_gap * 1.2 if typical_gap is not None else self.base_delay
+        return min(self.max_delay, max(self.min_delay, delay))
+
+    def record_latency(self, latency):
+        """Registrar el tiempo desde el reconocimiento hasta que la frase se muestra"""
+        self.latencies.append(latency)
+
+    def median_latency(self):
+        """Mediana de la latencia de visualización por frase (segundos)"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[len(ordered) // 2]
+
+
+class ProcessingPipeline:
+    """Pipeline por etapas (rescore → stitch → correct → normalize → dedupe → buffer → dispatch)
+
+    Cada etapa tiene su propio hilo y una cola acotada de entrada. Cuando una etapa
+    se satura, el ``put`` de la etapa anterior se bloquea (backpressure) hasta llegar
+    al callback del SDK. Solo las operaciones finales de render se envían al hilo de Tk.
+    """
+
+    STAGES = ('rescore', 'stitch', 'correct', 'normalize', 'dedupe', 'buffer', 'dispatch')
+
+    def __init__(self, app, queue_size=32, submit_timeout=2.0, max_pending_claude=4):
+        self.app = app
+        self.submit_timeout = submit_timeout
+        self.max_pending_claude = max_pending_claude
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in self.STAGES}
+        self.stage_timings = {name: deque(maxlen=1000) for name in self.STAGES}
+        self.dropped = 0
+        self.threads = []
+        self.running = False
+
+        # Estado de la etapa stitch: últimas palabras con marca de tiempo de la frase previa
+        self._last_words = []
+
+        # Estado de la etapa buffer: lista de partes y segmentación adaptativa
+        self._buffer_parts = []
+        self._buffer_deadline = None
+        self._buffer_lock = threading.Lock()
+        self.segmenter = AdaptiveSegmenter(base_delay=app.medical_pause_seconds)
+
+        # Envíos a Claude fuera del pipeline
+        self._claude_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='claude')
+        self._claude_pending = 0
+        self._claude_lock = threading.Lock()
+
+    def start(self):
+        """Arrancar los hilos de cada etapa"""
+        if self.running:
+            return
+        self.running = True
+        workers = [
+            ('rescore', self._rescore, 'stitch'),
+            ('stitch', self._stitch, 'correct'),
+            ('correct', self._correct, 'normalize'),
+            ('normalize', self._normalize, 'dedupe'),
+            ('dedupe', self._dedupe, 'buffer'),
+            ('dispatch', self._dispatch, None),
+        ]
+        for name, func, next_stage in workers:
+            thread = threading.Thread(target=self._run_stage, args=(name, func, next_stage),
+                                      name=f'pipeline-{name}', daemon=True)
+            self.threads.append(thread)
+        self.threads.append(threading.Thread(target=self._run_buffer_stage,
+                                             name='pipeline-buffer', daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        """Detener el pipeline vaciando lo pendiente"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            self.queues[self.STAGES[0]].put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        self._claude_executor.shutdown(wait=False)
+
+    def submit(self, text, hypotheses=None, spoken_at=None, audio_span=None):
+        """Encolar texto reconocido y su lista N-best opcional (llamado desde el hilo del SDK)
+
+        ``spoken_at`` (hora de captura) se usa para frases reconocidas con retraso;
+        ``audio_span`` (inicio_s, fin_s) es el audio de la frase según el reconocedor.
+        """
+        item = PipelineItem(text, hypotheses=hypotheses, spoken_at=spoken_at, audio_span=audio_span)
+        self.app.tracer.received(item.phrase_id, item.received_ns)
+        try:
+            self.queues[self.STAGES[0]].put(item, timeout=self.submit_timeout)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            self.app.logger.warning(f"Pipeline saturado - frase {item.phrase_id} descartada")
+            return False
+
+    def reset_buffer(self):
+        """Descartar el contenido del buffer médico"""
+        with self._buffer_lock:
+            self._buffer_parts = []
+            self._buffer_deadline = None
+        self._last_words = []
+
+    def median_display_latency(self):
+        """Mediana de la latencia reconocimiento → transcripción por frase (segundos)"""
+        return self.segmenter.median_latency()
+
+    def timing_summary(self):
+        """Resumen de tiempos por etapa: {etapa: (n, media_ms, max_ms)}"""
+        summary = {}
+        for name, samples in self.stage_timings.items():
+            values = list(samples)
+            if values:
+                summary[name] = (len(values), sum(values) / len(values) * 1000, max(values) * 1000)
+        return summary
+
+    # ----- Infraestructura de etapas -----
+
+    def _run_stage(self, name, func, next_stage):
+        inbox = self.queues[name]
+        outbox = self.queues[next_stage] if next_stage else None
+        while True:
+            item = inbox.get()
+            if item is _STOP:
+                if outbox is not None:
+                    outbox.put(_STOP)
+                break
+
+            start = time.perf_counter_ns()
+            try:
+                result = func(item)
+            except Exception as e:
+                self.app.logger.error(f"Error en etapa {name}: {e}")
+                result = None
+            end = time.perf_counter_ns()
+            self.stage_timings[name].append((end - start) / 1e9)
+            # La etapa dispatch recibe (segmento, orden): un span por frase del segmento
+            for phrase_id in (item[0].phrase_ids if name == 'dispatch' else (item.phrase_id,)):
+                self.app.tracer.span(phrase_id, name, start, end)
+
+            if result is not None and outbox is not None:
+                # Bloquea si la etapa siguiente está saturada (backpressure)
+                outbox.put(result)
+
+    def _run_buffer_stage(self):
+        inbox = self.queues['buffer']
+        outbox = self.queues['dispatch']
+        while True:
+            with self._buffer_lock:
+                deadline = self._buffer_deadline
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+
+            try:
+                item = inbox.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                entry = self._take_buffer()
+                if entry:
+                    outbox.put(entry)
+                outbox.put(_STOP)
+                break
+
+            start = time.perf_counter()
+            segments = []
+            if item is not None:
+                item.buffered_ns = time.perf_counter_ns()
+                if item.audio_span:
+                    self.segmenter.observe(*item.audio_span)
+                if item.command:
+                    # El texto de una orden forma su propio segmento, sin esperar pausa
+                    segments.append(self._take_buffer())
+                    segments.append((self._build_segment([item]), item.command))
+                else:
+                    # Un marcador de lista cierra el segmento anterior
+                    if self.segmenter.starts_new_item(item.text):
+                        segments.append(self._take_buffer())
+                    with self._buffer_lock:
+                        self._buffer_parts.append(item)
+                        delay = self.segmenter.flush_delay(item.text)
+                        self._buffer_deadline = time.monotonic() + delay
+            segments.append(self._take_buffer(expired_only=True))
+            if item is not None:
+                self.stage_timings['buffer'].append(time.perf_counter() - start)
+
+            for entry in segments:
+                if entry:
+                    outbox.put(entry)
+
+    def _take_buffer(self, expired_only=False):
+        with self._buffer_lock:
+            if not self._buffer_parts:
+                self._buffer_deadline = None
+                return None
+            if expired_only and self._buffer_deadline is not None \
+                    and time.monotonic() < self._buffer_deadline:
+                return None
+            parts, self._buffer_parts = self._buffer_parts, []
+            self._buffer_deadline = None
+        return self._build_segment(parts), None
+
+    def _build_segment(self, parts):
+        now = time.monotonic()
+        now_ns = time.perf_counter_ns()
+        for part in parts:
+            self.segmenter.record_latency(now - part.received_at)
+            self.app.stats_collector.display_latency.observe(now - part.received_at)
+            self.app.tracer.span(part.phrase_id, 'buffer', part.buffered_ns or now_ns, now_ns)
+        segment = TranscriptSegment(
+            raw_text=" ".join(part.raw_text for part in parts).strip(),
+            corrected_text=" ".join(part.text for part in parts).strip(),
+            started_at=parts[0].received_wall,
+            ended_at=parts[-1].received_wall
+        )
+        segment.phrase_ids = [part.phrase_id for part in parts]
+
+        # Tiempos de palabra alineados con el texto corregido del segmento
+        if any(part.words for part in parts):
+            segment.timings = WordTimings()
+            shift = 0
+            for part in parts:
+                text = part.text.strip()
+                if part.words:
+                    segment.timings.extend(WordTimings.align(text, part.words), shift)
+                shift += len(text) + 1
+        return segment
+
+    # ----- Etapas -----
+
+    def _rescore(self, item):
+        """Elegir la mejor hipótesis N-best según el léxico y aplicar el umbral de confianza"""
+        if not item.hypotheses:
+            return item
+        rescorer = self.app.rescorer
+        choice = rescorer.choose(item.hypotheses) if rescorer else item.hypotheses[0]
+        if choice is None:
+            self.app.log_to_gui(f"🔇 Descartada por baja confianza: {item.text}")
+            return None
+        text, item.confidence, item.words = choice
+        if text != item.text:
+            self.app.log_to_gui(f"🔀 Hipótesis alternativa elegida: {text}")
+            item.raw_text = item.text = text
+        return item
+
+    def _stitch(self, item):
+        """Resolver órdenes de voz, normalizar espacios y eliminar el solapamiento"""
+        command = self.app.match_command(item.text)
+        if command:
+            if command.action in CommandEngine.ORDERED_ACTIONS:
+                # El texto es la consulta; el buffer se vacía antes y la orden corre en dispatch
+                item.text = command.payload
+                item.command = command.action
+                self._last_words = []
+                return item
+            if command.action not in CommandEngine.PIPELINE_ACTIONS:
+                self.app.run_command(command)
+                return None
+            if command.action == 'new_case':
+                item.text = f"=== NUEVO CASO {command.payload} ===".replace("  ", " ")
+            elif not command.payload:
+                self.app.log_to_gui(f"⚠️ Orden sin texto: {command.phrase}")
+                return None
+            else:
+                item.text = command.payload
+            item.command = command.action
+
+        words = item.text.split()
+        if not words:
+            return None
+
+        # El SDK a veces repite al inicio las últimas palabras del segmento previo
+        size = 0 if item.command else self._overlap(words, item.words)
+        if size:
+            words = words[size:]
+            item.words = item.words[size:]
+
+        self._last_words = item.words[-3:] if item.words and not item.command else []
+        item.text = " ".join(words)
+        if self.app.journal:
+            self.app.journal.record('recognized', len(item.raw_text.encode('utf-8')),
+                                    phrase_id=item.phrase_id, text=item.text)
+        return item
+
+    def _overlap(self, words, timed):
+        """Palabras iniciales que repiten el final de la frase anterior sobre el mismo audio
+
+        Coincidir en el texto no basta ("…biopsia de colon" / "colon ascendente"):
+        cada palabra repetida debe solaparse en el tiempo con la de la frase previa,
+        así que sin marcas de tiempo por palabra no se recorta nada y las
+        repeticiones completas quedan para ``RepetitionDetector``.
+        """
+        previous = self._last_words
+        if not previous or not timed:
+            return 0
+
+        def plain(word):
+            return word.strip('.,;:¿?¡!').lower()
+
+        def same_audio(old, new):
+            (old_word, old_offset, old_duration), (new_word, new_offset, new_duration) = old, new
+            return (plain(old_word) == plain(new_word) and new_offset < old_offset + old_duration
+                    and old_offset < new_offset + new_duration)
+
+        for size in range(min(3, len(previous), len(timed), len(words) - 1), 0, -1):
+            tail, head = previous[-size:], timed[:size]
+            repeated = [plain(word) for word, _, _ in head]
+            if all(same_audio(old, new) for old, new in zip(tail, head)) \
+                    and [plain(word) for word in words[:size]] == repeated:
+                return size
+        return 0
+
+    def _correct(self, item):
+        """Aplicar correcciones médicas"""
+        if self.app.config.get('auto_correct', True):
+            corrector = self.app.medical_corrector
+            before = corrector.corrections_applied
+            item.text = corrector.correct_text(item.text)
+            item.corrections = corrector.corrections_applied - before
+            if self.app.journal:
+                self.app.journal.record('corrected', phrase_id=item.phrase_id, text=item.text)
+        return item
+
+    def _normalize(self, item):
+        """Escribir en forma escrita números, medidas, unidades y ordinales"""
+        normalizer = self.app.normalizer
+        command = item.command
+        if normalizer and command != 'new_case' and command not in CommandEngine.ORDERED_ACTIONS:
+            text = normalizer.normalize(item.text)
+            if text != item.text:
+                item.text = text
+                if self.app.journal:
+                    self.app.journal.record('corrected', phrase_id=item.phrase_id, text=item.text)
+        return item
+
+    def _dedupe(self, item):
+        """Filtrar repeticiones y actualizar estadísticas"""
+        if item.command in CommandEngine.ORDERED_ACTIONS:
+            return item
+        if item.command == 'new_case':
+            # Un caso nuevo no compara sus frases con las del anterior
+            self.app.repetition_detector.recent_phrases.clear()
+        # Lo dictado tras una orden explícita nunca se descarta como repetición
+        item.is_repetition = (not item.command
+                              and self.app.repetition_detector.is_repetition(item.text))
+        self.app.stats_collector.update(item.text, item.corrections, item.is_repetition)
+        self.app.ui.set_latest('stats')
+
+        if item.corrections > 0:
+            self.app.log_to_gui(f"📝 Correcciones aplicadas: {item.corrections}")
+        if item.is_repetition:
+            self.app.log_to_gui("🔄 Repetición detectada - descartada")
+            if self.app.journal:
+                self.app.journal.record('dropped', phrase_id=item.phrase_id)
+            return None
+        return item
+
+    def _dispatch(self, entry):
+        """Registrar el segmento en el modelo, mostrarlo y enviarlo a Claude"""
+        segment, command = entry
+        if command in CommandEngine.ORDERED_ACTIONS:
+            # Todo lo dictado antes ya está en el modelo (y en ``recent_text``)
+            self.app.run_command(CommandMatch(command, command, segment.corrected_text, 0))
+            return None
+        self.app.add_segment(segment)
+
+        if command in ('append', 'new_case'):
+            return None
+        send = command == 'observe' or self.app.config.get('auto_send_claude', True)
+        if send and self.app.claude.is_configured():
+            if not self.submit_claude(self.app.send_to_claude_auto, segment):
+                self.app.log_to_gui("⚠️ Claude saturado - segmento no enviado automáticamente")
+        return None
+
+    def submit_claude(self, func, *args):
+        """Ejecutar una llamada a Claude fuera del pipeline (False si hay demasiadas pendientes)"""
+        with self._claude_lock:
+            if self._claude_pending >= self.max_pending_claude:
+                return False
+            self._claude_pending += 1
+        future = self._claude_executor.submit(func, *args)
+        future.add_done_callback(self._claude_done)
+        return True
+
+    def _claude_done(self, future):
+        with self._claude_lock:
+            self._claude_pending -= 1
+
+
+# ===== PLANIFICADOR DE RENDER DE LA UI =====
+class UIRenderScheduler:
+    """Agrupa las mutaciones de la UI y las aplica en una sola pasada por frame
+
+    Cualquier hilo puede encolar operaciones. Los textos añadidos a un mismo canal
+    se insertan de una vez; los canales "latest" (parciales, estadísticas, estado)
+    solo conservan el último valor recibido en el frame.
+    """
+
+    def __init__(self, root, frame_ms=33):
+        self.root = root
+        self.frame_ms = frame_ms
+        self._lock = threading.Lock()
+        self._ops = []
+        self._latest = {}
+        self._handlers = {}
+        self._sources = {}
+        self._ticks = []
+        self._after_id = None
+        self.running = False
+
+        # Métricas: longitud de la cola de eventos que antes recibía Tk y tiempo por frame
+        self.posted = 0
+        self.frames = 0
+        self.queue_lengths = deque(maxlen=600)
+        self.frame_times = deque(maxlen=600)
+
+    def register(self, channel, handler):
+        """Registrar el manejador de un canal (se ejecuta en el hilo de Tk)"""
+        self._handlers[channel] = handler
+
+    def add_source(self, channel, drain):
+        """Registrar una fuente que se vacía al inicio de cada frame (p. ej. un buffer circular)"""
+        self._sources[channel] = drain
+
+    def add_tick(self, func):
+        """Registrar una función que se ejecuta en cada frame (hilo de Tk)"""
+        self._ticks.append(func)
+
+    def append(self, channel, text):
+        """Añadir texto a un canal acumulativo"""
+        with self._lock:
+            self._ops.append((channel, text))
+            self.posted += 1
+
+    def set_latest(self, channel, value=None):
+        """Fijar el valor de un canal con semántica latest-wins"""
+        with self._lock:
+            self._latest[channel] = value
+            self.posted += 1
+
+    def call(self, func, *args):
+        """Ejecutar una función en el hilo de Tk respetando el orden de las operaciones"""
+        with self._lock:
+            self._ops.append((None, (func, args)))
+            self.posted += 1
+
+    def start(self):
+        """Iniciar el ciclo de frames"""
+        if not self.running:
+            self.running = True
+            self._after_id = self.root.after(self.frame_ms, self._frame)
+
+    def stop(self):
+        """Detener el ciclo de frames"""
+        self.running = False
+        if self._after_id:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def flush(self):
+        """Aplicar inmediatamente todo lo pendiente (hilo de Tk)"""
+        for channel, drain in self._sources.items():
+            texts = drain()
+            if texts:
+                self._apply_texts(channel, texts)
+
+        with self._lock:
+            ops, self._ops = self._ops, []
+            latest, self._latest = self._latest, {}
+        if not ops and not latest:
+            return
+
+        start = time.perf_counter()
+        pending_channel, pending_texts = None, []
+        for channel, payload in ops:
+            if channel is not None and channel == pending_channel:
+                pending_texts.append(payload)
+                continue
+            self._apply_texts(pending_channel, pending_texts)
+            pending_channel, pending_texts = None, []
+            if channel is None:
+                func, args = payload
+                self._run(func, *args)
+            else:
+                pending_channel, pending_texts = channel, [payload]
+        self._apply_texts(pending_channel, pending_texts)
+
+        for channel, value in latest.items():
+            handler = self._handlers.get(channel)
+            if handler:
+                self._run(handler, value)
+
+        self.frames += 1
+        self.queue_lengths.append(len(ops) + len(latest))
+        self.frame_times.append(time.perf_counter() - start)
+
+    def summary(self):
+        """Resumen de la coalescencia: mutaciones, frames, cola y tiempo por frame"""
+        lengths = list(self.queue_lengths)
+        times = list(self.frame_times)
+        return {
+            'mutations': self.posted,
+            'frames': self.frames,
+            'queue_mean': sum(lengths) / len(lengths) if lengths else 0.0,
+            'queue_max': max(lengths) if lengths else 0,
+            'frame_mean_ms': sum(times) / len(times) * 1000 if times else 0.0,
+            'frame_max_ms': max(times) * 1000 if times else 0.0,
+        }
+
+    def _apply_texts(self, channel, texts):
+        if channel is None or not texts:
+            return
+        handler = self._handlers.get(channel)
+        if handler:
+            self._run(handler, texts)
+
+    def _run(self, func, *args):
+        try:
+            func(*args)
+        except Exception as e:
+            logging.getLogger('VoiceBridge').error(f"Error aplicando actualización de UI: {e}")
+
+    def _frame(self):
+        self.flush()
+        for tick in self._ticks:
+            self._run(tick)
+        if self.running:
+            self._after_id = self.root.after(self.frame_ms, self._frame)
+
+
+# ===== VIGILANCIA DEL BUCLE DE TK =====
+TK_LAG_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class TkStallWatchdog:
+    """Detecta bloqueos del hilo de Tk y los atribuye a la línea de código culpable
+
+    Un latido ``root.after`` cada ``interval_ms`` registra su retraso respecto a lo
+    previsto en un histograma (latencia del bucle). Un hilo vigilante mira la edad
+    del último latido; si supera ``threshold_ms`` captura la pila del hilo principal
+    con ``sys._current_frames`` y la repite cada ``threshold_ms`` mientras dure el
+    bloqueo. Cuando el latido vuelve, el bloqueo queda registrado con su duración,
+    sus pilas y la línea de este archivo más interna en la que estaba el hilo.
+    """
+
+    STACK_DEPTH = 30
+
+    def __init__(self, root, registry=None, threshold_ms=250, interval_ms=100, logger=None,
+                 capacity=100):
+        self.root = root
+        self.threshold = threshold_ms / 1000
+        self.interval_ms = interval_ms
+        self.logger = logger or logging.getLogger('VoiceBridge')
+        registry = registry if registry is not None else MetricsRegistry()
+        self.lag = registry.histogram('tk_loop_lag_seconds', "Retraso del latido del bucle de Tk",
+                                      TK_LAG_BUCKETS)
+        self.stall_counter = registry.counter('tk_stalls',
+                                              "Bloqueos del hilo de Tk por encima del umbral")
+        self.stalls = deque(maxlen=capacity)
+        self.max_lag = 0.0
+        self._main_ident = None
+        self._last_beat = None
+        self._current = None
+        self._after_id = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Iniciar latido y vigilante (desde el hilo de Tk)"""
+        self._main_ident = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._after_id = self.root.after(self.interval_ms, self._beat)
+        self._thread = threading.Thread(target=self._watch, name='tk-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._after_id:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    def _beat(self):
+        now = time.perf_counter()
+        with self._lock:
+            lag = max(0.0, now - self._last_beat - self.interval_ms / 1000)
+            self._last_beat = now
+            stall, self._current = self._current, None
+        self.lag.observe(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if stall is not None:
+            stall['duration'] = lag
+            self.stalls.append(stall)
+            self.stall_counter.inc()
+            self.logger.warning(f"Tk bloqueado {lag * 1000:.0f} ms en {stall['where']}")
+            if stall['stacks']:
+                self.logger.debug("Pila del hilo de Tk durante el bloqueo:\n"
+                                  + "".join(stall['stacks'][0].format()))
+        if not self._stop.is_set():
+            self._after_id = self.root.after(self.interval_ms, self._beat)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval_ms / 2000):
+            with self._lock:
+                now = time.perf_counter()
+                late = now - self._last_beat - self.interval_ms / 1000
+                if late < self.threshold:
+                    continue
+                stall = self._current
+                if stall is not None and now - stall['captured'] < self.threshold:
+                    continue
+                stack = self.capture_stack()
+                if stack is None:
+                    continue
+                if stall is None:
+                    stall = self._current = {'started': time.time() - late, 'stacks': [],
+                                             'where': self.culprit(stack)}
+                    self.logger.warning(f"Tk sin responder desde hace {late * 1000:.0f} ms "
+                                        f"en {stall['where']}")
+                stall['captured'] = now
+                stall['stacks'].append(stack)
+
+    def capture_stack(self):
+        """Pila actual del hilo de Tk (``StackSummary``) o None"""
+        frame = sys._current_frames().get(self._main_ident)
+        if frame is None:
+            return None
+        stack = traceback.StackSummary.extract(traceback.walk_stack(frame), limit=self.STACK_DEPTH)
+        return traceback.StackSummary.from_list(stack[::-1])
+
+    @staticmethod
+    def culprit(stack):
+        """'archivo:línea (función)' del marco más interno de la aplicación"""
+        own = os.path.basename(__file__)
+        frames = [frame for frame in stack if os.path.basename(frame.filename) == own] or stack[-1:]
+        if not frames:
+            return "?"
+        frame = frames[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} ({frame.name})"
+
+    def summary_lines(self):
+        """Bloqueos agrupados por línea culpable, de mayor a menor tiempo total"""
+        by_line = {}
+        for stall in list(self.stalls):
+            count, total = by_line.get(stall['where'], (0, 0.0))
+            by_line[stall['where']] = (count + 1, total + stall['duration'])
+        return [f"{where}: {count} bloqueos, {total * 1000:.0f} ms en total"
+                for where, (count, total) in sorted(by_line.items(), key=lambda item: -item[1][1])]
+
+
+# ===== PERFILADOR POR MUESTREO =====
+class SamplingProfiler:
+    """Perfilador por muestreo de todos los hilos, activable en plena sesión
+
+    Un hilo propio toma ``sys._current_frames()`` ``hz`` veces por segundo y cuenta
+    las pilas plegadas ("hilo;función (archivo:línea);…"), el formato que leen
+    flamegraph.pl, inferno o speedscope. Se mide el coste de cada muestra: si la
+    fracción del tiempo dedicada a muestrear supera ``max_overhead`` se alarga el
+    intervalo, de modo que el sobrecoste queda acotado aunque haya muchos hilos.
+    """
+
+    MAX_DEPTH = 64
+    MAX_INTERVAL = 1.0
+    # Hojas de hilos en espera (colas, eventos, joins): no cuentan como trabajo
+    IDLE_FILES = ('threading.py:', 'queue.py:', 'selectors.py:')
+
+    def __init__(self, hz=100, max_overhead=0.03, out_dir='logs', logger=None):
+        self.hz = hz
+        self.max_overhead = max_overhead
+        self.out_dir = out_dir
+        self.logger = logger or logging.getLogger('VoiceBridge')
+        self.running = False
+        self.stacks = {}
+        self.samples = 0
+        self.sample_time = 0.0
+        self.started = None
+        self.interval = 1.0 / hz
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Empezar a muestrear (descarta el perfil anterior)"""
+        if self.running:
+            return
+        self.stacks = {}
+        self.samples = 0
+        self.sample_time = 0.0
+        self.interval = 1.0 / self.hz
+        self.started = time.perf_counter()
+        self.running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Dejar de muestrear y escribir el perfil; devuelve su resumen"""
+        if not self.running:
+            return None
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.running = False
+        elapsed = time.perf_counter() - self.started
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = self.write(os.path.join(self.out_dir, f"profile_{stamp}.folded"))
+        return {
+            'path': path,
+            'samples': self.samples,
+            'seconds': elapsed,
+            'effective_hz': self.samples / elapsed if elapsed else 0.0,
+            'overhead': self.sample_time / elapsed if elapsed else 0.0,
+        }
+
+    def toggle(self):
+        """Arrancar o detener; devuelve el resumen al detener"""
+        if self.running:
+            return self.stop()
+        self.start()
+        return None
+
+    def _run(self):
+        own = threading.get_ident()
+        stacks = self.stacks
+        names = {}
+        while True:
+            start = time.perf_counter()
+            frames = sys._current_frames()
+            # Los nombres de hilo solo se releen cuando aparece uno nuevo
+            if not names.keys() >= frames.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in frames.items():
+                if ident != own:
+                    key = self._collapse(names.get(ident, f"hilo-{ident}"), frame)
+                    stacks[key] = stacks.get(key, 0) + 1
+            frames = frame = None
+            self.samples += 1
+            cost = time.perf_counter() - start
+            self.sample_time += cost
+            # Sobrecoste acumulado por encima del presupuesto: muestrear con menos frecuencia
+            if self.sample_time > self.max_overhead * (start + cost - self.started):
+                self.interval = min(self.MAX_INTERVAL, self.interval * 1.5)
+            if self._stop.wait(max(0.0, self.interval - cost)):
+                break
+
+    def _collapse(self, thread_name, frame):
+        labels = self._labels
+        parts = []
+        while frame is not None and len(parts) < self.MAX_DEPTH:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = (f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+                                        f"{code.co_firstlineno})").replace(';', ',')
+            parts.append(label)
+            frame = frame.f_back
+        parts.append(thread_name.replace(';', ','))
+        return ";".join(reversed(parts))
+
+    def top_functions(self, count=5):
+        """Funciones con más muestras propias (hoja de la pila) sin contar esperas
+
+        Devuelve ``[(función, fracción)]``.
+        """
+        leaves = {}
+        total = 0
+        for stack, samples in list(self.stacks.items()):
+            leaf = stack.rsplit(';', 1)[-1]
+            if any(idle in leaf for idle in self.IDLE_FILES):
+                continue
+            leaves[leaf] = leaves.get(leaf, 0) + samples
+            total += samples
+        ranked = sorted(leaves.items(), key=lambda item: -item[1])[:count]
+        return [(leaf, samples / total) for leaf, samples in ranked] if total else []
+
+    def write(self, path):
+        """Escribir las pilas plegadas ("pila cuenta" por línea)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, samples in sorted(self.stacks.items()):
+                f.write(f"{stack} {samples}\n")
+        return path
+
+
+# ===== CARRIL DE TEXTO PARCIAL =====
+class PartialTextLane:
+    """Muestra la hipótesis parcial más reciente con una tasa de render limitada
+
+    El SDK solo sobrescribe un slot (asignación atómica); la UI renderiza como
+    mucho ``max_hz`` veces por segundo y redibuja únicamente la cola que cambió
+    respecto a lo que ya está en pantalla.
+    """
+
+    def __init__(self, widget, max_hz=10):
+        self.widget = widget
+        self.min_interval = 1.0 / max_hz if max_hz > 0 else 0.0
+        self._slot = None
+        self._displayed = ""
+        self._last_render = 0.0
+        self.renders = 0
+
+    def update(self, text):
+        """Guardar la última hipótesis (desde cualquier hilo)"""
+        self._slot = text
+
+    def clear(self):
+        """Vaciar el carril cuando llega el resultado final"""
+        self._slot = ""
+
+    def render(self):
+        """Redibujar si hay una hipótesis nueva y ya pasó el intervalo mínimo (hilo de Tk)"""
+        text = self._slot
+        if text is None or text == self._displayed:
+            return
+        now = time.monotonic()
+        if text and now - self._last_render < self.min_interval:
+            return
+
+        # Prefijo común: solo se reemplaza la cola que cambió
+        common = 0
+        limit = min(len(text), len(self._displayed))
+        while common < limit and text[common] == self._displayed[common]:
+            common += 1
+
+        self.widget.configure(state='normal')
+        self.widget.delete(f"1.0 + {common} chars", tk.END)
+        self.widget.insert(tk.END, text[common:])
+        self.widget.see(tk.END)
+        self.widget.configure(state='disabled')
+
+        self._displayed = text
+        self._last_render = now
+        self.renders += 1
+
+
+# ===== MOTORES DE RECONOCIMIENTO =====
+class RecognitionEvent:
+    """Evento de reconocimiento independiente del motor
+
+    ``offset`` y ``duration`` van en unidades de 100 ns desde el inicio del flujo, como
+    en el SDK de Azure, y ``json`` es el resultado detallado (N-best) si lo hay. En las
+    cancelaciones ``reason`` es la causa y ``error`` el detalle cuando la causa es un error.
+    """
+
+    __slots__ = ('kind', 'text', 'offset', 'duration', 'json', 'reason', 'error')
+
+    def __init__(self, kind, text='', offset=0, duration=0, json=None, reason=None, error=None):
+        self.kind = kind
+        self.text = text
+        self.offset = offset
+        self.duration = duration
+        self.json = json
+        self.reason = reason
+        self.error = error
+
+    def to_dict(self):
+        data = {'event': self.kind}
+        for name in ('text', 'offset', 'duration', 'json', 'reason'):
+            value = getattr(self, name)
+            if value:
+                data[name] = value
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['event'], data.get('text', ''), data.get('offset', 0),
+                   data.get('duration', 0), data.get('json'), data.get('reason'), data.get('error'))
+
+    def audio_span(self):
+        """(inicio_s, fin_s) del audio de la frase en el flujo, o None sin duración"""
+        if not self.duration:
+            return None
+        return self.offset / 1e7, (self.offset + self.duration) / 1e7
+
+
+class EngineSignal:
+    """Evento de un motor: manejadores con ``connect``/``disconnect_all`` como en el SDK"""
+
+    def __init__(self):
+        self._handlers = []
+
+    def connect(self, handler):
+        self._handlers.append(handler)
+
+    def disconnect_all(self):
+        self._handlers = []
+
+    def fire(self, evt):
+        for handler in self._handlers:
+            handler(evt)
+
+
+class RecognitionEngine(abc.ABC):
+    """Interfaz común de los motores de reconocimiento
+
+    Expone ``start()``/``stop()`` y los eventos ``recognizing``, ``recognized``,
+    ``canceled``, ``session_started`` y ``session_stopped``. Los manejadores reciben
+    siempre un RecognitionEvent, sea cual sea el motor que lo produce. Un motor que
+    no implemente ``start`` o ``stop`` no se puede instanciar.
+    """
+
+    EVENTS = ('recognizing', 'recognized', 'canceled', 'session_started', 'session_stopped')
+    name = None
+
+    def __init__(self):
+        for event in self.EVENTS:
+            setattr(self, event, EngineSignal())
+
+    @abc.abstractmethod
+    def start(self):
+        """Empezar a reconocer; los eventos llegan por las señales del motor"""
+
+    @abc.abstractmethod
+    def stop(self):
+        """Dejar de reconocer (la sesión termina con ``session_stopped``)"""
+
+    def emit(self, evt):
+        getattr(self, evt.kind).fire(evt)
+
+    def disconnect_all(self):
+        for event in self.EVENTS:
+            getattr(self, event).disconnect_all()
+
+
+class AzureRecognitionEngine(RecognitionEngine):
+    """Adaptador del SpeechRecognizer de Azure a la interfaz de motor"""
+
+    name = 'azure'
+
+    def __init__(self, speech_config, audio_config=None):
+        super().__init__()
+        if speechsdk is None:
+            raise RuntimeError("Azure Speech SDK no está instalado")
+        if audio_config is None:
+            self.recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config)
+        else:
+            self.recognizer = speechsdk.SpeechRecognizer(speech_config=speech_config,
+                                                         audio_config=audio_config)
+        self.recognizer.recognizing.connect(
+            lambda evt: self.emit(RecognitionEvent('recognizing', evt.result.text,
+                                                   evt.result.offset, evt.result.duration)))
+        self.recognizer.recognized.connect(
+            lambda evt: self.emit(RecognitionEvent('recognized', evt.result.text,
+                                                   evt.result.offset, evt.result.duration,
+                                                   getattr(evt.result, 'json', None))))
+        self.recognizer.canceled.connect(self._on_canceled)
+        self.recognizer.session_started.connect(
+            lambda evt: self.emit(RecognitionEvent('session_started')))
+        self.recognizer.session_stopped.connect(
+            lambda evt: self.emit(RecognitionEvent('session_stopped')))
+
+    def _on_canceled(self, evt):
+        details = evt.result.cancellation_details
+        error = None
+        if details.reason == speechsdk.CancellationReason.Error:
+            error = details.error_details or ''
+        self.emit(RecognitionEvent('canceled', reason=details.reason.name, error=error))
+
+    def start(self):
+        self.recognizer.start_continuous_recognition()
+
+    def stop(self):
+        self.recognizer.stop_continuous_recognition()
+
+    def disconnect_all(self):
+        super().disconnect_all()
+        for event in self.EVENTS:
+            getattr(self.recognizer, event).disconnect_all()
+
+    @staticmethod
+    def push_input(sample_rate):
+        """Entrada por flujo push PCM 16 bits mono: ``(audio_config, flujo)``"""
+        stream_format = speechsdk.audio.AudioStreamFormat(
+            samples_per_second=sample_rate, bits_per_sample=16, channels=1)
+        stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format)
+        return speechsdk.audio.AudioConfig(stream=stream), stream
+
+    @staticmethod
+    def check_connection(key, region, language):
+        """Crear un reconocedor temporal con las credenciales; lanza excepción si fallan"""
+        if speechsdk is None:
+            raise RuntimeError("Azure Speech SDK no está instalado")
+        config = speechsdk.SpeechConfig(subscription=key, region=region)
+        config.speech_recognition_language = language
+        speechsdk.SpeechRecognizer(speech_config=config)
+
+
+class ReplayRecognitionEngine(RecognitionEngine):
+    """Motor que reproduce una traza de eventos grabada (JSONL) a 1× o N× de velocidad
+
+    Cada línea es un evento con ``t`` (segundos desde el inicio de la traza) y los
+    campos de RecognitionEvent. Los eventos salen en un único hilo y en el orden de la
+    traza, así que dos reproducciones entregan la misma secuencia al pipeline. Con
+    ``speed=0`` se emiten sin esperas.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path, speed=1.0):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.trace = self.load(path)
+        self.events_played = 0
+        self.max_lag_ms = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def load(path):
+        """Pares ``(t, RecognitionEvent)`` de la traza ordenados por tiempo"""
+        trace = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    data = json.loads(line)
+                    trace.append((float(data.get('t', 0.0)), RecognitionEvent.from_dict(data)))
+        trace.sort(key=lambda item: item[0])
+        return trace
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='replay-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=2.0)
+
+    def wait(self, timeout=None):
+        """Esperar al final de la reproducción; True si ha terminado"""
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+        return not (thread and thread.is_alive())
+
+    def _run(self):
+        last = None
+        if not self.trace or self.trace[0][1].kind != 'session_started':
+            self.emit(RecognitionEvent('session_started'))
+        start = time.monotonic()
+        for t, evt in self.trace:
+            if self.speed > 0:
+                due = start + t / self.speed
+                delay = due - time.monotonic()
+                if delay > 0 and self._stop.wait(delay):
+                    break
+                self.max_lag_ms = max(self.max_lag_ms, (time.monotonic() - due) * 1000)
+            if self._stop.is_set():
+                break
+            self.emit(evt)
+            self.events_played += 1
+            last = evt.kind
+        # Como el SDK, toda sesión (completa o detenida) termina con session_stopped
+        if last != 'session_stopped':
+            self.emit(RecognitionEvent('session_stopped'))
+
+
+class TraceRecorder:
+    """Graba los eventos de uno o varios motores como traza JSONL para ReplayRecognitionEngine"""
+
+    def __init__(self, path):
+        self.path = path
+        self.events = 0
+        self._start = None
+        self._lock = threading.Lock()
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def attach(self, engine):
+        for event in engine.EVENTS:
+            getattr(engine, event).connect(self.record)
+
+    def record(self, evt):
+        now = time.monotonic()
+        with self._lock:
+            if self._file is None:
+                return
+            if self._start is None:
+                self._start = now
+            data = {'t': round(now - self._start, 3)}
+            data.update(evt.to_dict())
+            self._file.write(json.dumps(data, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self.events += 1
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+
+# ===== CAPTURA DE AUDIO =====
+class WavFileSource:
+    """Fuente de audio desde un archivo WAV PCM de 16 bits mono (pruebas y re-reconocimiento)"""
+
+    def __init__(self, path, realtime=False):
+        self._wav = wave.open(path, 'rb')
+        if self._wav.getsampwidth() != 2 or self._wav.getnchannels() != 1:
+            self._wav.close()
+            raise ValueError(f"Se requiere WAV PCM 16 bits mono: {path}")
+        self.sample_rate = self._wav.getframerate()
+        self.realtime = realtime
+        self._next_read = None
+
+    def read(self, samples):
+        """Hasta ``samples`` muestras en bytes (b'' al final del archivo)"""
+        if self.realtime:
+            # Simular el ritmo de un micrófono
+            now = time.monotonic()
+            if self._next_read is not None and now < self._next_read:
+                time.sleep(self._next_read - now)
+            self._next_read = max(now, self._next_read or now) + samples / self.sample_rate
+        return self._wav.readframes(samples)
+
+    def close(self):
+        self._wav.close()
+
+
+class MicrophoneSource:
+    """Micrófono por defecto: PyAudio si está instalado, si no ``parec`` (PulseAudio/PipeWire)"""
+
+    def __init__(self, sample_rate=16000, frame_samples=480):
+        self.sample_rate = sample_rate
+        self._pyaudio = None
+        self._stream = None
+        self._process = None
+        if pyaudio is not None:
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate,
+                                              input=True, frames_per_buffer=frame_samples)
+        else:
+            self._process = subprocess.Popen(
+                ['parec', '--format=s16le', f'--rate={sample_rate}', '--channels=1',
+                 '--latency-msec=30'],
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(self, samples):
+        if self._stream is not None:
+            return self._stream.read(samples, exception_on_overflow=False)
+        return self._process.stdout.read(samples * 2)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pyaudio.terminate()
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+
+
+class AudioRingBuffer:
+    """Buffer circular preasignado de muestras int16 (un productor)"""
+
+    def __init__(self, capacity):
+        self.samples = np.zeros(capacity, dtype=np.int16)
+        self.capacity = capacity
+        self.position = 0
+        self.written = 0
+
+    def write(self, frame):
+        count = len(frame)
+        if count >= self.capacity:
+            frame = frame[-self.capacity:]
+            count = self.capacity
+        end = self.position + count
+        if end <= self.capacity:
+            self.samples[self.position:end] = frame
+        else:
+            split = self.capacity - self.position
+            self.samples[self.position:] = frame[:split]
+            self.samples[:end - self.capacity] = frame[split:]
+        self.position = end % self.capacity
+        self.written += count
+
+    def latest(self, count):
+        """Copia de las últimas ``count`` muestras escritas"""
+        count = min(count, self.capacity, self.written)
+        start = (self.position - count) % self.capacity
+        if start + count <= self.capacity:
+            return self.samples[start:start + count].copy()
+        return np.concatenate((self.samples[start:], self.samples[:self.position]))
+
+
+class EnergyVAD:
+    """Detector de actividad de voz por energía con suelo de ruido adaptativo
+
+    Como el VAD de WebRTC decide por tramas de 30 ms con histéresis: la voz
+    empieza tras ``onset_frames`` tramas sobre el umbral y termina tras
+    ``hangover_ms`` de tramas por debajo, para no cortar finales de palabra.
+    """
+
+    def __init__(self, frame_ms=30, threshold_db=10.0, hangover_ms=300, onset_frames=2,
+                 initial_floor_db=-60.0, floor_adapt=0.05):
+        self.threshold_db = threshold_db
+        self.hangover_frames = max(1, int(hangover_ms / frame_ms))
+        self.onset_frames = onset_frames
+        self.noise_floor = initial_floor_db
+        self.floor_adapt = floor_adapt
+        self.speaking = False
+        self._above = 0
+        self._below = 0
+        self.voiced_frames = 0
+        self.total_frames = 0
+
+    @staticmethod
+    def level_dbfs(frame):
+        if not len(frame):
+            return -100.0
+        samples = frame.astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        return 20.0 * math.log10(rms / 32768.0 + 1e-10)
+
+    def update(self, level):
+        """Decidir si la trama de nivel ``level`` (dBFS) es voz"""
+        self.total_frames += 1
+        if level > self.noise_floor + self.threshold_db:
+            self._above += 1
+            self._below = 0
+            if self._above >= self.onset_frames:
+                self.speaking = True
+        else:
+            self._above = 0
+            self._below += 1
+            if self._below >= self.hangover_frames:
+                self.speaking = False
+            if not self.speaking:
+                # El suelo de ruido solo se aprende en silencio
+                self.noise_floor += self.floor_adapt * (level - self.noise_floor)
+        if self.speaking:
+            self.voiced_frames += 1
+        return self.speaking
+
+
+class AudioCapture:
+    """Captura propia: fuente → buffer circular → VAD → sumidero (p. ej. PushAudioInputStream)
+
+    Solo las tramas con voz (más ``preroll_ms`` previos) llegan al sumidero. Como
+    los offsets del reconocedor cuentan solo el audio enviado, ``onsets`` guarda
+    para cada inicio de voz la muestra enviada y la capturada, y
+    ``capture_offset_ms`` traduce un offset del reconocedor al audio grabado.
+    Mientras ``gate()`` sea cierto (p. ej. suena la síntesis de voz) no se envía nada.
+    """
+
+    def __init__(self, source, sink, sample_rate=16000, frame_ms=30, vad=None,
+                 preroll_ms=300, ring_seconds=30, record_path=None, on_level=None, on_end=None,
+                 gate=None):
+        self.source = source
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.frame_samples = sample_rate * frame_ms // 1000
+        self.vad = vad or EnergyVAD(frame_ms=frame_ms)
+        self.preroll_samples = sample_rate * preroll_ms // 1000
+        self.ring = AudioRingBuffer(sample_rate * ring_seconds)
+        self.record_path = record_path
+        self.on_level = on_level
+        self.on_end = on_end
+        self.gate = gate
+        self.level = -100.0
+        self.sent_samples = 0
+        self.send_position = 0
+        self._sink_lock = threading.Lock()
+        self.onsets_sent = array('q')
+        self.onsets_captured = array('q')
+        self._recorder = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        if self.record_path:
+            self._recorder = wave.open(self.record_path, 'wb')
+            self._recorder.setnchannels(1)
+            self._recorder.setsampwidth(2)
+            self._recorder.setframerate(self.sample_rate)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='audio-capture', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
+
+    def redirect(self, sink, new_stream=False):
+        """Cambiar el sumidero (p. ej. al spool si el reconocedor cae); devuelve el anterior
+
+        Con ``new_stream`` los offsets del reconocedor vuelven a contar desde cero.
+        """
+        with self._sink_lock:
+            previous, self.sink = self.sink, sink
+            if new_stream:
+                self.sent_samples = 0
+                self.onsets_sent = array('q', [0])
+                self.onsets_captured = array('q', [self.ring.written])
+        return previous
+
+    def capture_offset_ms(self, sent_ms):
+        """Offset en el audio capturado para un offset del audio enviado al reconocedor"""
+        sent = sent_ms * self.sample_rate // 1000
+        index = bisect.bisect_right(self.onsets_sent, sent) - 1
+        if index < 0:
+            return sent_ms
+        captured = self.onsets_captured[index] + (sent - self.onsets_sent[index])
+        return captured * 1000 // self.sample_rate
+
+    def _run(self):
+        try:
+            while self._running:
+                data = self.source.read(self.frame_samples)
+                if not data:
+                    break
+                if len(data) % 2:
+                    data = data[:-1]
+                frame = np.frombuffer(data, dtype=np.int16)
+                if self._recorder is not None:
+                    self._recorder.writeframes(data)
+
+                was_speaking = self.vad.speaking
+                self.level = EnergyVAD.level_dbfs(frame)
+                if self.gate is not None and self.gate():
+                    # La propia voz de la aplicación: ni se envía ni enseña el suelo de ruido al VAD
+                    self.vad.speaking = speaking = False
+                else:
+                    speaking = self.vad.update(self.level)
+                if speaking and not was_speaking:
+                    # Inicio de voz: enviar también el audio previo del buffer circular
+                    preroll = self.ring.latest(self.preroll_samples)
+                    self.onsets_sent.append(self.sent_samples)
+                    self.onsets_captured.append(self.ring.written - len(preroll))
+                    self._send(preroll.tobytes(), self.ring.written - len(preroll))
+                self.ring.write(frame)
+                if speaking:
+                    self._send(data, self.ring.written - len(frame))
+                if self.on_level:
+                    self.on_level(self.level)
+        except Exception as e:
+            logging.getLogger('VoiceBridge').error(f"Error en captura de audio: {e}")
+        finally:
+            self._running = False
+            if self.on_end:
+                self.on_end()
+
+    def _send(self, data, position):
+        if data:
+            with self._sink_lock:
+                # Muestra capturada del inicio de ``data`` (la usa el spool)
+                self.send_position = position
+                self.sink(data)
+            self.sent_samples += len(data) // 2
+
+
+# ===== ALMACENAMIENTO Y REENVÍO DE AUDIO =====
+class AudioSpool:
+    """Buffer en disco (mmap) del audio capturado mientras el reconocedor no está disponible
+
+    Se escribe por bloques; para cada bloque se guarda su posición en el archivo,
+    la hora de captura y la muestra capturada, de modo que los resultados del
+    reenvío recuperan su instante real. Si se llena, el audio nuevo se descarta.
+    """
+
+    def __init__(self, path, capacity_bytes, sample_rate=16000):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.capacity = capacity_bytes
+        with open(path, 'wb') as f:
+            f.truncate(capacity_bytes)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), capacity_bytes)
+        self.write_pos = 0
+        self.read_pos = 0
+        self.dropped_bytes = 0
+        self.chunk_offsets = array('q')
+        self.chunk_times = array('d')
+        self.chunk_samples = array('q')
+        self._lock = threading.Lock()
+
+    def write(self, data, capture_sample=-1):
+        with self._lock:
+            room = self.capacity - self.write_pos
+            if len(data) > room:
+                self.dropped_bytes += len(data) - room
+                data = data[:room]
+            if not data:
+                return
+            self.chunk_offsets.append(self.write_pos)
+            self.chunk_times.append(time.time())
+            self.chunk_samples.append(capture_sample)
+            self._map[self.write_pos:self.write_pos + len(data)] = data
+            self.write_pos += len(data)
+
+    def pending(self):
+        with self._lock:
+            return self.write_pos - self.read_pos
+
+    def read(self, max_bytes=None):
+        """Siguiente tramo pendiente de reenviar (b'' si no hay)"""
+        with self._lock:
+            end = self.write_pos
+            if max_bytes is not None:
+                end = min(end, self.read_pos + max_bytes)
+            data = self._map[self.read_pos:end]
+            self.read_pos = end
+        return data
+
+    def rewind(self, position):
+        """Volver a reenviar desde ``position`` (p. ej. tras un fallo del reenvío)"""
+        with self._lock:
+            self.read_pos = max(0, min(position, self.write_pos))
+
+    def _chunk(self, byte_offset):
+        return max(0, bisect.bisect_right(self.chunk_offsets, byte_offset) - 1)
+
+    def time_at(self, byte_offset):
+        """Hora de captura del byte ``byte_offset`` del spool"""
+        if not self.chunk_offsets:
+            return time.time()
+        index = self._chunk(byte_offset)
+        elapsed = (byte_offset - self.chunk_offsets[index]) / 2 / self.sample_rate
+        return self.chunk_times[index] + elapsed
+
+    def capture_offset_ms(self, spool_ms):
+        """Offset en el audio capturado para un offset (ms) del spool"""
+        byte_offset = spool_ms * self.sample_rate // 1000 * 2
+        if not self.chunk_offsets:
+            return spool_ms
+        index = self._chunk(byte_offset)
+        if self.chunk_samples[index] < 0:
+            return spool_ms
+        sample = self.chunk_samples[index] + (byte_offset - self.chunk_offsets[index]) // 2
+        return sample * 1000 // self.sample_rate
+
+    def close(self, remove=True):
+        self._map.close()
+        if not remove:
+            self._file.truncate(self.write_pos)
+        self._file.close()
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class SpoolForwarder:
+    """Reconocimiento del audio acumulado con un reconocedor dedicado, más rápido que tiempo real
+
+    ``make_recognizer()`` devuelve ``(motor, flujo)``: un RecognitionEngine y un flujo
+    con ``write``/``close`` que lo alimenta. El spool se empuja sin pausas; cuando
+    está vacío se llama a ``caught_up()``, que debe desviar la captura al
+    reconocedor en vivo, y se empuja el resto. Cada resultado llega a
+    ``on_result(texto, hipótesis, hora)``.
+    """
+
+    CHUNK_SECONDS = 5
+
+    def __init__(self, spool, make_recognizer, on_result, caught_up, timeout=60.0):
+        self.spool = spool
+        self.make_recognizer = make_recognizer
+        self.on_result = on_result
+        self.caught_up = caught_up
+        self.timeout = timeout
+        self.results = 0
+        self.failed = False
+        self.confirmed_pos = spool.read_pos
+        self._start_pos = spool.read_pos
+        self._done = threading.Event()
+
+    def run(self):
+        """Reenviar todo el spool; devuelve False si el reconocedor falló (spool rebobinado)"""
+        engine, stream = self.make_recognizer()
+        engine.recognized.connect(self._on_recognized)
+        engine.canceled.connect(self._on_canceled)
+        engine.session_stopped.connect(lambda evt: self._done.set())
+        engine.start()
+
+        chunk_bytes = self.spool.sample_rate * 2 * self.CHUNK_SECONDS
+        switched = False
+        while not self.failed:
+            data = self.spool.read(chunk_bytes)
+            if data:
+                stream.write(data)
+            elif switched:
+                break
+            else:
+                switched = self.caught_up()
+                if not switched:
+                    time.sleep(0.05)
+        stream.close()
+        self._done.wait(self.timeout)
+        try:
+            engine.stop()
+        except Exception:
+            pass
+
+        if self.failed:
+            self.spool.rewind(self.confirmed_pos)
+            return False
+        return True
+
+    def _on_recognized(self, evt):
+        text = evt.text
+        # Offset y duración en unidades de 100 ns desde el inicio del flujo
+        end_ms = (evt.offset + evt.duration) // 10000
+        self.confirmed_pos = self._start_pos + end_ms * self.spool.sample_rate // 1000 * 2
+        if not text or not text.strip():
+            return
+        start_pos = self._start_pos + evt.offset // 10000 * self.spool.sample_rate // 1000 * 2
+        spoken_at = self.spool.time_at(start_pos)
+        hypotheses = HypothesisRescorer.parse_nbest(evt.json)
+        base_ms = self._start_pos // 2 * 1000 // self.spool.sample_rate
+        hypotheses = [(hyp_text, confidence, words and [
+            (word, self.spool.capture_offset_ms(base_ms + offset), duration)
+            for word, offset, duration in words])
+            for hyp_text, confidence, words in hypotheses]
+        self.results += 1
+        self.on_result(text, hypotheses, spoken_at)
+
+    def _on_canceled(self, evt):
+        if evt.error is not None:
+            self.failed = True
+        self._done.set()
+
+
+# ===== SÍNTESIS DE VOZ =====
+TTS_OUTPUT_FORMAT = 'Riff16Khz16BitMonoPcm'
+
+# Confirmaciones habladas de las órdenes de voz: siempre las mismas frases
+TTS_CONFIRMATIONS = {
+    'start': "Escuchando",
+    'stop': "Dictado detenido",
+    'clear': "¿Confirmar borrado?",
+    'confirm_clear': "Transcripción borrada",
+    'save': "Sesión guardada",
+    'send': "Enviado a Claude",
+    'template': "Plantilla insertada",
+    'report': "Generando informe",
+}
+
+
+class TTSClip:
+    """Audio PCM de 16 bits ya decodificado, listo para reproducir"""
+
+    __slots__ = ('rate', 'channels', 'pcm')
+
+    def __init__(self, rate, channels, pcm):
+        self.rate = rate
+        self.channels = channels
+        self.pcm = pcm
+
+    @property
+    def seconds(self):
+        return len(self.pcm) / (2 * self.channels * self.rate)
+
+    @classmethod
+    def from_wav(cls, data):
+        with wave.open(io.BytesIO(data), 'rb') as wav:
+            if wav.getsampwidth() != 2:
+                raise wave.Error(f"se esperaba PCM de 16 bits, no de {wav.getsampwidth() * 8}")
+            return cls(wav.getframerate(), wav.getnchannels(), wav.readframes(wav.getnframes()))
+
+
+class TTSCache:
+    """Caché de audio sintetizado direccionada por contenido
+
+    La clave es el SHA-256 de voz, formato y texto (con los espacios normalizados).
+    Cada clip se guarda en disco tal como lo devuelve el servicio, en
+    ``<dir>/<clave[:2]>/<clave>.wav`` y con escritura atómica; los más usados, ya
+    decodificados, quedan además en un LRU en memoria acotado por clips y bytes.
+    El disco se poda al abrir por antigüedad de uso (el mtime se renueva en cada
+    acierto) hasta ``disk_bytes``.
+    """
+
+    def __init__(self, directory, memory_clips=32, memory_bytes=4 * 1024 * 1024,
+                 disk_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.memory_clips = memory_clips
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self.pruned = self.prune()
+
+    @staticmethod
+    def key(text, voice, fmt):
+        material = "\x00".join((voice, fmt, " ".join(text.split())))
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.wav')
+
+    def get(self, text, voice, fmt):
+        """Clip de memoria o de disco; None si hay que sintetizarlo"""
+        key = self.key(text, voice, fmt)
+        with self._lock:
+            clip = self._memory.get(key)
+            if clip is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return clip
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                clip = TTSClip.from_wav(f.read())
+            os.utime(path)
+        except (OSError, EOFError, wave.Error):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, clip)
+        return clip
+
+    def put(self, text, voice, fmt, audio):
+        """Guardar el audio devuelto por el servicio y devolverlo decodificado"""
+        clip = TTSClip.from_wav(audio)
+        key = self.key(text, voice, fmt)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._remember(key, clip)
+        return clip
+
+    def _remember(self, key, clip):
+        size = len(clip.pcm)
+        if size > self.memory_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_size -= len(previous.pcm)
+        self._memory[key] = clip
+        self._memory_size += size
+        while len(self._memory) > self.memory_clips or self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted.pcm)
+
+    def prune(self):
+        """Borrar temporales huérfanos y los clips menos usados por encima de ``disk_bytes``"""
+        entries = []
+        total = 0
+        removed = 0
+        for folder, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    if name.endswith('.tmp'):
+                        os.remove(path)
+                        continue
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+                total += info.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_clips': len(self._memory),
+                'memory_bytes': self._memory_size,
+            }
+
+
+class SpeakerSink:
+    """Salida por defecto: PyAudio si está instalado, si no ``pacat`` (PulseAudio/PipeWire)
+
+    Se abre una vez y se reutiliza para todos los clips del mismo formato: abrir
+    PyAudio enumera los dispositivos y añadiría esa espera a cada confirmación.
+    """
+
+    def __init__(self, rate, channels=1):
+        self.rate = rate
+        self.channels = channels
+        self._pyaudio = None
+        self._stream = None
+        self._process = None
+        if pyaudio is not None:
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(format=pyaudio.paInt16, channels=channels, rate=rate,
+                                              output=True)
+        else:
+            self._process = subprocess.Popen(
+                ['pacat', '--playback', '--format=s16le', f'--rate={rate}',
+                 f'--channels={channels}', '--latency-msec=30'],
+                stdin=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def write(self, data):
+        if self._stream is not None:
+            self._stream.write(data)
+        else:
+            self._process.stdin.write(data)
+
+    def close(self):
+        """Esperar a que suene lo escrito y liberar el dispositivo (hilo de TTS)"""
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._pyaudio.terminate()
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+                self._process.wait(timeout=10)
+            except (OSError, subprocess.TimeoutExpired):
+                self._process.kill()
+
+
+class TTSPlayer:
+    """Síntesis y reproducción en un hilo propio: ``say`` solo encola
+
+    El hilo busca el clip en la caché y, si falta, llama a
+    ``synthesize(text, voice, fmt)``, que devuelve el WAV (Azure en la aplicación).
+    Mientras suena, y ``tail_ms`` después por el eco de la sala, ``gated()`` es
+    cierto: la captura propia deja de enviar audio. Los intervalos reproducidos se
+    guardan para que el micrófono del SDK, cuyos resultados llegan tarde, decida
+    con ``covers`` según cuándo se dijo cada frase y no según cuándo llegó.
+    ``prefetch`` sintetiza sin reproducir, para que la primera confirmación ya
+    salga de la caché. La salida se abre una vez y se cierra tras ``IDLE_CLOSE``
+    segundos sin hablar.
+    """
+
+    CHUNK_SECONDS = 0.05
+    IDLE_CLOSE = 30.0
+
+    def __init__(self, synthesize, cache, voice, fmt=TTS_OUTPUT_FORMAT, registry=None, tail_ms=300,
+                 sink_factory=SpeakerSink, on_playing=None, logger=None, queue_size=8):
+        self.synthesize = synthesize
+        self.cache = cache
+        self.voice = voice
+        self.fmt = fmt
+        self.tail = tail_ms / 1000
+        self.sink_factory = sink_factory
+        self.on_playing = on_playing
+        self.logger = logger or logging.getLogger('VoiceBridge')
+        registry = registry if registry is not None else MetricsRegistry()
+        self.clips_played = registry.counter(
+            'tts_clips_played', "Clips de síntesis de voz reproducidos")
+        self.cache_hits = registry.counter(
+            'tts_cache_hits', "Clips de síntesis servidos desde la caché")
+        self.synthesized = registry.counter(
+            'tts_synthesized', "Clips pedidos al servicio de síntesis")
+        self.synthesis_latency = registry.histogram(
+            'tts_synthesis_seconds', "Duración de cada síntesis", LATENCY_BUCKETS)
+        self.dropped = registry.counter(
+            'tts_dropped', "Frases descartadas con la cola de síntesis llena")
+        self.gated_results = registry.counter(
+            'tts_gated_results', "Resultados reconocidos ignorados mientras hablaba la síntesis")
+        self.playing = False
+        self.played = deque(maxlen=32)
+        self._play_started = None
+        self._gate_until = 0.0
+        self._sink = None
+        self._sink_used = 0.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='tts', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        """Cortar la reproducción en curso (entre trozos) y terminar el hilo"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def say(self, text):
+        return self._enqueue(text, True)
+
+    def prefetch(self, texts):
+        for text in texts:
+            self._enqueue(text, False)
+
+    def _enqueue(self, text, play):
+        if not text or not text.strip():
+            return False
+        try:
+            self._queue.put_nowait((text, play))
+            return True
+        except queue.Full:
+            self.dropped.inc()
+            return False
+
+    def gated(self):
+        return self.playing or time.monotonic() < self._gate_until
+
+    def covers(self, start, end, fraction=0.5):
+        """[start, end] (monotónico) cae al menos en ``fraction`` dentro de una reproducción"""
+        intervals = list(self.played)
+        started = self._play_started
+        if started is not None:
+            intervals.append((started, math.inf))
+        length = max(end - start, 1e-3)
+        overlap = sum(max(0.0, min(end, stop + self.tail) - max(start, begin))
+                      for begin, stop in intervals)
+        return overlap >= fraction * length
+
+    def clip(self, text):
+        """Clip de la caché o recién sintetizado (y guardado)"""
+        clip = self.cache.get(text, self.voice, self.fmt)
+        if clip is not None:
+            self.cache_hits.inc()
+            return clip
+        start = time.perf_counter()
+        audio = self.synthesize(text, self.voice, self.fmt)
+        self.synthesis_latency.observe(time.perf_counter() - start)
+        self.synthesized.inc()
+        return self.cache.put(text, self.voice, self.fmt, audio)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    text, play = self._queue.get(timeout=0.2)
+                except queue.Empty:
+                    idle = time.monotonic() - self._sink_used
+                    if self._sink is not None and idle > self.IDLE_CLOSE:
+                        self._close_sink()
+                    continue
+                try:
+                    clip = self.clip(text)
+                    if play:
+                        self._play(clip)
+                except Exception as e:
+                    self.logger.error(f"Error de síntesis de voz ({text!r}): {e}")
+                    self._close_sink()
+        finally:
+            self._close_sink()
+
+    def _output(self, clip):
+        """Salida abierta para el formato del clip (se reabre solo si cambia)"""
+        sink = self._sink
+        if sink is not None:
+            rate = getattr(sink, 'rate', clip.rate)
+            if (rate, getattr(sink, 'channels', clip.channels)) != (clip.rate, clip.channels):
+                self._close_sink()
+        if self._sink is None:
+            self._sink = self.sink_factory(clip.rate, clip.channels)
+        return self._sink
+
+    def _close_sink(self):
+        sink, self._sink = self._sink, None
+        if sink is not None:
+            try:
+                sink.close()
+            except Exception as e:
+                self.logger.error(f"Error cerrando la salida de audio: {e}")
+
+    def _play(self, clip):
+        sink = self._output(clip)
+        self._play_started = started = time.monotonic()
+        self._set_playing(True)
+        try:
+            chunk = int(clip.rate * self.CHUNK_SECONDS) * 2 * clip.channels
+            for offset in range(0, len(clip.pcm), chunk):
+                if self._stop.is_set():
+                    break
+                sink.write(clip.pcm[offset:offset + chunk])
+            else:
+                # Una salida con buffer (pacat) acepta el audio antes de que suene
+                remaining = started + clip.seconds - time.monotonic()
+                if remaining > 0:
+                    self._stop.wait(remaining)
+                self.clips_played.inc()
+        finally:
+            ended = self._sink_used = time.monotonic()
+            self.played.append((started, ended))
+            # La ventana de cola empieza antes de soltar ``playing`` para que no quede hueco
+            self._gate_until = ended + self.tail
+            self._play_started = None
+            self._set_playing(False)
+
+    def _set_playing(self, playing):
+        self.playing = playing
+        if self.on_playing:
+            self.on_playing(playing)
 
 
 # ===== CLASE PRINCIPAL =====
@@ -380,6 +4583,10 @@ class VoiceBridge224:
         self.logger = setup_logger()
         self.logger.info(f"Iniciando Voice Bridge v{VERSION}")
 
+        # Log de la GUI: buffer circular que cualquier hilo puede alimentar
+        self.log_ring = LogRingBuffer(capacity=LOG_GUI_MAX_LINES)
+        self.log_lines = 0
+
         # Sistema de temas y componentes
         self.theme_system = ThemeSystem()
         self.medical_corrector = MedicalCorrector()
@@ -391,36 +4598,160 @@ class VoiceBridge224:
         self.is_speaking = False
         self.azure_ready = False
         self.recognition_paused = False
+        self.clear_armed_until = 0.0
 
         # Configuración
         self.config = {}
         self.load_config()
 
         # Integración Claude
-        self.claude = ClaudeIntegration(self.config.get('claude_api_key'))
+        self.claude = ClaudeIntegration.from_config(self.config)
+
+        # Exportación de métricas: endpoint Prometheus local e instantánea en logs/
+        self.metrics_exporter = MetricsExporter(
+            self.stats_collector.metrics,
+            port=self.config.get('metrics_port', 0),
+            snapshot_path=os.path.join('logs', 'metrics.prom'),
+            interval=self.config.get('metrics_snapshot_seconds', 60),
+            logger=self.logger
+        )
+        self.metrics_exporter.start()
 
-        # Componentes Azure (se inicializan después)
+        # Motor de reconocimiento y componentes Azure (se inicializan después)
         self.speech_config = None
         self.audio_config = None
-        self.speech_recognizer = None
+        self.recognition_engine = None
+        self.trace_recorder = None
         self.speech_synthesizer = None
+        self.tts = None
+        self.recognition_origin = None
+        self.push_stream = None
+        self.audio_capture = None
+        self.spool = None
+        # La captura escribe en el spool / el reconocedor en vivo cayó y no se ha reconectado
+        self.spool_receiving = False
+        self.recognizer_down = False
+        self.forwarding = False
+        # Los resultados en vivo esperan hasta que el reenvío del spool termine bien
+        self.hold_live = False
+        self.held_results = []
+        self.forward_lock = threading.Lock()
+
+        # Spans de latencia por frase (recepción → pipeline → widget → Claude)
+        self.tracer = PhraseTracer(enabled=self.config.get('latency_tracing', True))
+
+        # Buffer médico (gestionado por la etapa buffer del pipeline)
+        self.medical_pause_seconds = self.config.get('medical_pause_seconds', 2.0)
 
-        # Buffer médico
-        self.medical_buffer = ""
-        self.medical_pause_seconds = 2.0
-        self.buffer_timer = None
-
-        # Colas y threading
-        self.transcription_queue = queue.Queue()
         self.session_start = time.time()
         self.transcription_count = 0
 
+        # Modelo de transcripción con memoria acotada (segmentos antiguos en disco)
+        self.transcript = TranscriptModel(
+            memory_limit=self.config.get('transcript_memory_segments', 200))
+        self.journal = None
+        self.session_name = None
+        self.session_part = 0
+
+        # Biblioteca local de plantillas de informe
+        try:
+            self.templates = TemplateLibrary()
+        except Exception as e:
+            self.logger.error(f"Error cargando plantillas: {e}")
+            self.templates = None
+
+        # Rescoring N-best contra el léxico de patología
+        self.rescorer = None
+        if self.config.get('nbest_rescoring', True):
+            try:
+                self.rescorer = HypothesisRescorer(
+                    confidence_threshold=self.config.get('confidence_threshold', 0.2))
+                self.rescorer.load_dictionaries()
+                self.rescorer.add_phrases(self.medical_corrector.medical_terms.values())
+            except Exception as e:
+                self.logger.error(f"Rescoring N-best no disponible: {e}")
+                self.rescorer = None
+
+        # Normalización de formas habladas ("tres por dos centímetros" → "3 x 2 cm")
+        self.normalizer = None
+        if self.config.get('normalize_spoken_forms', True):
+            try:
+                self.normalizer = SpokenFormNormalizer(
+                    self.config.get('normalization_language', 'es'))
+            except Exception as e:
+                self.logger.error(f"Normalizador no disponible: {e}")
+
+        # Órdenes de voz resueltas localmente (sin pasar por Claude)
+        self.commands = CommandEngine(os.path.join(DICTIONARIES_DIR, "frases_completas.txt"))
+
+        # Archivo histórico con búsqueda de texto completo
+        try:
+            self.archive = SessionArchive()
+        except Exception as e:
+            self.logger.error(f"Archivo de sesiones no disponible: {e}")
+            self.archive = None
+
         # Configurar GUI
         self.setup_gui()
 
+        # Pipeline de procesamiento en hilos de trabajo
+        self.pipeline = ProcessingPipeline(self,
+                                           queue_size=self.config.get('pipeline_queue_size', 32))
+        self.pipeline.start()
+
+        # Diario de sesión: recuperar una sesión interrumpida o empezar una nueva
+        self.open_journal()
+
         # Configurar Azure después de la GUI
         self.root.after(500, self.delayed_azure_setup)
 
+    def open_journal(self):
+        """Abrir el diario de sesión, recuperando automáticamente si hubo una caída"""
+        interval = self.config.get('journal_commit_interval', 0.2)
+        path = None
+        try:
+            pruned = SessionJournal.prune(keep_days=self.config.get('journal_keep_days', 30))
+            if pruned:
+                self.logger.info(f"🧹 {pruned} diarios de sesión terminados eliminados")
+        except Exception as e:
+            self.logger.warning(f"Error podando diarios de sesión: {e}")
+        try:
+            path = SessionJournal.find_unfinished()
+            if path:
+                segments, pending, clears, last_phrase_id = SessionJournal.replay(path)
+                # Las frases nuevas no pueden reutilizar identificadores del diario
+                continue_phrase_ids(last_phrase_id)
+                self.journal = SessionJournal(path, commit_interval=interval)
+                self.set_session_name(path, clears)
+                self.journal.record('session_resumed')
+                for segment in segments:
+                    self.transcript.append(segment)
+                if pending:
+                    # Frases reconocidas que no llegaron a volcarse antes de la caída; el
+                    # segmento lleva sus phrase_ids para cerrarlas en el diario
+                    text = " ".join(pending.values())
+                    self.add_segment(TranscriptSegment(text, text, phrase_ids=list(pending)))
+                self.ui.call(self.transcript_view.show_tail)
+                self.log_to_gui(f"♻️ Sesión recuperada del diario: "
+                                f"{len(self.transcript)} segmentos")
+                return
+        except Exception as e:
+            self.logger.error(f"Error recuperando diario {path}: {e}")
+
+        self.journal = SessionJournal(SessionJournal.new_path(), commit_interval=interval)
+        self.set_session_name(self.journal.path)
+        self.journal.record('session_start', version=VERSION)
+
+    def set_session_name(self, journal_path, part=0):
+        """Nombre de la sesión en el archivo histórico
+
+        Tras "Limpiar" los segmentos se numeran otra vez desde cero: cada limpieza
+        abre una parte nueva para no sobrescribir lo archivado antes.
+        """
+        self.session_part = part
+        name = os.path.splitext(os.path.basename(journal_path))[0]
+        self.session_name = f"{name}_{part + 1}" if part else name
+
     def load_config(self):
         """Cargar configuración desde el archivo"""
         default_config = {
@@ -430,12 +4761,54 @@ class VoiceBridge224:
             'claude_api_key': '',
             'auto_send_claude': True,
             'claude_model': 'claude-3-sonnet-20240229',
+            'claude_base_url': '',
+            'claude_timeout': 30,
             'theme': 'dark',
             'ui_language': 'es',
             'medical_pause_seconds': 2.0,
+            'pipeline_queue_size': 32,
+            'ui_frame_ms': 33,
+            'partial_render_hz': 10,
+            'transcript_memory_segments': 200,
+            'transcript_view_segments': 100,
+            'claude_view_replies': 50,
+            'journal_commit_interval': 0.2,
+            'journal_keep_days': 30,
+            'latency_tracing': True,
+            'metrics_port': 0,
+            'metrics_snapshot_seconds': 60,
+            'stall_watchdog': True,
+            'stall_threshold_ms': 250,
+            'stall_heartbeat_ms': 100,
+            'profiler_hz': 100,
+            'profiler_max_overhead': 0.03,
+            'recognition_engine': 'azure',
+            'replay_trace': '',
+            'replay_speed': 1.0,
+            'record_trace': False,
+            'audio_capture': 'sdk',
+            'audio_sample_rate': 16000,
+            'audio_input_file': '',
+            'record_audio': False,
+            'vad_threshold_db': 10.0,
+            'vad_hangover_ms': 300,
+            'store_and_forward': True,
+            'spool_max_minutes': 30,
+            'nbest_rescoring': True,
+            'word_timestamps': True,
+            'confidence_threshold': 0.2,
+            'normalize_spoken_forms': True,
+            'normalization_language': 'es',
             'auto_correct': True,
             'show_stats': True,
             'tts_enabled': False,
+            'tts_voice': 'es-CO-SalomeNeural',
+            'tts_format': TTS_OUTPUT_FORMAT,
+            'tts_memory_clips': 32,
+            'tts_cache_mb': 64,
+            'anti_coupling': True,
+            'anti_coupling_tail_ms': 300,
+            'voice_clear_confirm_seconds': 10,
             'similarity_threshold': 0.8,
             'initial_silence_timeout': 8000,
             'end_silence_timeout': 2000,
@@ -453,7 +4826,6 @@ class VoiceBridge224:
         self.config = default_config
 
         # Actualizar configuraciones de componentes
-        self.medical_pause_seconds = self.config.get('medical_pause_seconds', 2.0)
         self.repetition_detector.similarity_threshold = self.config.get('similarity_threshold', 0.8)
 
     def save_config(self):
@@ -481,6 +4853,48 @@ class VoiceBridge224:
         # Configurar cierre
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+        # Planificador de render: una pasada por frame para todas las actualizaciones
+        self.ui = UIRenderScheduler(self.root, frame_ms=self.config.get('ui_frame_ms', 33))
+        self.transcript_view = TranscriptView(
+            self.transcriptions_text, self.transcript,
+            max_segments=self.config.get('transcript_view_segments', 100))
+        self.claude_line_counts = deque()
+        self.ui.register('transcript', self._render_transcript)
+        self.transcriptions_text.bind('<Double-Button-1>', self.show_word_audio_time, add='+')
+        self.ui.register('claude', self._render_claude)
+        self.ui.register('log', self._render_log)
+        self.ui.add_source('log', self.log_ring.drain)
+        self.partial_lane = PartialTextLane(self.partial_text,
+                                            max_hz=self.config.get('partial_render_hz', 10))
+        self.ui.add_tick(self.partial_lane.render)
+        self.ui.register('stats', lambda _: self.update_stats_display())
+        self.ui.register('status', self.update_status)
+        self.ui.register('level', self.update_level)
+        self.ui.start()
+
+        # Perfilador por muestreo bajo demanda: botón, Ctrl+Shift+P o SIGUSR2
+        self.profiler = SamplingProfiler(
+            hz=self.config.get('profiler_hz', 100),
+            max_overhead=self.config.get('profiler_max_overhead', 0.03),
+            logger=self.logger)
+        self.root.bind_all('<Control-Shift-P>', lambda event: self.toggle_profiler())
+        self.profiler_requested = False
+        if hasattr(signal, 'SIGUSR2'):
+            # El manejador corre en el hilo de Tk entre dos bytecodes, quizá con el lock del
+            # planificador tomado: solo marca la petición y el tick del frame la atiende
+            signal.signal(signal.SIGUSR2, self._request_profiler_toggle)
+            self._watch_signal_wakeup()
+            self.ui.add_tick(self._poll_profiler_request)
+
+        # Vigilancia de bloqueos del hilo de Tk (latido root.after + pila del hilo principal)
+        self.watchdog = None
+        if self.config.get('stall_watchdog', True):
+            self.watchdog = TkStallWatchdog(self.root, self.stats_collector.metrics,
+                                            threshold_ms=self.config.get('stall_threshold_ms', 250),
+                                            interval_ms=self.config.get('stall_heartbeat_ms', 100),
+                                            logger=self.logger)
+            self.watchdog.start()
+
         # Iniciar loops de actualización
         self.start_update_loops()
 
@@ -596,12 +5010,52 @@ class VoiceBridge224:
             relief='flat',
             cursor='hand2'
         )
-        save_button.pack(side='left')
+        save_button.pack(side='left', padx=(0, 10))
+
+        # Botón buscar en sesiones anteriores
+        search_button = tk.Button(
+            control_frame,
+            text=texts["search"],
+            command=self.open_search,
+            bg=theme["button_bg"],
+            fg=theme["button_fg"],
+            font=fonts["primary"],
+            padx=15,
+            pady=10,
+            relief='flat',
+            cursor='hand2'
+        )
+        search_button.pack(side='left')
+
+        # Botón del perfilador por muestreo (también Ctrl+Shift+P y SIGUSR2)
+        self.profiler_button = tk.Button(
+            control_frame,
+            text=texts["profile"],
+            command=self.toggle_profiler,
+            bg=theme["button_bg"],
+            fg=theme["button_fg"],
+            font=fonts["primary"],
+            padx=15,
+            pady=10,
+            relief='flat',
+            cursor='hand2'
+        )
+        self.profiler_button.pack(side='right')
 
         # ===== SECCIÓN DE ESTADO =====
         status_frame = ttk.Frame(main_frame, style='Custom.TFrame')
         status_frame.pack(fill='x', pady=(0, 10))
 
+        self.level_label = tk.Label(
+            status_frame,
+            text="",
+            bg=theme["bg"],
+            fg=theme["fg"],
+            font=fonts["primary"],
+            anchor='e'
+        )
+        self.level_label.pack(side='right')
+
         self.status_label = tk.Label(
             status_frame,
             text=texts["status_ready"],
@@ -647,6 +5101,21 @@ class VoiceBridge224:
         )
         self.transcriptions_text.pack(fill='both', expand=True)
 
+        # Carril de texto parcial (hipótesis en curso)
+        self.partial_text = tk.Text(
+            left_frame,
+            height=2,
+            wrap=tk.WORD,
+            bg=theme["bg"],
+            fg=theme["warning"],
+            font=fonts["mono"],
+            relief='flat',
+            borderwidth=0,
+            highlightthickness=0,
+            state='disabled'
+        )
+        self.partial_text.pack(fill='x', pady=(5, 0))
+
         # Frame derecho para Claude
         right_frame = ttk.Frame(content_frame, style='Custom.TFrame')
         right_frame.pack(side='right', fill='both', expand=True, padx=(5, 0))
@@ -729,6 +5198,18 @@ class VoiceBridge224:
         self.repetitions_label = self.create_stat_widget(stats_content, texts["repetitions"], "0")
         self.claude_calls_label = self.create_stat_widget(stats_content, texts["claude_calls"], "0")
         self.session_time_label = self.create_stat_widget(stats_content, texts["session_time"], "00:00")
+        self.stat_widgets = [
+            ('phrases_count', self.phrases_label, str),
+            ('corrections_applied', self.corrections_label, str),
+            ('repetitions_detected', self.repetitions_label, str),
+            ('claude_calls', self.claude_calls_label, str),
+            ('session_duration', self.session_time_label, self.format_duration),
+        ]
+        self.rendered_versions = {}
+        self.latency_label = self.create_stat_widget(stats_content, texts["latency"], "-")
+        # Un clic muestra p50/p95/p99 de todas las etapas
+        self.latency_label.configure(cursor='hand2')
+        self.latency_label.bind('<Button-1>', lambda event: self.show_latency_summary())
 
     def create_stat_widget(self, parent, label_text, value_text):
         """Crear widget de estadística individual"""
@@ -774,6 +5255,15 @@ class VoiceBridge224:
     def setup_azure(self):
         """CONFIGURACIÓN AZURE LIMPIA SIN PROPIEDADES PROBLEMÁTICAS"""
         try:
+            if self.config.get('recognition_engine', 'azure') == 'replay':
+                self.setup_replay()
+                return
+
+            if speechsdk is None:
+                self.log_to_gui("❌ Azure Speech SDK no está instalado "
+                                "(pip install azure-cognitiveservices-speech)")
+                return
+
             if not self.config.get('azure_key') or not self.config.get('azure_region'):
                 self.log_to_gui("⚠️ Configuración Azure incompleta - abriendo configuración")
                 self.open_config()
@@ -796,6 +5286,12 @@ class VoiceBridge224:
             # Configurar idioma
             self.speech_config.speech_recognition_language = self.config.get('azure_language', 'es-ES')
 
+            # Formato detallado: lista N-best con confianzas y tiempos por palabra
+            if self.detailed_results():
+                self.speech_config.output_format = speechsdk.OutputFormat.Detailed
+            if self.config.get('word_timestamps', True):
+                self.speech_config.request_word_level_timestamps()
+
             # === PASO 3: CONFIGURACIONES BÁSICAS SOLAMENTE ===
             self.log_to_gui("⚙️ Aplicando configuraciones básicas...")
 
@@ -824,26 +5320,16 @@ class VoiceBridge224:
             except:
                 self.log_to_gui("⚠️ Segmentation timeout no disponible")
 
-            # === PASO 4: CONFIGURAR AUDIO ===
-            self.log_to_gui("🎵 Configurando entrada de audio...")
-            self.audio_config = speechsdk.audio.AudioConfig(use_default_microphone=True)
-
-            # === PASO 5: CREAR RECOGNIZER ===
+            # === PASO 4-5: ENTRADA DE AUDIO Y MOTOR DE RECONOCIMIENTO ===
             self.log_to_gui("🤖 Creando reconocedor de voz...")
-            self.speech_recognizer = speechsdk.SpeechRecognizer(
-                speech_config=self.speech_config,
-                audio_config=self.audio_config
-            )
+            self.recognition_engine = self.create_recognition_engine()
 
             # === PASO 6: CONFIGURAR CALLBACKS ===
             self.setup_speech_callbacks()
 
             # === PASO 7: CONFIGURAR TTS SI ESTÁ HABILITADO ===
             if self.config.get('tts_enabled', False):
-                self.speech_synthesizer = speechsdk.SpeechSynthesizer(
-                    speech_config=self.speech_config
-                )
-                self.log_to_gui("🔊 TTS configurado")
+                self.setup_tts()
 
             # === PASO 8: PROBAR CONEXIÓN ===
             self.log_to_gui("🔍 Probando conexión con Azure...")
@@ -869,6 +5355,105 @@ class VoiceBridge224:
             # Mostrar diálogo de configuración automáticamente
             self.root.after(1000, self.open_config)
 
+    def setup_replay(self):
+        """Motor de reproducción: el pipeline completo sin Azure ni micrófono"""
+        trace = self.config.get('replay_trace')
+        if not trace or not os.path.exists(trace):
+            self.log_to_gui(f"❌ Traza de reproducción no encontrada: {trace or '(sin configurar)'}")
+            return
+        self.recognition_engine = self.create_recognition_engine()
+        self.setup_speech_callbacks()
+        self.azure_ready = True
+        self.log_to_gui(f"▶️ Motor de reproducción: {os.path.basename(trace)} "
+                        f"({len(self.recognition_engine.trace)} eventos a "
+                        f"{self.config.get('replay_speed', 1.0)}x)")
+
+    def setup_tts(self):
+        """Síntesis con caché en disco y memoria, reproducida en su propio hilo"""
+        if self.tts:
+            self.tts.stop()
+            self.tts = None
+        voice = self.config.get('tts_voice', 'es-CO-SalomeNeural')
+        fmt = self.config.get('tts_format', TTS_OUTPUT_FORMAT)
+        if not (fmt.startswith('Riff') and fmt.endswith('Pcm')):
+            self.log_to_gui(f"⚠️ Formato TTS {fmt} no soportado - usando {TTS_OUTPUT_FORMAT}")
+            fmt = TTS_OUTPUT_FORMAT
+        try:
+            self.speech_config.speech_synthesis_voice_name = voice
+            self.speech_config.set_speech_synthesis_output_format(
+                getattr(speechsdk.SpeechSynthesisOutputFormat, fmt))
+            # Sin salida de audio: el SDK devuelve el WAV y la reproducción es nuestra
+            self.speech_synthesizer = speechsdk.SpeechSynthesizer(speech_config=self.speech_config,
+                                                                  audio_config=None)
+            cache = TTSCache(TTS_CACHE_DIR, memory_clips=self.config.get('tts_memory_clips', 32),
+                             disk_bytes=self.config.get('tts_cache_mb', 64) * 1024 * 1024)
+        except Exception as e:
+            self.logger.error(f"Error configurando TTS: {e}")
+            self.log_to_gui(f"⚠️ TTS no disponible: {e}")
+            return
+        self.tts = TTSPlayer(self.synthesize_speech, cache, voice, fmt,
+                             registry=self.stats_collector.metrics,
+                             tail_ms=self.config.get('anti_coupling_tail_ms', 300),
+                             on_playing=self.on_tts_playing, logger=self.logger).start()
+        self.tts.prefetch(TTS_CONFIRMATIONS.values())
+        self.log_to_gui(f"🔊 TTS configurado ({voice}, caché en {TTS_CACHE_DIR})")
+
+    def synthesize_speech(self, text, voice, fmt):
+        """WAV de Azure para ``text`` (la voz y el formato ya están en ``speech_config``)"""
+        result = self.speech_synthesizer.speak_text_async(text).get()
+        if result.reason != speechsdk.ResultReason.SynthesizingAudioCompleted:
+            details = result.cancellation_details
+            raise RuntimeError(
+                f"síntesis cancelada: {details.reason} {details.error_details or ''}".strip())
+        return result.audio_data
+
+    def on_tts_playing(self, playing):
+        self.is_speaking = playing
+
+    def tts_gated(self):
+        """Anti-acoplamiento: cierto mientras suena la síntesis (y su cola de eco)"""
+        return self.tts is not None and self.config.get('anti_coupling', True) and self.tts.gated()
+
+    def is_own_voice(self, evt):
+        """Anti-acoplamiento con el micrófono del SDK: la frase se dijo mientras sonaba la síntesis
+
+        Azure entrega el resultado tras el silencio de segmentación, cuando la
+        reproducción ya puede haber terminado; se compara el audio de la frase
+        (offset y duración desde el arranque del reconocedor) con lo reproducido.
+        """
+        if self.tts is None or self.recognition_origin is None:
+            return False
+        if not self.config.get('anti_coupling', True):
+            return False
+        start = self.recognition_origin + evt.offset / 1e7
+        return self.tts.covers(start, start + evt.duration / 1e7)
+
+    def speak_confirmation(self, action):
+        """Confirmar en voz alta una orden (no bloquea: la síntesis va en su hilo)"""
+        text = TTS_CONFIRMATIONS.get(action)
+        if text and self.tts and self.config.get('tts_enabled', False):
+            self.tts.say(text)
+
+    def create_recognition_engine(self):
+        """Crear el motor configurado (Azure o reproducción) y grabar su traza si se pide"""
+        if self.config.get('recognition_engine', 'azure') == 'replay':
+            engine = ReplayRecognitionEngine(self.config['replay_trace'],
+                                             self.config.get('replay_speed', 1.0))
+        else:
+            # Un flujo push cerrado no se puede reutilizar: nueva entrada de audio
+            self.audio_config = self.make_audio_config()
+            engine = AzureRecognitionEngine(self.speech_config, self.audio_config)
+
+        if self.config.get('record_trace', False):
+            if not self.trace_recorder:
+                os.makedirs(SESSIONS_DIR, exist_ok=True)
+                stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                path = os.path.join(SESSIONS_DIR, f"trace_{stamp}.jsonl")
+                self.trace_recorder = TraceRecorder(path)
+                self.log_to_gui(f"⏺️ Grabando traza de reconocimiento en {path}")
+            self.trace_recorder.attach(engine)
+        return engine
+
     def verify_audio_system(self):
         """Verificar disponibilidad del sistema de audio"""
         try:
@@ -927,14 +5512,11 @@ class VoiceBridge224:
         """Probar conexión con Azure"""
         try:
             # Crear un recognizer temporal para probar
-            temp_config = speechsdk.SpeechConfig(
-                subscription=self.config['azure_key'],
-                region=self.config['azure_region']
+            AzureRecognitionEngine.check_connection(
+                self.config['azure_key'],
+                self.config['azure_region'],
+                self.config.get('azure_language', 'es-ES')
             )
-            temp_config.speech_recognition_language = self.config.get('azure_language', 'es-ES')
-
-            # Test rápido de configuración
-            temp_recognizer = speechsdk.SpeechRecognizer(speech_config=temp_config)
             self.log_to_gui("✅ Conexión Azure verificada")
 
         except Exception as e:
@@ -967,69 +5549,99 @@ class VoiceBridge224:
 
     def setup_speech_callbacks(self):
         """Configurar callbacks de reconocimiento con manejo mejorado"""
-        if not self.speech_recognizer:
+        if not self.recognition_engine:
             return
 
         def recognizing_callback(evt):
-            """Callback para reconocimiento parcial - CONFIRMA AUDIO REAL"""
-            if evt.result.text and len(evt.result.text.strip()) > 0:
-                self.log_to_gui(f"🎤 Audio: {evt.result.text[:30]}...")
-                # Actualizar UI en hilo principal
-                self.root.after(0, lambda: self.update_partial_text(evt.result.text))
+            """Callback para reconocimiento parcial - solo actualiza el slot del carril"""
+            if evt.text and not self.audio_capture and self.is_own_voice(evt):
+                return
+            if evt.text:
+                self.update_partial_text(evt.text)
 
         def recognized_callback(evt):
             """Callback para reconocimiento completo"""
-            if evt.result.text and len(evt.result.text.strip()) > 0:
-                self.log_to_gui(f"✅ Reconocido: {evt.result.text}")
-                # Procesar en hilo principal
-                self.root.after(0, lambda: self.process_recognized_text(evt.result.text))
+            self.partial_lane.clear()
+            if evt.text and not self.audio_capture and self.is_own_voice(evt):
+                # Micrófono del SDK: lo dicho mientras hablaba la síntesis es su propia voz
+                self.tts.gated_results.inc()
+                self.log_to_gui(f"🔇 Ignorado durante la síntesis: {evt.text}")
+                return
+            if evt.text and len(evt.text.strip()) > 0:
+                self.log_to_gui(f"✅ Reconocido: {evt.text}")
+                # Audio de la frase para aprender las pausas (en el audio capturado, sin VAD)
+                audio_span = evt.audio_span()
+                if audio_span and self.audio_capture:
+                    capture = self.audio_capture
+                    audio_span = tuple(capture.capture_offset_ms(int(t * 1000)) / 1000
+                                       for t in audio_span)
+                # Con formato detallado el resultado trae la lista N-best para el rescoring
+                hypotheses = None
+                if self.detailed_results():
+                    hypotheses = HypothesisRescorer.parse_nbest(evt.json)
+                    capture = self.audio_capture
+                    if capture:
+                        # Offsets del audio enviado → offsets del audio capturado (sin VAD)
+                        hypotheses = [(text, confidence, words and [
+                            (word, capture.capture_offset_ms(offset), duration)
+                            for word, offset, duration in words])
+                            for text, confidence, words in hypotheses]
+                # Hasta que el audio acumulado se reenvíe bien, lo nuevo espera (orden del dictado)
+                with self.forward_lock:
+                    if self.hold_live:
+                        self.held_results.append((evt.text, hypotheses, None, audio_span))
+                        return
+                # Procesar en el pipeline de hilos de trabajo
+                self.process_recognized_text(evt.text, hypotheses, audio_span=audio_span)
             else:
                 # Reconocimiento vacío - podría indicar problema de audio
                 self.log_to_gui("⚠️ Reconocimiento vacío")
 
         def canceled_callback(evt):
             """Callback para errores y cancelaciones"""
-            reason = evt.result.reason
-            if reason == speechsdk.ResultReason.Canceled:
-                details = evt.result.cancellation_details
-                error_msg = f"Reconocimiento cancelado: {details.reason}"
-
-                if details.reason == speechsdk.CancellationReason.Error:
-                    error_msg += f" - {details.error_details}"
-                    self.log_to_gui(f"❌ {error_msg}")
-
-                    # Manejo específico de errores de audio
-                    if "audio" in details.error_details.lower():
-                        self.log_to_gui("🔄 Error de audio detectado - reiniciando...")
-                        self.root.after(2000, self.restart_recognition)
-                else:
-                    self.log_to_gui(f"⚠️ {error_msg}")
+            error_msg = f"Reconocimiento cancelado: {evt.reason}"
+
+            if evt.error is not None:
+                error_msg += f" - {evt.error}"
+                self.log_to_gui(f"❌ {error_msg}")
+
+                if self.begin_spooling():
+                    # El audio se guarda en disco y se reenvía al reconectar
+                    self.ui.call(self.root.after, 2000, self.restart_recognition)
+                # Manejo específico de errores de audio
+                elif "audio" in evt.error.lower():
+                    self.log_to_gui("🔄 Error de audio detectado - reiniciando...")
+                    self.ui.call(self.root.after, 2000, self.restart_recognition)
+            else:
+                self.log_to_gui(f"⚠️ {error_msg}")
 
         def session_started_callback(evt):
             """Sesión iniciada correctamente"""
             self.log_to_gui("🔊 Sesión de reconocimiento iniciada")
-            self.update_status("Escuchando...")
+            self.ui.set_latest('status', "Escuchando...")
 
         def session_stopped_callback(evt):
             """Sesión detenida"""
             self.log_to_gui("⏹️ Sesión de reconocimiento detenida")
-            if self.is_listening:
+            if self.is_listening and not self.spool:
                 # Si debería estar escuchando pero se detuvo, hay un problema
                 self.log_to_gui("⚠️ Sesión detenida inesperadamente")
                 self.is_listening = False
-                self.root.after(0, self.update_ui_state)
+                self.ui.call(self.update_ui_state)
 
         # Conectar todos los callbacks
-        self.speech_recognizer.recognizing.connect(recognizing_callback)
-        self.speech_recognizer.recognized.connect(recognized_callback)
-        self.speech_recognizer.canceled.connect(canceled_callback)
-        self.speech_recognizer.session_started.connect(session_started_callback)
-        self.speech_recognizer.session_stopped.connect(session_stopped_callback)
+        self.recognition_engine.recognizing.connect(recognizing_callback)
+        self.recognition_engine.recognized.connect(recognized_callback)
+        self.recognition_engine.canceled.connect(canceled_callback)
+        self.recognition_engine.session_started.connect(session_started_callback)
+        self.recognition_engine.session_stopped.connect(session_stopped_callback)
 
     def restart_recognition(self):
         """Reiniciar reconocimiento después de error"""
         try:
-            if self.is_listening:
+            if self.spool:
+                self.reconnect_with_backlog()
+            elif self.is_listening:
                 self.log_to_gui("🔄 Reiniciando reconocimiento...")
                 self.stop_recognition()
                 time.sleep(1)
@@ -1052,7 +5664,7 @@ class VoiceBridge224:
     def start_recognition(self):
         """Iniciar reconocimiento con verificaciones completas"""
         try:
-            if not self.azure_ready or not self.speech_recognizer:
+            if not self.azure_ready or not self.recognition_engine:
                 self.log_to_gui("❌ Azure no está listo")
                 return
 
@@ -1060,10 +5672,11 @@ class VoiceBridge224:
                 self.log_to_gui("ℹ️ Ya está reconociendo")
                 return
 
-            # Verificar audio antes de iniciar
-            self.log_to_gui("🔍 Verificando audio antes de iniciar...")
-            if not self.pre_recognition_audio_check():
-                self.log_to_gui("⚠️ Problemas de audio detectados - continuando")
+            # Verificar audio antes de iniciar (la reproducción de trazas no usa micrófono)
+            if self.recognition_engine.name == 'azure':
+                self.log_to_gui("🔍 Verificando audio antes de iniciar...")
+                if not self.pre_recognition_audio_check():
+                    self.log_to_gui("⚠️ Problemas de audio detectados - continuando")
 
             # Recrear recognizer para evitar estados inconsistentes
             self.log_to_gui("🔄 Preparando reconocedor...")
@@ -1071,7 +5684,10 @@ class VoiceBridge224:
 
             # Iniciar reconocimiento continuo
             self.log_to_gui("🎤 Iniciando reconocimiento...")
-            self.speech_recognizer.start_continuous_recognition()
+            self.recognition_engine.start()
+            # Origen de los offsets del reconocedor en reloj monotónico (anti-acoplamiento)
+            self.recognition_origin = time.monotonic()
+            self.start_audio_capture()
 
             # Actualizar estado
             self.is_listening = True
@@ -1114,18 +5730,17 @@ class VoiceBridge224:
     def recreate_recognizer(self):
         """Recrear recognizer para evitar estados inconsistentes"""
         try:
-            # Detener recognizer existente si está activo
-            if hasattr(self, 'speech_recognizer') and self.speech_recognizer:
+            # Detener recognizer existente si está activo y soltar sus callbacks:
+            # el SDK los conserva y cada uno retiene la aplicación entera
+            if self.recognition_engine:
                 try:
-                    self.speech_recognizer.stop_continuous_recognition()
+                    self.recognition_engine.stop()
                 except:
                     pass
+                self.recognition_engine.disconnect_all()
 
-            # Crear nuevo recognizer
-            self.speech_recognizer = speechsdk.SpeechRecognizer(
-                speech_config=self.speech_config,
-                audio_config=self.audio_config
-            )
+            # Crear nuevo motor (con entrada de audio nueva)
+            self.recognition_engine = self.create_recognition_engine()
 
             # Reconectar callbacks
             self.setup_speech_callbacks()
@@ -1152,9 +5767,10 @@ class VoiceBridge224:
                 return
 
             self.log_to_gui("⏹️ Deteniendo reconocimiento...")
+            self.stop_audio_capture()
 
-            if self.speech_recognizer:
-                self.speech_recognizer.stop_continuous_recognition()
+            if self.recognition_engine:
+                self.recognition_engine.stop()
 
             self.is_listening = False
             self.update_ui_state()
@@ -1163,100 +5779,359 @@ class VoiceBridge224:
             self.logger.error(f"Error deteniendo reconocimiento: {e}")
             self.log_to_gui(f"❌ Error deteniendo: {e}")
 
-    def process_recognized_text(self, text):
-        """Procesar texto reconocido con correcciones y estadísticas"""
-        if not text or not text.strip():
+    def make_audio_config(self):
+        """Entrada del reconocedor: micrófono del SDK o flujo push desde la captura propia"""
+        self.push_stream = None
+        if self.config.get('audio_capture', 'sdk') == 'local':
+            if np is None:
+                self.log_to_gui("⚠️ La captura propia requiere numpy - usando el micrófono del SDK")
+            else:
+                audio_config, self.push_stream = AzureRecognitionEngine.push_input(
+                    self.config.get('audio_sample_rate', 16000))
+                return audio_config
+        return speechsdk.audio.AudioConfig(use_default_microphone=True)
+
+    def start_audio_capture(self):
+        """Arrancar la captura propia (VAD + grabación opcional) si la entrada es un flujo push"""
+        if not self.push_stream or self.audio_capture:
             return
+        rate = self.config.get('audio_sample_rate', 16000)
+        input_file = self.config.get('audio_input_file')
+        source = WavFileSource(input_file, realtime=True) if input_file else MicrophoneSource(rate)
+        record_path = None
+        if self.config.get('record_audio', False):
+            os.makedirs(SESSIONS_DIR, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            record_path = os.path.join(SESSIONS_DIR, f"audio_{stamp}.wav")
+        vad = EnergyVAD(threshold_db=self.config.get('vad_threshold_db', 10.0),
+                        hangover_ms=self.config.get('vad_hangover_ms', 300))
+        push_stream = self.push_stream
+        self.audio_capture = AudioCapture(
+            source, push_stream.write, sample_rate=rate, vad=vad, record_path=record_path,
+            on_level=lambda level: self.ui.set_latest('level', level),
+            gate=self.tts_gated,
+            # Al agotarse un archivo se cierra el flujo para que el SDK termine la frase
+            on_end=push_stream.close if input_file else None)
+        self.audio_capture.start()
+        self.log_to_gui(f"🎚️ Captura propia de audio a {rate} Hz"
+                        + (f" - grabando en {record_path}" if record_path else ""))
+
+    def stop_audio_capture(self):
+        capture, self.audio_capture = self.audio_capture, None
+        if self.spool and not self.forwarding:
+            # Detenido sin reconectar: el audio acumulado queda en disco (PCM 16 bits mono)
+            spool, self.spool = self.spool, None
+            self.spool_receiving = self.recognizer_down = False
+            spool.close(remove=False)
+            self.log_to_gui(f"💾 Audio sin reconocer guardado en {spool.path}")
+            self.release_held_results()
+        if capture:
+            capture.stop()
+            capture.source.close()
+            vad = capture.vad
+            if vad.total_frames:
+                self.logger.info(f"VAD: {vad.voiced_frames}/{vad.total_frames} tramas con voz "
+                                 "enviadas "
+                                 f"({vad.voiced_frames / vad.total_frames:.0%})")
+
+    def begin_spooling(self):
+        """Desviar la captura a un spool en disco mientras el reconocedor no está disponible"""
+        capture = self.audio_capture
+        if not capture or not self.config.get('store_and_forward', True):
+            return False
+        self.recognizer_down = True
+        spool = self.spool
+        if spool is None:
+            rate = self.config.get('audio_sample_rate', 16000)
+            os.makedirs(SESSIONS_DIR, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            path = os.path.join(SESSIONS_DIR, f"spool_{stamp}.pcm")
+            max_bytes = int(self.config.get('spool_max_minutes', 30) * 60 * rate * 2)
+            spool = AudioSpool(path, max_bytes, rate)
+            self.spool = spool
+            self.log_to_gui("💾 Reconocedor no disponible - guardando audio para reenviarlo")
+        # También si ya había spool: la captura pudo haber vuelto al reconocedor que acaba de caer
+        capture.redirect(lambda data: spool.write(data, capture.send_position))
+        self.spool_receiving = True
+        return True
+
+    def reconnect_with_backlog(self):
+        """Reconectar el reconocedor en vivo (si cayó) y reenviar lo acumulado con uno dedicado"""
+        if self.forwarding:
+            # Un reenvío en curso: volver a intentarlo cuando termine
+            self.root.after(5000, self.restart_recognition)
+            return
+        if self.recognizer_down:
+            try:
+                self.recreate_recognizer()
+                self.recognition_engine.start()
+            except Exception as e:
+                self.log_to_gui(f"⚠️ Reconexión fallida ({e}) - reintentando")
+                self.root.after(5000, self.restart_recognition)
+                return
+            self.recognizer_down = False
+
+        spool = self.spool
+        live_stream = self.push_stream
+        capture = self.audio_capture
+
+        def caught_up():
+            # El spool está vacío: lo siguiente va ya al reconocedor en vivo, salvo que
+            # ya fuera allí (reintento) o que el reconocedor en vivo haya vuelto a caer
+            if self.spool_receiving and not self.recognizer_down:
+                capture.redirect(live_stream.write, new_stream=True)
+                self.spool_receiving = False
+            return True
 
-        original_text = text
-        corrections_made = 0
-
-        # Aplicar correcciones médicas
-        if self.config.get('auto_correct', True):
-            corrected_text = self.medical_corrector.correct_text(text)
-            corrections_made = self.medical_corrector.corrections_applied - self.stats_collector.stats[
-                'corrections_applied']
-            text = corrected_text
-
-        # Verificar repeticiones
-        is_repetition = self.repetition_detector.is_repetition(text)
-
-        # Actualizar estadísticas
-        self.stats_collector.update(text, corrections_made, is_repetition)
-
-        # Procesar con buffer médico
-        self.add_to_medical_buffer(text)
-
-        # Enviar a Claude automáticamente si está habilitado
-        if self.config.get('auto_send_claude', True) and self.claude.is_configured():
-            threading.Thread(target=self.send_to_claude_auto, args=(text,), daemon=True).start()
-
-        # Actualizar UI
-        self.update_stats_display()
+        def make_recognizer():
+            audio_config, stream = AzureRecognitionEngine.push_input(spool.sample_rate)
+            return AzureRecognitionEngine(self.speech_config, audio_config), stream
+
+        with self.forward_lock:
+            self.forwarding = True
+            self.hold_live = True
+        self.log_to_gui(f"📤 Reenviando {spool.pending() / 2 / spool.sample_rate:.0f} s "
+                        "de audio acumulado...")
+        forwarder = SpoolForwarder(spool, make_recognizer, self.process_recognized_text, caught_up)
+        threading.Thread(target=self._run_forwarder, args=(forwarder,), name='spool-forwarder',
+                         daemon=True).start()
+
+    def _run_forwarder(self, forwarder):
+        start = time.monotonic()
+        spool = forwarder.spool
+        backlog_seconds = spool.pending() / 2 / spool.sample_rate
+        try:
+            try:
+                ok = forwarder.run()
+            except Exception as e:
+                self.logger.error(f"Error reenviando audio: {e}")
+                ok = False
+                spool.rewind(forwarder.confirmed_pos)
+
+            with self.forward_lock:
+                self.forwarding = False
+            capture = self.audio_capture
+            if ok:
+                elapsed = time.monotonic() - start
+                self.log_to_gui(f"✅ Audio acumulado reenviado: {forwarder.results} frases de "
+                                f"{backlog_seconds:.0f} s en {elapsed:.1f} s")
+                if spool.dropped_bytes:
+                    lost = spool.dropped_bytes / 2 / spool.sample_rate
+                    self.log_to_gui(f"⚠️ Spool lleno: se perdieron {lost:.0f} s")
+                if not self.spool_receiving or capture is None:
+                    self.spool = None
+                    self.spool_receiving = False
+                    spool.close()
+                # Con el reconocedor en vivo caído otra vez, el spool queda para el próximo reenvío
+                self.release_held_results()
+            elif capture is not None:
+                # Lo retenido sigue esperando: saldrá detrás del audio acumulado. La captura
+                # solo vuelve al spool si el reconocedor en vivo cae (begin_spooling)
+                self.log_to_gui("⚠️ Reenvío interrumpido - se reintentará")
+                self.ui.call(self.root.after, 5000, self.restart_recognition)
+        finally:
+            with self.forward_lock:
+                self.forwarding = False
+            if self.spool is spool and self.audio_capture is None:
+                # Detenido durante el reenvío: lo no reconocido queda en disco, como al detener
+                self.spool = None
+                self.spool_receiving = False
+                spool.close(remove=False)
+                self.log_to_gui(f"💾 Audio sin reconocer guardado en {spool.path}")
+                self.release_held_results()
+
+    def release_held_results(self):
+        """Enviar al pipeline, en orden, los resultados en vivo retenidos durante el reenvío"""
+        with self.forward_lock:
+            self.hold_live = False
+            held, self.held_results = self.held_results, []
+        for text, hypotheses, spoken_at, audio_span in held:
+            self.process_recognized_text(text, hypotheses, spoken_at, audio_span)
+
+    def update_level(self, level):
+        if hasattr(self, 'level_label'):
+            self.level_label.configure(text=f"🎚️ {level:.0f} dB")
+
+    def detailed_results(self):
+        """True si se pide al SDK el resultado detallado (N-best y tiempos por palabra)"""
+        return bool(self.rescorer) or self.config.get('word_timestamps', True)
+
+    def show_word_audio_time(self, event):
+        """Mostrar el instante del dictado que corresponde a la palabra pulsada"""
+        located = self.transcript_view.locate(f"@{event.x},{event.y}")
+        if not located:
+            return
+        segment, position = located
+        audio_time = segment.audio_time(position)
+        if audio_time is None:
+            self.log_to_gui("⏱️ Segmento sin tiempos de palabra")
+            return
+        offset_ms, duration_ms = audio_time
+        minutes, milliseconds = divmod(offset_ms, 60000)
+        self.log_to_gui(f"⏱️ Audio {minutes:02d}:{milliseconds / 1000:06.3f} (+{duration_ms} ms) "
+                        f"- segmento {segment.segment_id}")
 
-        # Log del resultado
-        if corrections_made > 0:
-            self.log_to_gui(f"📝 Correcciones aplicadas: {corrections_made}")
-        if is_repetition:
-            self.log_to_gui(f"🔄 Repetición detectada")
+    def process_recognized_text(self, text, hypotheses=None, spoken_at=None, audio_span=None):
+        """Enviar texto reconocido al pipeline de procesamiento"""
+        if not text or not text.strip():
+            return
 
-    def add_to_medical_buffer(self, text):
-        """Agregar texto al buffer médico con procesamiento por lotes"""
-        self.medical_buffer += text + " "
+        self.pipeline.submit(text, hypotheses, spoken_at, audio_span)
 
-        # Cancelar timer anterior si existe
-        if self.buffer_timer:
-            self.root.after_cancel(self.buffer_timer)
+    def add_to_transcription(self, text):
+        """Agregar texto al área de transcripción (desde cualquier hilo)"""
+        if not text:
+            return None
+        return self.add_segment(TranscriptSegment(raw_text=text, corrected_text=text))
+
+    def add_segment(self, segment):
+        """Registrar un segmento en el modelo y mostrarlo en el próximo frame"""
+        self.transcript.append(segment)
+        self.ui.append('transcript', segment)
+        if self.journal:
+            self.journal.record('flushed', **segment.to_dict())
+        if self.archive:
+            self.archive.index_segment(self.session_name, segment)
 
-        # Programar procesamiento del buffer
-        self.buffer_timer = self.root.after(
-            int(self.medical_pause_seconds * 1000),
-            self.process_medical_buffer
-        )
+        # Incrementar contador
+        self.transcription_count += 1
+        self.tracer.dispatched(segment)
+        return segment
+
+    def _render_transcript(self, segments):
+        self.transcript_view.append(segments)
+        self.tracer.rendered(segments)
+
+    def _clear_claude_view(self):
+        self.claude_text.delete(1.0, tk.END)
+        self.claude_line_counts.clear()
+
+    def _render_claude(self, texts):
+        """Insertar respuestas de Claude manteniendo acotado el panel"""
+        self.claude_text.insert(tk.END, "".join(texts))
+        self.claude_line_counts.extend(text.count('\n') for text in texts)
+        while len(self.claude_line_counts) > self.config.get('claude_view_replies', 50):
+            count = self.claude_line_counts.popleft()
+            self.claude_text.delete(1.0, f"{count + 1}.0")
+        self.claude_text.see(tk.END)
 
-    def process_medical_buffer(self):
-        """Procesar buffer médico acumulado"""
-        if not self.medical_buffer.strip():
+    def recent_text(self, segments=5):
+        """Texto corregido de los últimos segmentos de la sesión"""
+        total = len(self.transcript)
+        recent = self.transcript.range(max(0, total - segments), total)
+        return " ".join(seg.corrected_text for seg in recent if seg.corrected_text)
+
+    def match_command(self, text):
+        """Orden de voz al inicio de la frase (o None), con su latencia en el log"""
+        start = time.perf_counter()
+        command = self.commands.match(text)
+        if command:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.log_to_gui(f"🎙️ Orden: {command.phrase} ({elapsed_ms:.2f} ms)")
+        return command
+
+    def run_command(self, command):
+        """Ejecutar una orden local; la interfaz solo se toca desde el hilo de Tk
+
+        Las de plantilla llegan desde la etapa dispatch, detrás de lo dictado antes.
+        """
+        action = command.action
+        if action in ('template', 'report'):
+            self.handle_template_command(action, command.payload)
+        elif action == 'stop':
+            self.ui.call(self.stop_recognition)
+        elif action == 'start':
+            self.ui.call(self.start_recognition)
+        elif action == 'clear':
+            # Una coincidencia aproximada no borra nada: solo arma la confirmación hablada
+            window = self.config.get('voice_clear_confirm_seconds', 10)
+            self.clear_armed_until = time.monotonic() + window
+            self.log_to_gui(f"⚠️ Diga \"confirmar borrado\" en {window} s "
+                            "para limpiar la transcripción")
+        elif action == 'confirm_clear':
+            armed, self.clear_armed_until = self.clear_armed_until, 0.0
+            if command.payload or time.monotonic() > armed:
+                self.log_to_gui(f"⚠️ Confirmación ignorada (sin borrado pendiente): "
+                                f"{command.phrase}")
+                return
+            self.ui.call(self.clear_transcription, False)
+        elif action == 'save':
+            self.ui.call(self.save_session)
+        elif action == 'send':
+            self.ui.call(self.send_to_claude_manual)
+        self.speak_confirmation(action)
+
+    def handle_template_command(self, kind, query):
+        """Insertar la plantilla pedida por una orden 'template' o 'report'"""
+        query = re.sub(r'^(?:de|del|para)\s+', '', query, flags=re.IGNORECASE)
+        if not self.templates:
+            self.log_to_gui("⚠️ Biblioteca de plantillas no disponible")
             return
 
-        # Agregar al área de transcripción
-        self.add_to_transcription(self.medical_buffer.strip())
-
-        # Limpiar buffer
-        self.medical_buffer = ""
-        self.buffer_timer = None
+        if kind == 'report' and not query:
+            # "generar informe" sin nombre: elegir la plantilla según lo dictado
+            query = self.recent_text()
 
-    def add_to_transcription(self, text):
-        """Agregar texto al área de transcripción"""
-        if not text:
+        start = time.perf_counter()
+        template = self.templates.find(query) if query else None
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if not template:
+            self.log_to_gui(f"⚠️ No se encontró plantilla para: {query}")
             return
 
-        # Agregar timestamp
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        formatted_text = f"[{timestamp}] {text}\n\n"
+        segment = self.add_to_transcription(template.render())
+        self.log_to_gui(f"📋 Plantilla insertada: {template.title} ({elapsed_ms:.1f} ms)")
 
-        # Insertar en el área de texto
-        self.transcriptions_text.insert(tk.END, formatted_text)
-        self.transcriptions_text.see(tk.END)
+        # Claude solo redacta los campos que lo requieren
+        if kind == 'report' and template.slots and self.claude.is_configured():
+            context = self.recent_text(segments=10)
+            if not self.pipeline.submit_claude(self.complete_template, segment, template, context):
+                self.log_to_gui("⚠️ Claude saturado - plantilla sin completar")
 
-        # Incrementar contador
-        self.transcription_count += 1
+    def complete_template(self, segment, template, context):
+        """Completar con Claude los campos de una plantilla insertada"""
+        try:
+            self.log_to_gui(f"🤖 Completando plantilla con Claude ({len(template.slots)} campos)...")
+            values = self.claude.complete_template_slots(template.slots, context)
+            report = template.render(values)
+            self.transcript.set_claude_reply(segment, report)
+            if self.journal:
+                self.journal.record('claude', len(report.encode('utf-8')),
+                                    segment_id=segment.segment_id, reply=report)
+            if self.archive:
+                self.archive.index_reply(self.session_name, segment)
+            self.display_claude_response(report)
+            self.stats_collector.update(claude_call=True)
+            self.ui.set_latest('stats')
+        except Exception as e:
+            self.log_to_gui(f"❌ Error completando plantilla: {e}")
 
-    def send_to_claude_auto(self, text):
-        """Enviar texto a Claude automáticamente"""
+    def send_to_claude_auto(self, segment):
+        """Enviar un segmento a Claude automáticamente"""
         try:
             if not self.claude.is_configured():
                 return
 
             self.log_to_gui("🤖 Enviando a Claude...")
-            response = self.claude.send_medical_text(text)
-
-            # Actualizar UI en hilo principal
-            self.root.after(0, lambda: self.display_claude_response(response))
+            timings = {}
+            response = self.claude.send_medical_text(segment.corrected_text, timings=timings)
+            phrase_id = segment.phrase_ids[-1] if segment.phrase_ids else 0
+            self.tracer.claude(phrase_id, timings)
+            self.stats_collector.claude_latency.observe((timings['end'] - timings['start']) / 1e9)
+            self.transcript.set_claude_reply(segment, response)
+            if self.journal:
+                self.journal.record('claude', len(response.encode('utf-8')),
+                                    segment_id=segment.segment_id, reply=response)
+            if self.archive:
+                self.archive.index_reply(self.session_name, segment)
+
+            # Actualizar UI en el próximo frame (el span termina al insertarse)
+            self.display_claude_response(response)
+            self.ui.call(self.tracer.span, phrase_id, 'claude_display', timings['end'])
 
             # Actualizar estadísticas
             self.stats_collector.update(claude_call=True)
-            self.root.after(0, self.update_stats_display)
+            self.ui.set_latest('stats')
 
         except Exception as e:
             self.log_to_gui(f"❌ Error Claude automático: {e}")
@@ -1269,8 +6144,8 @@ class VoiceBridge224:
                                        "Por favor configure la API key de Claude en la configuración")
                 return
 
-            # Obtener todo el texto de transcripción
-            full_text = self.transcriptions_text.get(1.0, tk.END).strip()
+            # Obtener todo el texto de transcripción desde el modelo
+            full_text = self.transcript.full_text().strip()
             if not full_text:
                 messagebox.showwarning("Sin contenido", "No hay transcripción para enviar")
                 return
@@ -1281,11 +6156,18 @@ class VoiceBridge224:
             def send_full_text():
                 try:
                     response = self.claude.send_medical_text(full_text, context="full_transcription")
-                    self.root.after(0, lambda: self.display_claude_response(response, clear_previous=True))
+                    segment = self.transcript.append(
+                        TranscriptSegment('', '', claude_reply=response, replied_at=time.time()))
+                    if self.journal:
+                        self.journal.record('flushed', len(response.encode('utf-8')),
+                                            **segment.to_dict())
+                    if self.archive:
+                        self.archive.index_segment(self.session_name, segment)
+                    self.display_claude_response(response, clear_previous=True)
                     self.stats_collector.update(claude_call=True)
-                    self.root.after(0, self.update_stats_display)
+                    self.ui.set_latest('stats')
                 except Exception as e:
-                    self.root.after(0, lambda: self.log_to_gui(f"❌ Error Claude manual: {e}"))
+                    self.log_to_gui(f"❌ Error Claude manual: {e}")
 
             threading.Thread(target=send_full_text, daemon=True).start()
 
@@ -1293,23 +6175,20 @@ class VoiceBridge224:
             self.log_to_gui(f"❌ Error enviando a Claude: {e}")
 
     def display_claude_response(self, response, clear_previous=False):
-        """Mostrar respuesta de Claude en la interfaz"""
+        """Mostrar respuesta de Claude en la interfaz (desde cualquier hilo)"""
         if clear_previous:
-            self.claude_text.delete(1.0, tk.END)
+            self.ui.call(self._clear_claude_view)
 
         timestamp = datetime.now().strftime("%H:%M:%S")
         formatted_response = f"[{timestamp}] {response}\n\n"
 
-        self.claude_text.insert(tk.END, formatted_response)
-        self.claude_text.see(tk.END)
+        self.ui.append('claude', formatted_response)
 
         self.log_to_gui("✅ Respuesta de Claude recibida")
 
     def update_partial_text(self, text):
-        """Actualizar texto parcial en tiempo real"""
-        # Esta funcionalidad se puede implementar con un área separada
-        # Por ahora, solo logeamos
-        pass
+        """Actualizar texto parcial en tiempo real (desde cualquier hilo)"""
+        self.partial_lane.update(text)
 
     def update_ui_state(self):
         """Actualizar estado de la interfaz"""
@@ -1345,28 +6224,88 @@ class VoiceBridge224:
             self.status_label.configure(text=status_text)
 
     def update_stats_display(self):
-        """Actualizar visualización de estadísticas"""
+        """Actualizar visualización de estadísticas
+
+        Solo se reconfiguran las etiquetas cuya métrica cambió de versión desde el
+        último repintado.
+        """
         if not hasattr(self, 'phrases_label'):
             return
 
-        stats = self.stats_collector.stats
-
-        # Actualizar contadores
-        if hasattr(self, 'phrases_label'):
-            self.phrases_label.configure(text=str(stats['phrases_count']))
-        if hasattr(self, 'corrections_label'):
-            self.corrections_label.configure(text=str(stats['corrections_applied']))
-        if hasattr(self, 'repetitions_label'):
-            self.repetitions_label.configure(text=str(stats['repetitions_detected']))
-        if hasattr(self, 'claude_calls_label'):
-            self.claude_calls_label.configure(text=str(stats['claude_calls']))
-
-        # Actualizar tiempo de sesión
-        if hasattr(self, 'session_time_label'):
-            duration = stats['session_duration']
-            minutes, seconds = divmod(duration, 60)
-            time_str = f"{minutes:02d}:{seconds:02d}"
-            self.session_time_label.configure(text=time_str)
+        metrics = self.stats_collector.metrics
+        for name, label, format_value in self.stat_widgets:
+            metric = metrics.get(name)
+            if self.rendered_versions.get(name) != metric.version:
+                self.rendered_versions[name] = metric.version
+                label.configure(text=format_value(metric.value))
+
+    @staticmethod
+    def format_duration(duration):
+        minutes, seconds = divmod(duration, 60)
+        return f"{minutes:02d}:{seconds:02d}"
+
+    def update_latency_display(self):
+        """Latencia p95 de reconocimiento a texto visible (solo si hay frases nuevas)"""
+        if not hasattr(self, 'latency_label'):
+            return
+        version = self.tracer.rendered_count
+        if self.rendered_versions.get('latency') != version:
+            self.rendered_versions['latency'] = version
+            p95 = self.tracer.quantile('end_to_end', 0.95)
+            self.latency_label.configure(text=f"{p95:.0f} ms" if p95 is not None else "-")
+
+    def _request_profiler_toggle(self, signum, frame):
+        self.profiler_requested = True
+
+    def _poll_profiler_request(self):
+        if self.profiler_requested:
+            self.profiler_requested = False
+            self.toggle_profiler()
+
+    def _watch_signal_wakeup(self):
+        """fd de despertar de señales vigilado por Tk: atiende SIGUSR2 aunque Tk esté en espera"""
+        if not hasattr(self.root.tk, 'createfilehandler'):
+            return
+        try:
+            read_fd, write_fd = os.pipe()
+            os.set_blocking(read_fd, False)
+            os.set_blocking(write_fd, False)
+            signal.set_wakeup_fd(write_fd)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Sin fd de despertar para señales: {e}")
+            return
+
+        def drain(fd, mask):
+            try:
+                os.read(fd, 512)
+            except OSError:
+                pass
+            self._poll_profiler_request()
+
+        self.root.tk.createfilehandler(read_fd, tk.READABLE, drain)
+
+    def toggle_profiler(self):
+        """Arrancar o detener el perfilador y escribir las pilas plegadas en logs/"""
+        texts = self.theme_system.get_texts()
+        if not self.profiler.running:
+            self.profiler.start()
+            self.profiler_button.configure(text=texts["profile_stop"])
+            self.log_to_gui(f"🔬 Perfilador activo ({self.profiler.hz} Hz, todos los hilos)")
+            return
+
+        result = self.profiler.stop()
+        self.profiler_button.configure(text=texts["profile"])
+        self.log_to_gui(f"🔬 Perfil guardado: {result['path']} ({result['samples']} muestras, "
+                        f"{result['effective_hz']:.0f} Hz, "
+                        f"sobrecoste {result['overhead'] * 100:.1f} %)")
+        for function, share in self.profiler.top_functions():
+            self.logger.info(f"Perfil: {share * 100:.1f} % en {function}")
+
+    def show_latency_summary(self):
+        """Mostrar p50/p95/p99 por etapa"""
+        lines = self.tracer.summary_lines()
+        messagebox.showinfo("Latencias por etapa",
+                            "\n".join(lines) if lines else "Aún no hay frases medidas")
 
     def start_update_loops(self):
         """Iniciar loops de actualización periódica"""
@@ -1374,30 +6313,32 @@ class VoiceBridge224:
         def update_stats():
             """Actualizar estadísticas periódicamente"""
             if hasattr(self, 'stats_collector'):
-                self.stats_collector.stats['session_duration'] = int(time.time() - self.session_start)
+                self.stats_collector.tick()
                 self.update_stats_display()
+                self.update_latency_display()
             # Programar siguiente actualización
             self.root.after(1000, update_stats)
 
         # Iniciar actualización de estadísticas
         self.root.after(1000, update_stats)
 
-    def clear_transcription(self):
+    def clear_transcription(self, confirm=True):
         """Limpiar área de transcripción"""
-        if messagebox.askyesno("Confirmar", "¿Limpiar toda la transcripción?"):
-            self.transcriptions_text.delete(1.0, tk.END)
-            self.claude_text.delete(1.0, tk.END)
-            self.medical_buffer = ""
+        if not confirm or messagebox.askyesno("Confirmar", "¿Limpiar toda la transcripción?"):
+            self.pipeline.reset_buffer()
+            if self.journal:
+                self.journal.record('cleared')
+                self.set_session_name(self.journal.path, self.session_part + 1)
+            self.transcript.clear()
+            self.transcript_view.reset()
+            self._clear_claude_view()
             self.transcription_count = 0
             self.log_to_gui("🗑️ Transcripción y respuestas Claude limpiadas")
 
     def save_session(self):
         """Guardar sesión actual"""
         try:
-            transcription_content = self.transcriptions_text.get(1.0, tk.END)
-            claude_content = self.claude_text.get(1.0, tk.END)
-
-            if not transcription_content.strip() and not claude_content.strip():
+            if not len(self.transcript):
                 messagebox.showwarning("Advertencia", "No hay contenido para guardar")
                 return
 
@@ -1409,12 +6350,17 @@ class VoiceBridge224:
 
             if filename:
                 with open(filename, 'w', encoding='utf-8') as f:
+                    # Recorrer el modelo por páginas (incluye lo volcado a disco)
                     f.write("=== TRANSCRIPCIÓN MÉDICA ===\n\n")
-                    f.write(transcription_content)
+                    has_replies = False
+                    for segment in self.transcript.iter_all():
+                        f.write(segment.render())
+                        has_replies = has_replies or bool(segment.claude_reply)
 
-                    if claude_content.strip():
+                    if has_replies:
                         f.write("\n\n=== ANÁLISIS DE CLAUDE ===\n\n")
-                        f.write(claude_content)
+                        for segment in self.transcript.iter_all():
+                            f.write(segment.render_reply())
 
                     # Agregar estadísticas al final
                     stats = self.stats_collector.stats
@@ -1427,6 +6373,15 @@ class VoiceBridge224:
                     f.write(f"Llamadas a Claude: {stats['claude_calls']}\n")
                     f.write(f"Duración: {stats['session_duration']} segundos\n")
 
+                    # Latencias por etapa y traza para chrome://tracing o Perfetto
+                    latency_lines = self.tracer.summary_lines()
+                    if latency_lines:
+                        trace_path = os.path.splitext(filename)[0] + "_latencias.json"
+                        self.tracer.export_chrome_trace(trace_path)
+                        f.write("\n--- LATENCIAS POR ETAPA (p50 / p95 / p99) ---\n")
+                        f.write("\n".join(latency_lines) + "\n")
+                        f.write(f"Traza: {os.path.basename(trace_path)}\n")
+
                 self.log_to_gui(f"💾 Sesión guardada: {filename}")
                 messagebox.showinfo("Éxito", f"Sesión guardada correctamente\n{filename}")
 
@@ -1439,22 +6394,37 @@ class VoiceBridge224:
         """Abrir ventana de configuración"""
         ConfigWindow(self)
 
+    def open_search(self):
+        """Abrir ventana de búsqueda en sesiones anteriores"""
+        if not self.archive:
+            messagebox.showwarning("Búsqueda no disponible",
+                                   "El archivo de sesiones no está disponible")
+            return
+        SearchWindow(self)
+
     def log_to_gui(self, message):
         """Agregar mensaje al log de la GUI"""
         timestamp = datetime.now().strftime("%H:%M:%S")
         formatted_message = f"[{timestamp}] {message}\n"
 
-        if hasattr(self, 'log_text'):
-            self.log_text.insert(tk.END, formatted_message)
-            self.log_text.see(tk.END)
+        # La UI vacía el buffer en el próximo frame
+        self.log_ring.append(formatted_message)
+
+        # También enviar al logger (escritura asíncrona)
+        self.logger.info(strip_emojis(message))
 
-            # Mantener solo las últimas 100 líneas
-            lines = self.log_text.get(1.0, tk.END).split('\n')
-            if len(lines) > 100:
-                self.log_text.delete(1.0, f"{len(lines) - 100}.0")
+    def _render_log(self, messages):
+        """Insertar en el log de la GUI los mensajes acumulados en un frame"""
+        text = "".join(messages)
+        self.log_text.insert(tk.END, text)
+        self.log_text.see(tk.END)
 
-        # También enviar al logger
-        self.logger.info(message.replace('🔄', '').replace('✅', '').replace('❌', '').strip())
+        # Mantener solo las últimas líneas sin releer el contenido del widget
+        self.log_lines += text.count('\n')
+        excess = self.log_lines - LOG_GUI_MAX_LINES
+        if excess > 0:
+            self.log_text.delete(1.0, f"{excess + 1}.0")
+            self.log_lines = LOG_GUI_MAX_LINES
 
     def on_closing(self):
         """Manejar cierre de la aplicación"""
@@ -1465,15 +6435,93 @@ class VoiceBridge224:
             if self.is_listening:
                 self.stop_recognition()
 
+            # Vaciar pipeline y registrar tiempos por etapa
+            if hasattr(self, 'pipeline'):
+                self.pipeline.stop()
+                for stage, (count, mean_ms, max_ms) in self.pipeline.timing_summary().items():
+                    self.logger.info(f"Etapa {stage}: {count} frases, media {mean_ms:.2f} ms, "
+                                     f"máx {max_ms:.2f} ms")
+                median_latency = self.pipeline.median_display_latency()
+                if median_latency is not None:
+                    self.logger.info(f"Latencia mediana de visualización por frase: "
+                                     f"{median_latency * 1000:.0f} ms")
+            for line in self.tracer.summary_lines():
+                self.logger.info(f"Latencia {line}")
+            if self.rescorer and self.rescorer.rescored:
+                self.logger.info(f"Rescoring N-best: {self.rescorer.rescored} frases, "
+                                 f"{self.rescorer.reordered} reordenadas, "
+                                 f"{self.rescorer.rejected} bajo el umbral")
+
+            # Detener planificador de render y registrar coalescencia
+            if hasattr(self, 'ui'):
+                self.ui.stop()
+                ui_stats = self.ui.summary()
+                self.logger.info(
+                    f"UI: {ui_stats['mutations']} actualizaciones en {ui_stats['frames']} frames "
+                    f"(cola media {ui_stats['queue_mean']:.1f}, máx {ui_stats['queue_max']}; "
+                    f"frame medio {ui_stats['frame_mean_ms']:.2f} ms, "
+                    f"máx {ui_stats['frame_max_ms']:.2f} ms)"
+                )
+
+            # Un perfil en curso se guarda antes de cerrar
+            if hasattr(self, 'profiler') and self.profiler.running:
+                result = self.profiler.stop()
+                self.logger.info(f"Perfil guardado: {result['path']} "
+                                 f"(sobrecoste {result['overhead'] * 100:.1f} %)")
+
+            # Detener la vigilancia del bucle de Tk y resumir los bloqueos por línea
+            if getattr(self, 'watchdog', None):
+                self.watchdog.stop()
+                self.logger.info(f"Bucle de Tk: {len(self.watchdog.stalls)} bloqueos, "
+                                 f"retraso máximo {self.watchdog.max_lag * 1000:.0f} ms")
+                for line in self.watchdog.summary_lines():
+                    self.logger.info(f"Bloqueo Tk {line}")
+
+            # Detener la síntesis de voz y resumir la caché
+            if self.tts:
+                self.tts.stop()
+                cache_stats = self.tts.cache.stats()
+                self.logger.info(f"TTS: {self.tts.clips_played.value} clips, "
+                                 f"{self.tts.synthesized.value} sintetizados, "
+                                 f"aciertos de caché {cache_stats['memory_hits']} en memoria y "
+                                 f"{cache_stats['disk_hits']} en disco, "
+                                 f"{self.tts.gated_results.value} resultados ignorados por "
+                                 "anti-acoplamiento")
+
+            # Última instantánea de métricas
+            self.metrics_exporter.stop()
+
             # Guardar configuración
             self.save_config()
 
-            # Cerrar Azure SDK
-            if hasattr(self, 'speech_recognizer') and self.speech_recognizer:
+            # Liberar el almacén temporal de la transcripción
+            if hasattr(self, 'transcript'):
+                self.transcript.close()
+
+            # Cerrar el diario marcando la sesión como terminada
+            if self.journal:
+                self.journal.close(clean=True)
+                journal_stats = self.journal.stats()
+                self.logger.info(
+                    f"Diario: {journal_stats['records']} registros, "
+                    f"{journal_stats['fsyncs']} fsync, "
+                    f"amplificación {journal_stats['write_amplification']:.2f}x"
+                )
+
+            # Cerrar el archivo histórico (vacía lo pendiente de indexar)
+            if self.archive:
+                self.archive.close()
+
+            # Cerrar el motor de reconocimiento
+            if self.recognition_engine:
                 try:
-                    self.speech_recognizer.stop_continuous_recognition()
+                    self.recognition_engine.stop()
                 except:
                     pass
+            if self.trace_recorder:
+                self.logger.info(f"Traza: {self.trace_recorder.events} eventos en "
+                                 f"{self.trace_recorder.path}")
+                self.trace_recorder.close()
 
             self.logger.info("Aplicación cerrada correctamente")
 
@@ -1649,6 +6697,27 @@ class ConfigWindow:
         self.claude_key_entry.pack(fill='x', pady=(5, 0))
         self.claude_key_entry.insert(0, self.config.get('claude_api_key', ''))
 
+        # URL base de la API (vacía = API de Anthropic; un sustituto local para pruebas)
+        claude_url_frame = tk.Frame(claude_frame, bg=theme["bg"])
+        claude_url_frame.pack(fill='x', padx=10, pady=5)
+
+        tk.Label(
+            claude_url_frame,
+            text=texts["claude_base_url"],
+            bg=theme["bg"],
+            fg=theme["fg"],
+            font=fonts["primary"]
+        ).pack(anchor='w')
+
+        self.claude_url_entry = tk.Entry(
+            claude_url_frame,
+            bg=theme["entry_bg"],
+            fg=theme["entry_fg"],
+            font=fonts["primary"]
+        )
+        self.claude_url_entry.pack(fill='x', pady=(5, 0))
+        self.claude_url_entry.insert(0, self.config.get('claude_base_url', ''))
+
         # Envío automático a Claude
         self.auto_send_var = tk.BooleanVar(value=self.config.get('auto_send_claude', True))
         auto_send_check = tk.Checkbutton(
@@ -1789,12 +6858,8 @@ class ConfigWindow:
             # Mostrar mensaje de prueba
             self.parent.log_to_gui("🔍 Probando conexión Azure...")
 
-            # Crear configuración temporal
-            temp_config = speechsdk.SpeechConfig(subscription=key, region=region)
-            temp_config.speech_recognition_language = language
-
-            # Crear recognizer temporal
-            temp_recognizer = speechsdk.SpeechRecognizer(speech_config=temp_config)
+            # Crear recognizer temporal con la configuración del formulario
+            AzureRecognitionEngine.check_connection(key, region, language)
 
             messagebox.showinfo("Éxito", "✅ Conexión exitosa con Azure Speech")
             self.parent.log_to_gui("✅ Prueba de conexión Azure exitosa")
@@ -1810,24 +6875,40 @@ class ConfigWindow:
             claude_key = self.claude_key_entry.get().strip()
 
             if not claude_key:
-                messagebox.showerror("Error", "Por favor ingrese la API key de Claude")
+                messagebox.showerror("Error", "Por favor ingrese la API key de Claude",
+                                     parent=self.window)
                 return
 
-            # Mostrar mensaje de prueba
-            self.parent.log_to_gui("🤖 Probando conexión Claude...")
+            # Instancia temporal con la URL base escrita (la API real o un sustituto local)
+            temp_claude = ClaudeIntegration.from_config(
+                self.config, api_key=claude_key, base_url=self.claude_url_entry.get().strip())
+            self.parent.log_to_gui(f"🤖 Probando conexión Claude ({temp_claude.base_url})...")
 
-            # Crear instancia temporal de Claude
-            temp_claude = ClaudeIntegration(claude_key)
+            def show(dialog, title, message):
+                # Diálogo modal como evento propio de Tk (no dentro de un frame) sobre esta ventana
+                self.parent.root.after(0, lambda: dialog(title, message, parent=self.window))
 
-            # Enviar mensaje de prueba
-            test_response = temp_claude.send_medical_text("Prueba de conexión", context="test")
+            def run_test():
+                # Petición mínima fuera del hilo de Tk
+                try:
+                    start = time.perf_counter()
+                    reply = temp_claude.send_prompt("Responde solo OK.", "Prueba de conexión",
+                                                    max_tokens=8)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    show(messagebox.showinfo, "Éxito",
+                         f"✅ Conexión exitosa con Claude ({elapsed_ms:.0f} ms)\n\n"
+                         f"Respuesta: {reply[:100]}")
+                    self.parent.log_to_gui("✅ Prueba de conexión Claude exitosa")
+                except Exception as e:
+                    error_msg = f"Error probando conexión Claude: {e}"
+                    show(messagebox.showerror, "Error", error_msg)
+                    self.parent.log_to_gui(f"❌ {error_msg}")
 
-            messagebox.showinfo("Éxito", f"✅ Conexión exitosa con Claude\n\nRespuesta: {test_response[:100]}...")
-            self.parent.log_to_gui("✅ Prueba de conexión Claude exitosa")
+            threading.Thread(target=run_test, daemon=True).start()
 
         except Exception as e:
             error_msg = f"Error probando conexión Claude: {e}"
-            messagebox.showerror("Error", error_msg)
+            messagebox.showerror("Error", error_msg, parent=self.window)
             self.parent.log_to_gui(f"❌ {error_msg}")
 
     def save_config(self):
@@ -1848,6 +6929,7 @@ class ConfigWindow:
                 'azure_region': azure_region,
                 'azure_language': azure_language,
                 'claude_api_key': self.claude_key_entry.get().strip(),
+                'claude_base_url': self.claude_url_entry.get().strip(),
                 'auto_send_claude': self.auto_send_var.get(),
                 'auto_correct': self.auto_correct_var.get(),
                 'tts_enabled': self.tts_var.get(),
@@ -1859,7 +6941,7 @@ class ConfigWindow:
             self.parent.save_config()
 
             # Actualizar Claude integration
-            self.parent.claude = ClaudeIntegration(self.config.get('claude_api_key'))
+            self.parent.claude = ClaudeIntegration.from_config(self.config)
 
             # Mostrar mensaje de éxito
             messagebox.showinfo("Éxito", "Configuración guardada correctamente")
@@ -1881,23 +6963,475 @@ class ConfigWindow:
             self.parent.log_to_gui(f"❌ {error_msg}")
 
 
+# ===== VENTANA DE BÚSQUEDA =====
+class SearchWindow:
+    """Búsqueda de texto completo en el archivo de sesiones"""
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.archive = parent.archive
+        self.create_window()
+
+    def create_window(self):
+        """Crear ventana de búsqueda"""
+        theme = self.parent.theme_system.get_theme()
+        fonts = self.parent.theme_system.get_fonts()
+        texts = self.parent.theme_system.get_texts()
+
+        self.window = tk.Toplevel(self.parent.root)
+        self.window.title(texts["search_title"])
+        self.window.geometry("800x550")
+        self.window.transient(self.parent.root)
+        self.window.configure(bg=theme["bg"])
+
+        # Barra de búsqueda
+        search_frame = tk.Frame(self.window, bg=theme["bg"])
+        search_frame.pack(fill='x', padx=10, pady=10)
+
+        self.query_entry = tk.Entry(
+            search_frame,
+            bg=theme["entry_bg"],
+            fg=theme["entry_fg"],
+            insertbackground=theme["fg"],
+            font=fonts["primary"]
+        )
+        self.query_entry.pack(side='left', fill='x', expand=True, padx=(0, 10))
+        self.query_entry.bind('<Return>', lambda _: self.run_search())
+        self.query_entry.focus_set()
+
+        tk.Button(
+            search_frame,
+            text=texts["search"],
+            command=self.run_search,
+            bg=theme["accent"],
+            fg="white",
+            font=fonts["primary"],
+            padx=15,
+            relief='flat',
+            cursor='hand2'
+        ).pack(side='left', padx=(0, 10))
+
+        self.import_button = tk.Button(
+            search_frame,
+            text=texts["import_txt"],
+            command=self.import_exports,
+            bg=theme["button_bg"],
+            fg=theme["button_fg"],
+            font=fonts["primary"],
+            padx=15,
+            relief='flat',
+            cursor='hand2'
+        )
+        self.import_button.pack(side='left')
+
+        self.summary_label = tk.Label(
+            self.window,
+            text="",
+            bg=theme["bg"],
+            fg=theme["fg"],
+            font=fonts["small"],
+            anchor='w'
+        )
+        self.summary_label.pack(fill='x', padx=10)
+
+        # Resultados
+        self.results_text = scrolledtext.ScrolledText(
+            self.window,
+            wrap=tk.WORD,
+            bg=theme["text_bg"],
+            fg=theme["text_fg"],
+            font=fonts["mono"],
+            relief='flat'
+        )
+        self.results_text.pack(fill='both', expand=True, padx=10, pady=10)
+        self.results_text.tag_configure('header', foreground=theme["accent"], font=fonts["small"])
+        self.results_text.tag_configure('match', background=theme["warning"], foreground="black")
+
+    def run_search(self):
+        """Ejecutar la búsqueda y mostrar resultados resaltados"""
+        query = self.query_entry.get().strip()
+        if not query:
+            return
+
+        start = time.perf_counter()
+        results = self.archive.search(query)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.results_text.delete(1.0, tk.END)
+        for result in results:
+            when = datetime.fromtimestamp(result['created_at']).strftime("%Y-%m-%d %H:%M") \
+                if result['created_at'] else "?"
+            kind = "Claude" if result['kind'] == 'claude' else "Dictado"
+            self.results_text.insert(tk.END, f"{when} · {result['session']} · {kind}\n", 'header')
+
+            # Partes alternas: texto normal / coincidencia
+            for index, part in enumerate(re.split('[\x02\x03]', result['snippet'])):
+                self.results_text.insert(tk.END, part, 'match' if index % 2 else ())
+            self.results_text.insert(tk.END, "\n\n")
+
+        self.summary_label.configure(text=f"{len(results)} resultados en {elapsed_ms:.1f} ms")
+
+    def import_exports(self):
+        """Importar transcripciones .txt exportadas anteriormente"""
+        directory = filedialog.askdirectory(parent=self.window,
+                                            title="Directorio con transcripciones .txt")
+        if not directory:
+            return
+        self.import_button.configure(state='disabled')
+        self.summary_label.configure(text="Importando transcripciones...")
+        ui = self.parent.ui
+
+        def run_import():
+            # Fuera del hilo de Tk; progreso y resultado se muestran en el próximo frame
+            try:
+                files, entries = self.archive.import_directory(
+                    directory,
+                    progress=lambda done, total: ui.call(self.show_import_progress, done, total))
+                ui.call(self.import_finished, files, entries, None)
+            except Exception as e:
+                ui.call(self.import_finished, 0, 0, e)
+
+        threading.Thread(target=run_import, name='archive-import', daemon=True).start()
+
+    def show_import_progress(self, done, total):
+        if self.window.winfo_exists():
+            self.summary_label.configure(text=f"Importando transcripciones... {done}/{total}")
+
+    def import_finished(self, files, entries, error):
+        """Resultado de la importación (en el hilo de Tk)"""
+        if error is None:
+            self.parent.log_to_gui(f"📚 Importadas {files} transcripciones al archivo de sesiones")
+        if not self.window.winfo_exists():
+            return
+        self.import_button.configure(state='normal')
+        if error is None:
+            self.summary_label.configure(text=f"Importados {files} archivos ({entries} entradas)")
+        else:
+            self.summary_label.configure(text="")
+            messagebox.showerror("Error", f"Error importando transcripciones:\n{error}",
+                                 parent=self.window)
+
+
+# ===== TRANSCRIPCIÓN POR LOTES =====
+BATCH_AUDIO_EXTENSIONS = ('.wav',)
+BATCH_TRACE_SUFFIX = '.trace.jsonl'
+_batch_worker = None
+
+
+class BatchWorker:
+    """Proceso de un archivo de audio completo, sin Tk ni pipeline de hilos
+
+    Reconoce el archivo con el motor configurado y aplica a cada frase, en orden, lo
+    mismo que el pipeline interactivo: rescoring N-best, órdenes de voz, corrección
+    médica, normalización y filtro de repeticiones. Con ``claude`` el texto final se
+    envía además a Claude. Cada proceso del pool crea un único BatchWorker.
+    """
+
+    def __init__(self, config, engine='azure', claude=False):
+        self.config = config
+        self.engine = engine
+        self.corrector = MedicalCorrector()
+        self.normalizer = None
+        if config.get('normalize_spoken_forms', True):
+            self.normalizer = SpokenFormNormalizer(config.get('normalization_language', 'es'))
+        self.rescorer = None
+        if config.get('nbest_rescoring', True):
+            self.rescorer = HypothesisRescorer(
+                confidence_threshold=config.get('confidence_threshold', 0.2))
+            self.rescorer.load_dictionaries()
+            self.rescorer.add_phrases(self.corrector.medical_terms.values())
+            self._lexicon_bigrams = frozenset(self.rescorer.bigrams)
+        self.commands = CommandEngine(os.path.join(DICTIONARIES_DIR, "frases_completas.txt"))
+        self.claude = ClaudeIntegration.from_config(config) if claude else None
+        self.speech_config = None
+
+    def make_engine(self, path):
+        if self.engine == 'replay':
+            trace = os.path.splitext(path)[0] + BATCH_TRACE_SUFFIX
+            if not os.path.exists(trace):
+                raise FileNotFoundError(f"Traza no encontrada: {trace}")
+            return ReplayRecognitionEngine(trace, speed=0)
+
+        if self.speech_config is None:
+            if speechsdk is None:
+                raise RuntimeError("Azure Speech SDK no está instalado")
+            speech_config = speechsdk.SpeechConfig(subscription=self.config.get('azure_key'),
+                                                   region=self.config.get('azure_region'))
+            speech_config.speech_recognition_language = self.config.get('azure_language', 'es-ES')
+            if self.rescorer or self.config.get('word_timestamps', True):
+                speech_config.output_format = speechsdk.OutputFormat.Detailed
+            try:
+                speech_config.set_property(
+                    speechsdk.PropertyId.Speech_SegmentationSilenceTimeoutMs,
+                    str(self.config.get('segmentation_silence_timeout', 500)))
+            except Exception:
+                pass
+            self.speech_config = speech_config
+        return AzureRecognitionEngine(self.speech_config,
+                                      speechsdk.audio.AudioConfig(filename=path))
+
+    def recognize(self, path, timeout):
+        """Eventos ``recognized`` del archivo completo, en orden"""
+        engine = self.make_engine(path)
+        results = []
+        errors = []
+        done = threading.Event()
+        engine.recognized.connect(lambda evt: results.append(evt))
+        engine.canceled.connect(lambda evt: evt.error is not None and errors.append(evt.error))
+        engine.session_stopped.connect(lambda evt: done.set())
+        engine.start()
+        finished = done.wait(timeout)
+        engine.stop()
+        if errors:
+            raise RuntimeError(errors[0] or "reconocimiento cancelado")
+        if not finished:
+            raise TimeoutError(f"Reconocimiento sin terminar tras {timeout:.0f} s")
+        return results
+
+    def process(self, path):
+        start = time.perf_counter()
+        record = {'file': os.path.basename(path), 'audio_seconds': batch_audio_seconds(path),
+                  'engine': self.engine, 'worker': os.getpid()}
+        try:
+            events = self.recognize(path, timeout=record['audio_seconds'] * 2 + 60)
+            record.update(self.postprocess(events))
+            if self.claude:
+                try:
+                    record['claude'] = self.claude.send_medical_text(record['text'])
+                except Exception as e:
+                    record['claude_error'] = str(e)
+            record['error'] = None
+        except Exception as e:
+            record['error'] = str(e)
+        record['elapsed_s'] = round(time.perf_counter() - start, 3)
+        return record
+
+    def postprocess(self, events):
+        """Frases reconocidas → texto final
+
+        Aplica las etapas del pipeline interactivo (rescoring, órdenes, corrección,
+        normalización y repeticiones) salvo el recorte de solapamiento de ``_stitch``.
+        """
+        detector = RepetitionDetector()
+        detector.similarity_threshold = self.config.get('similarity_threshold', 0.8)
+        if self.rescorer:
+            # Lo aprendido de un archivo no influye en el siguiente
+            self.rescorer.bigrams = set(self._lexicon_bigrams)
+        corrections = self.corrector.corrections_applied
+        parts = []
+        counts = {'phrases': 0, 'rejected': 0, 'commands': 0, 'repetitions': 0}
+        for evt in events:
+            text = evt.text
+            hypotheses = HypothesisRescorer.parse_nbest(evt.json)
+            if hypotheses and self.rescorer:
+                choice = self.rescorer.choose(hypotheses)
+                if choice is None:
+                    counts['rejected'] += 1
+                    continue
+                text = choice[0]
+            if not text or not text.strip():
+                continue
+
+            command = self.commands.match(text)
+            if command:
+                counts['commands'] += 1
+                if command.action not in CommandEngine.PIPELINE_ACTIONS or not (
+                        command.payload or command.action == 'new_case'):
+                    continue
+                if command.action == 'new_case':
+                    detector.recent_phrases.clear()
+                    parts.append(f"\n=== NUEVO CASO {command.payload} ===\n".replace("  ", " "))
+                    continue
+                text = command.payload
+
+            if self.config.get('auto_correct', True):
+                text = self.corrector.correct_text(text)
+            if self.normalizer:
+                text = self.normalizer.normalize(text)
+            if not command and detector.is_repetition(text):
+                counts['repetitions'] += 1
+                continue
+            parts.append(text)
+            counts['phrases'] += 1
+
+        counts['corrections'] = self.corrector.corrections_applied - corrections
+        counts['text'] = re.sub(r' *\n *', '\n', " ".join(parts)).strip()
+        return counts
+
+
+def batch_audio_seconds(path):
+    try:
+        with wave.open(path, 'rb') as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, OSError, ZeroDivisionError):
+        return 0.0
+
+
+def _init_batch_worker(config, engine, claude):
+    global _batch_worker
+    _batch_worker = BatchWorker(config, engine, claude)
+
+
+def _run_batch_file(path):
+    return _batch_worker.process(path)
+
+
+def read_batch_checkpoint(out_path):
+    """Archivos ya terminados sin error según la salida JSONL
+
+    Una última línea incompleta (lote interrumpido a media escritura) se descarta.
+    """
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, 'rb+') as f:
+        data = f.read()
+        valid = data.rfind(b'\n') + 1
+        if valid < len(data):
+            # Última línea a medio escribir por una interrupción
+            f.truncate(valid)
+        for line in data[:valid].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if not record.get('error'):
+                done.add(record['file'])
+    return done
+
+
+def run_batch(directory, out_path, workers=1, engine='azure', claude=False, resume=False,
+              config=None, logger=None):
+    """Transcribir todos los audios de ``directory`` con un pool de procesos
+
+    Cada resultado se añade a ``out_path`` (JSONL, una línea por archivo) en cuanto
+    termina, así que la salida sirve de checkpoint: con ``resume`` se saltan los
+    archivos que ya tienen un resultado sin error. Devuelve el resumen con el
+    rendimiento en archivos y minutos de audio por minuto de reloj.
+    """
+    logger = logger or logging.getLogger('VoiceBridge')
+    config = config or {}
+    files = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if name.lower().endswith(BATCH_AUDIO_EXTENSIONS))
+    done = read_batch_checkpoint(out_path) if resume else set()
+    pending = [path for path in files if os.path.basename(path) not in done]
+    logger.info(f"Lote: {len(files)} archivos, {len(done)} ya hechos, {len(pending)} pendientes "
+                f"con {workers} procesos (motor {engine})")
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    start = time.perf_counter()
+    processed = failed = 0
+    audio_seconds = 0.0
+    with open(out_path, 'a' if resume else 'w', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                initargs=(config, engine, claude)) as pool:
+        futures = [pool.submit(_run_batch_file, path) for path in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            os.fsync(out.fileno())
+            processed += 1
+            audio_seconds += record['audio_seconds']
+            if record['error']:
+                failed += 1
+                logger.error(f"Lote: {record['file']}: {record['error']}")
+            else:
+                logger.info(f"Lote: {record['file']} ({processed}/{len(pending)}) - "
+                            f"{record['phrases']} frases en {record['elapsed_s']:.1f} s")
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        'files': len(files),
+        'skipped': len(done),
+        'processed': processed,
+        'failed': failed,
+        'workers': workers,
+        'engine': engine,
+        'audio_minutes': round(audio_seconds / 60, 2),
+        'elapsed_s': round(elapsed, 2),
+        'files_per_minute': round(processed / elapsed * 60, 2) if elapsed else 0.0,
+        'audio_minutes_per_minute': round(audio_seconds / elapsed, 2) if elapsed else 0.0,
+        'output': out_path,
+    }
+    logger.info(f"Lote terminado: {processed} archivos ({failed} con error) en {elapsed:.1f} s - "
+                f"{summary['files_per_minute']} archivos/min, "
+                f"{summary['audio_minutes_per_minute']} min de audio/min")
+    return summary
+
+
 # ===== FUNCIÓN PRINCIPAL =====
+def parse_args(argv=None):
+    """Argumentos de línea de comandos (sin argumentos se abre la interfaz gráfica)"""
+    parser = argparse.ArgumentParser(description=f"Voice Bridge v{VERSION}")
+    parser.add_argument('--batch', metavar='DIR',
+                        help="transcribir sin interfaz los audios WAV de DIR")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="procesos del lote")
+    parser.add_argument('--out',
+                        help="salida JSONL del lote (por defecto sessions/batch_<fecha>.jsonl)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continuar el lote de --out saltando lo ya hecho")
+    parser.add_argument('--engine', choices=('azure', 'replay'),
+                        help=f"motor del lote; 'replay' lee la traza <audio>{BATCH_TRACE_SUFFIX}")
+    parser.add_argument('--claude', action='store_true',
+                        help="enviar el texto de cada archivo a Claude")
+    args = parser.parse_args(argv)
+    if args.resume and not args.out:
+        parser.error("--resume requiere --out")
+    return args
+
+
+def main_batch(args, logger):
+    """Transcripción por lotes sin interfaz; devuelve el código de salida"""
+    if not os.path.isdir(args.batch):
+        logger.error(f"❌ Directorio de lote no encontrado: {args.batch}")
+        return 2
+    config = {}
+    if os.path.exists(CONFIG_FILE):
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    engine = args.engine or config.get('recognition_engine', 'azure')
+    if engine == 'azure' and speechsdk is None:
+        logger.error("❌ Azure Speech SDK no encontrado - use --engine replay")
+        return 2
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    out_path = args.out or os.path.join(SESSIONS_DIR, f"batch_{stamp}.jsonl")
+    summary = run_batch(args.batch, out_path, max(1, args.workers), engine, args.claude,
+                        args.resume, config, logger)
+    print(json.dumps(summary, indent=2, ensure_ascii=False))
+    return 1 if summary['failed'] else 0
+
+
 def main():
     """Función principal"""
+    args = parse_args()
     try:
         # Configurar logging antes de crear la aplicación
         logger = setup_logger()
         logger.info(f"=== INICIANDO VOICE BRIDGE v{VERSION} + CLAUDE ===")
 
+        if args.batch:
+            # Sin interfaz: los errores van al log y al código de salida, nunca a un diálogo
+            try:
+                code = main_batch(args, logger)
+            except Exception as e:
+                logger.error(f"❌ Error en la transcripción por lotes: {e}")
+                code = 2
+            sys.exit(code)
+
         # Verificar dependencias críticas
-        try:
-            import azure.cognitiveservices.speech as speechsdk
+        if speechsdk is not None:
             logger.info("✅ Azure Speech SDK disponible")
-        except ImportError:
-            logger.error("❌ Azure Speech SDK no encontrado")
-            messagebox.showerror("Error",
-                                 "Azure Speech SDK no está instalado.\n\nInstale con: pip install azure-cognitiveservices-speech")
-            return
+        else:
+            # Sin el SDK solo funciona el motor de reproducción de trazas
+            logger.warning("⚠️ Azure Speech SDK no encontrado")
+            messagebox.showwarning("Aviso",
+                                   "Azure Speech SDK no está instalado: solo estará disponible la "
+                                   "reproducción de trazas.\n\n"
+                                   "Instale con: pip install azure-cognitiveservices-speech")
 
         try:
             import requests
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la captura de audio propia (AudioCapture + EnergyVAD)
+Genera un WAV sintético con tramos de voz conocidos sobre ruido de fondo y mide
+la detección de voz, el audio enviado al reconocedor y la velocidad de proceso
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from VBC_v225 import AudioCapture, EnergyVAD, WavFileSource  # noqa: E402
+
+
+def write_fixture(path, sample_rate, seconds, bursts, noise_db=-55.0, speech_db=-20.0, seed=0):
+    """WAV mono 16 bits: ruido blanco con ráfagas moduladas (inicio_s, fin_s) que imitan voz"""
+    rng = np.random.default_rng(seed)
+    total = int(sample_rate * seconds)
+    noise = rng.normal(0.0, 32768 * 10 ** (noise_db / 20), total)
+    t = np.arange(total) / sample_rate
+    signal = noise
+    for start, end in bursts:
+        mask = (t >= start) & (t < end)
+        # Portadora con armónicos y envolvente silábica de 4 Hz
+        voice = (np.sin(2 * np.pi * 180 * t) + 0.5 * np.sin(2 * np.pi * 360 * t)) \
+            * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+        signal = signal + mask * voice * 32768 * 10 ** (speech_db / 20)
+    samples = np.clip(signal, -32768, 32767).astype(np.int16)
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+
+
+def run(sample_rate, seconds, threshold_db, hangover_ms):
+    bursts = [(1.0, 2.5), (4.0, 4.8), (6.0, 8.5), (10.0, 11.0)]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fixture.wav')
+        record_path = os.path.join(directory, 'recorded.wav')
+        write_fixture(path, sample_rate, seconds, bursts)
+
+        sent = bytearray()
+        vad = EnergyVAD(threshold_db=threshold_db, hangover_ms=hangover_ms)
+        capture = AudioCapture(WavFileSource(path), sent.extend, sample_rate=sample_rate,
+                               vad=vad, record_path=record_path)
+        start = time.perf_counter()
+        capture.start()
+        capture._thread.join()
+        elapsed = time.perf_counter() - start
+        capture.stop()
+        capture.source.close()
+
+        with wave.open(record_path, 'rb') as wav:
+            recorded_seconds = wav.getnframes() / sample_rate
+
+    # Instante de detección = inicio enviado (con pre-roll) + pre-roll
+    onsets = [(captured + capture.preroll_samples) / sample_rate for captured in capture.onsets_captured]
+    onset_errors = [min(abs(onset - start) for onset in onsets) for start, _ in bursts] if onsets else []
+    speech_seconds = sum(end - begin for begin, end in bursts)
+    return {
+        'audio_seconds': seconds,
+        'speech_seconds': speech_seconds,
+        'sent_seconds': len(sent) / 2 / sample_rate,
+        'recorded_seconds': recorded_seconds,
+        'voiced_frames': vad.voiced_frames,
+        'total_frames': vad.total_frames,
+        'detected_onsets': len(onsets),
+        'expected_onsets': len(bursts),
+        'max_onset_latency_ms': max(onset_errors) * 1000 if onset_errors else None,
+        'noise_floor_dbfs': vad.noise_floor,
+        'realtime_factor': seconds / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--seconds', type=float, default=12.0)
+    parser.add_argument('--threshold-db', type=float, default=10.0)
+    parser.add_argument('--hangover-ms', type=int, default=300)
+    args = parser.parse_args()
+
+    result = run(args.sample_rate, args.seconds, args.threshold_db, args.hangover_ms)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la transcripción por lotes (run_batch) con el motor de reproducción
+Genera un directorio de dictados WAV sintéticos, cada uno con su traza de eventos,
+y lo procesa con 1 y con N procesos, y después reanuda un lote interrumpido.
+tests/test_batch.py comprueba que el texto no depende del número de procesos y
+que la reanudación no repite ni pierde archivos
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from VBC_v225 import BATCH_TRACE_SUFFIX, run_batch  # noqa: E402
+from bench_audio_capture import write_fixture  # noqa: E402
+from bench_replay import synthetic_trace  # noqa: E402
+
+
+def make_corpus(directory, files, phrases, sample_rate=16000):
+    """Un WAV por dictado con la duración de su traza sintética"""
+    for index in range(files):
+        base = os.path.join(directory, f"dictado_{index:03d}")
+        seconds = synthetic_trace(base + BATCH_TRACE_SUFFIX, phrases, seed=index)
+        write_fixture(base + '.wav', sample_rate, seconds, [], seed=index)
+
+
+def read_output(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def run(files, phrases, workers):
+    logger = logging.getLogger('bench_batch')
+    with tempfile.TemporaryDirectory() as directory:
+        audio_dir = os.path.join(directory, 'audio')
+        os.makedirs(audio_dir)
+        make_corpus(audio_dir, files, phrases)
+
+        serial_out = os.path.join(directory, 'serial.jsonl')
+        serial = run_batch(audio_dir, serial_out, 1, 'replay', logger=logger)
+        parallel_out = os.path.join(directory, 'parallel.jsonl')
+        parallel = run_batch(audio_dir, parallel_out, workers, 'replay', logger=logger)
+
+        # Interrupción simulada: la mitad de los resultados y una línea a medio escribir
+        resumed_out = os.path.join(directory, 'resumed.jsonl')
+        with open(parallel_out, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        with open(resumed_out, 'w', encoding='utf-8') as f:
+            f.writelines(lines[:files // 2])
+            f.write(lines[files // 2][:20])
+        resumed = run_batch(audio_dir, resumed_out, workers, 'replay', resume=True, logger=logger)
+
+    return {
+        'files': files,
+        'phrases_per_file': phrases,
+        'audio_minutes': serial['audio_minutes'],
+        'serial': {key: serial[key]
+                   for key in ('elapsed_s', 'files_per_minute', 'audio_minutes_per_minute')},
+        'parallel': {key: parallel[key] for key in ('workers', 'elapsed_s', 'files_per_minute',
+                                                    'audio_minutes_per_minute')},
+        'parallel_speedup': (serial['elapsed_s'] / parallel['elapsed_s']
+                             if parallel['elapsed_s'] else None),
+        'failed': serial['failed'] + parallel['failed'] + resumed['failed'],
+        'resume_skipped': resumed['skipped'],
+        'resume_processed': resumed['processed'],
+        'resume_elapsed_s': resumed['elapsed_s'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=24)
+    parser.add_argument('--phrases', type=int, default=40, help="frases por dictado")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    result = run(args.files, args.phrases, args.workers)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
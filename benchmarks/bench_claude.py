@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark del camino de Claude contra el sustituto local de la API
+Levanta tools/anthropic_standin.py en un puerto libre y mide, sin red ni coste,
+el rendimiento de ClaudeIntegration con 1..N peticiones concurrentes, con y sin
+429/529/timeouts inyectados. tests/test_claude_standin.py comprueba los errores,
+la contabilidad de tokens y el streaming SSE
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'tools'))
+
+from VBC_v225 import ClaudeIntegration  # noqa: E402
+from anthropic_standin import StandInServer  # noqa: E402
+from bench_replay import dictionary_phrases  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))] if values else None
+
+
+def call(claude, text):
+    """(latencia_s, respuesta o None, error o None)"""
+    start = time.perf_counter()
+    try:
+        reply = claude.send_medical_text(text)
+        return time.perf_counter() - start, reply, None
+    except Exception as e:
+        return time.perf_counter() - start, None, str(e)
+
+
+def run_load(server, texts, concurrency, timeout):
+    claude = ClaudeIntegration('standin-key', base_url=server.base_url, timeout=timeout)
+    claude.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=concurrency))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda text: call(claude, text), texts))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for latency, reply, _ in results if reply is not None]
+    return results, {
+        'concurrency': concurrency,
+        'requests': len(texts),
+        'ok': len(latencies),
+        'errors': len(results) - len(latencies),
+        'elapsed_s': elapsed,
+        'requests_per_second': len(texts) / elapsed,
+        'p50_ms': (percentile(latencies, 0.50) or 0) * 1000,
+        'p95_ms': (percentile(latencies, 0.95) or 0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--latency', default='lognormal:0.2,0.5', help="distribución del sustituto")
+    parser.add_argument('--concurrency', default='1,2,4,8')
+    parser.add_argument('--rate-429', type=float, default=0.1)
+    parser.add_argument('--rate-529', type=float, default=0.05)
+    parser.add_argument('--rate-timeout', type=float, default=0.05)
+    parser.add_argument('--client-timeout', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    phrases = dictionary_phrases()
+    texts = [phrases[i % len(phrases)] for i in range(args.requests)]
+    result = {'latency': args.latency, 'load': []}
+
+    # Rendimiento según la concurrencia, sin fallos inyectados
+    server = StandInServer(latency=args.latency, seed=args.seed).start()
+    try:
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            server.stats.reset()
+            _, summary = run_load(server, texts, concurrency, args.client_timeout * 10)
+            summary['server_max_concurrency'] = server.stats.to_dict()['max_concurrency']
+            result['load'].append(summary)
+    finally:
+        server.stop()
+
+    # Fallos inyectados: cada uno llega al cliente como un error (sin reintentos)
+    server = StandInServer(latency='fixed:0.01', rate_429=args.rate_429, rate_529=args.rate_529,
+                           rate_timeout=args.rate_timeout, timeout_seconds=args.client_timeout * 3,
+                           seed=args.seed).start()
+    try:
+        results, summary = run_load(server, texts, 8, args.client_timeout)
+        stats = server.stats.to_dict()
+    finally:
+        server.stop()
+    result['faults'] = dict(summary, injected=stats['faults'])
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Prueba de resistencia y fugas de memoria para sesiones largas de dictado
+Simula una jornada (8 h por defecto) en tiempo comprimido contra el núcleo sin Tk:
+motor de reproducción con trazas sintéticas, pipeline completo, modelo de
+transcripción con volcado a disco, Claude simulado con latencia log-normal y
+ciclos repetidos de inicio/parada del reconocimiento por el camino real de la
+aplicación (``recreate_recognizer`` y ``setup_speech_callbacks``). El motor de
+sustitución retiene sus manejadores mientras estén conectados, como el SDK, de
+modo que un reinicio que no los suelte se ve como crecimiento por reinicio.
+
+Toma RSS e instantáneas de ``tracemalloc`` tras cada bloque, informa del
+crecimiento por cada 1000 frases y por reinicio, con las líneas que más crecen,
+y termina con error si alguno supera su presupuesto. Los buffers acotados (spans
+de latencia, tiempos por etapa, log) se llenan durante el calentamiento: el de
+spans se reduce con ``--tracer-capacity`` para que lo medido sea solo el
+crecimiento sin límite
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import threading
+import tracemalloc
+from types import SimpleNamespace
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from VBC_v225 import (LogRingBuffer, PartialTextLane, PhraseTracer, ProcessingPipeline,  # noqa: E402
+                      ReplayRecognitionEngine, TranscriptModel, VoiceBridge224)
+from bench_replay import HeadlessHost, synthetic_trace  # noqa: E402
+
+
+def rss_bytes():
+    """RSS actual (Linux); None si no se puede leer"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class SDKLikeEngine(ReplayRecognitionEngine):
+    """Motor de reproducción que, como el SDK, retiene el motor y sus manejadores hasta ``disconnect_all``
+
+    Al parar suelta la traza cargada, igual que el SDK libera su audio: la aplicación
+    conserva el último motor hasta el siguiente inicio y no debe contar como fuga.
+    """
+
+    connected = set()
+
+    def __init__(self, path, speed):
+        super().__init__(path, speed)
+        SDKLikeEngine.connected.add(self)
+
+    def stop(self):
+        super().stop()
+        self.trace = []
+
+    def disconnect_all(self):
+        super().disconnect_all()
+        SDKLikeEngine.connected.discard(self)
+
+
+class EnduranceHost(HeadlessHost):
+    """Núcleo sin Tk con lo que crece durante el día: transcripción, log y Claude
+
+    Los reinicios del reconocimiento usan los métodos reales de VoiceBridge224.
+    """
+
+    recreate_recognizer = VoiceBridge224.recreate_recognizer
+    setup_speech_callbacks = VoiceBridge224.setup_speech_callbacks
+    process_recognized_text = VoiceBridge224.process_recognized_text
+    update_partial_text = VoiceBridge224.update_partial_text
+    detailed_results = VoiceBridge224.detailed_results
+    is_own_voice = VoiceBridge224.is_own_voice
+
+    def __init__(self, spill_dir, speed, claude_median_s, seed, tracer_capacity):
+        super().__init__(pause_seconds=2.0 / speed)
+        self.tracer = PhraseTracer(capacity=tracer_capacity)
+        self.config['auto_send_claude'] = True
+        self.transcript = TranscriptModel(spill_dir=spill_dir, memory_limit=200)
+        self.log_ring = LogRingBuffer(capacity=100)
+        self.claude = SimpleNamespace(is_configured=lambda: True)
+        self.claude_rng = random.Random(seed)
+        self.claude_median_s = claude_median_s
+        self.speed = speed
+        self.segments_added = 0
+        self.claude_replies = 0
+
+        # Estado que leen los callbacks de reconocimiento de la aplicación
+        self.pipeline = None
+        self.recognition_engine = None
+        self.trace_path = None
+        self.partial_lane = PartialTextLane(None)
+        self.audio_capture = None
+        self.tts = None
+        self.recognition_origin = None
+        self.forward_lock = threading.Lock()
+        self.forwarding = False
+        self.hold_live = False
+        self.held_results = []
+        self.spool = None
+        self.is_listening = False
+
+    def create_recognition_engine(self):
+        return SDKLikeEngine(self.trace_path, self.speed)
+
+    def log_to_gui(self, message):
+        self.log_ring.append(message)
+
+    def add_segment(self, segment):
+        self.transcript.append(segment)
+        self.segments_added += 1
+        self.tracer.dispatched(segment)
+        self.tracer.rendered([segment])
+
+    def send_to_claude_auto(self, segment):
+        # Latencia log-normal (sigma 0.5) en tiempo comprimido
+        latency = self.claude_median_s * math.exp(self.claude_rng.gauss(0.0, 0.5))
+        time.sleep(latency / self.speed)
+        self.transcript.set_claude_reply(segment, f"Análisis: {segment.corrected_text[:200]}")
+        self.stats_collector.update(claude_call=True)
+        self.claude_replies += 1
+
+
+def run_engine(path, host):
+    """Un inicio/parada completo: ``recreate_recognizer`` detiene y suelta el motor anterior"""
+    host.trace_path = path
+    host.recreate_recognizer()
+    host.recognition_engine.start()
+    host.recognition_engine.wait()
+    host.recognition_engine.stop()
+
+
+def settle(pipeline, seconds):
+    """Esperar a que las colas, el buffer médico y los envíos a Claude se vacíen"""
+    deadline = time.monotonic() + 30.0
+    time.sleep(seconds)
+    while time.monotonic() < deadline and (any(inbox.qsize() for inbox in pipeline.queues.values())
+                                           or pipeline._buffer_parts or pipeline._claude_pending):
+        time.sleep(seconds)
+    gc.collect()
+
+
+def sample():
+    return tracemalloc.get_traced_memory()[0], rss_bytes()
+
+
+def run(cycles, phrases_per_cycle, restarts_per_cycle, warmup, speed, claude_median_s, seed, tracer_capacity):
+    tracemalloc.start(10)
+    with tempfile.TemporaryDirectory() as directory:
+        traces = []
+        simulated_s = 0.0
+        for index in range(cycles):
+            path = os.path.join(directory, f"trace_{index:03d}.jsonl")
+            simulated_s += synthetic_trace(path, phrases_per_cycle, seed=seed + index)
+            traces.append(path)
+        empty_trace = os.path.join(directory, 'empty.jsonl')
+        synthetic_trace(empty_trace, 0)
+
+        host = EnduranceHost(directory, speed, claude_median_s, seed, tracer_capacity)
+        pipeline = ProcessingPipeline(host, queue_size=1024)
+        host.pipeline = pipeline
+        segmenter = pipeline.segmenter
+        segmenter.base_delay /= speed
+        segmenter.min_delay /= speed
+        segmenter.max_delay /= speed
+        pipeline.start()
+        pause = 4.0 / speed
+
+        restart_growth = []
+        dictation_growth = []
+        rss_samples = []
+        phrases_measured = 0
+        baseline_snapshot = None
+        start = time.perf_counter()
+        for index, path in enumerate(traces):
+            before_restarts, _ = sample()
+            for _ in range(restarts_per_cycle):
+                run_engine(empty_trace, host)
+            settle(pipeline, pause)
+            before_dictation, _ = sample()
+
+            phrases_before = host.stats_collector.stats['phrases_count']
+            run_engine(path, host)
+            settle(pipeline, pause)
+            after, rss = sample()
+
+            if index == warmup - 1:
+                baseline_snapshot = tracemalloc.take_snapshot()
+            if index >= warmup:
+                restart_growth.append((before_dictation - before_restarts) / max(1, restarts_per_cycle))
+                dictation_growth.append(after - before_dictation)
+                phrases_measured += host.stats_collector.stats['phrases_count'] - phrases_before
+            rss_samples.append(rss)
+        elapsed = time.perf_counter() - start
+
+        top_growth = []
+        if baseline_snapshot is not None:
+            stats = tracemalloc.take_snapshot().compare_to(baseline_snapshot, 'lineno')
+            top_growth = [f"{stat.traceback[0].filename.rsplit(os.sep, 1)[-1]}:{stat.traceback[0].lineno} "
+                          f"{stat.size_diff / 1024:+.1f} KB ({stat.count_diff:+d} bloques)"
+                          for stat in stats[:8] if stat.size_diff > 0]
+        host.recognition_engine.stop()
+        host.recognition_engine.disconnect_all()
+        pipeline.stop()
+        host.transcript.close()
+    tracemalloc.stop()
+
+    measured_restarts = len(restart_growth) * restarts_per_cycle
+    rss_known = [value for value in rss_samples[warmup:] if value is not None]
+    return {
+        'simulated_hours': simulated_s / 3600,
+        'elapsed_s': elapsed,
+        'cycles': cycles,
+        'restarts': cycles * (restarts_per_cycle + 1),
+        'phrases': host.stats_collector.stats['phrases_count'],
+        'segments': host.segments_added,
+        'claude_replies': host.claude_replies,
+        'dropped': pipeline.dropped,
+        'engines_connected': len(SDKLikeEngine.connected),
+        'growth_kb_per_1000_phrases': (sum(dictation_growth) / phrases_measured * 1000 / 1024
+                                       if phrases_measured else None),
+        'growth_kb_per_restart': (sum(restart_growth) * restarts_per_cycle / measured_restarts / 1024
+                                  if measured_restarts else None),
+        'rss_growth_mb': (rss_known[-1] - rss_known[0]) / 2 ** 20 if len(rss_known) > 1 else None,
+        'rss_final_mb': rss_known[-1] / 2 ** 20 if rss_known else None,
+        'top_growth': top_growth,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cycles', type=int, default=35, help="bloques de dictado (unos 14 min simulados cada uno)")
+    parser.add_argument('--phrases-per-cycle', type=int, default=300)
+    parser.add_argument('--restarts-per-cycle', type=int, default=5, help="inicios/paradas en vacío por bloque")
+    parser.add_argument('--warmup', type=int, default=8, help="bloques excluidos de la medida")
+    parser.add_argument('--speed', type=float, default=400.0, help="compresión del tiempo")
+    parser.add_argument('--claude-latency', type=float, default=2.0, help="mediana simulada de Claude (s)")
+    parser.add_argument('--tracer-capacity', type=int, default=5000, help="spans de latencia retenidos")
+    parser.add_argument('--budget-kb-per-1000', type=float, default=64.0)
+    parser.add_argument('--budget-kb-per-restart', type=float, default=4.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    result = run(args.cycles, args.phrases_per_cycle, args.restarts_per_cycle, args.warmup,
+                 args.speed, args.claude_latency, args.seed, args.tracer_capacity)
+    result['budget_kb_per_1000_phrases'] = args.budget_kb_per_1000
+    result['budget_kb_per_restart'] = args.budget_kb_per_restart
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+    failures = []
+    if (result['growth_kb_per_1000_phrases'] or 0) > args.budget_kb_per_1000:
+        failures.append(f"{result['growth_kb_per_1000_phrases']:.1f} KB por 1000 frases "
+                        f"(presupuesto {args.budget_kb_per_1000})")
+    if (result['growth_kb_per_restart'] or 0) > args.budget_kb_per_restart:
+        failures.append(f"{result['growth_kb_per_restart']:.1f} KB por reinicio "
+                        f"(presupuesto {args.budget_kb_per_restart})")
+    if result['engines_connected']:
+        failures.append(f"{result['engines_connected']} motores siguen con manejadores conectados tras recrearse")
+    for failure in failures:
+        print(f"CRECIMIENTO {failure}", file=sys.stderr)
+    sys.exit(1 if failures or result['dropped'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Benchmark del camino crítico de proceso de texto
+Mide el coste por frase de MedicalCorrector.correct_text, RepetitionDetector.is_repetition,
+StatsCollector.update y del pipeline completo (process_recognized_text → segmento) con
+corpus sintéticos de patología generados desde config/diccionarios/*.txt, variando el
+tamaño del diccionario, la longitud de la frase y la ventana de repeticiones.
+
+Compara el resultado con benchmarks/baseline.json y termina con error si algún caso
+es más lento que la referencia más la tolerancia, o si no hay referencia. La referencia
+depende de la máquina: se regenera con --update-baseline
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from VBC_v225 import (DICTIONARIES_DIR, MedicalCorrector, ProcessingPipeline, RepetitionDetector,  # noqa: E402
+                      StatsCollector, _ACCENTS)
+from bench_replay import HeadlessHost  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+DICTIONARY_SIZES = (10, 100, 1000, 10000)
+PHRASE_LENGTHS = (4, 12, 32)
+REPETITION_WINDOWS = (10, 50, 200)
+MISSPELLING_RATE = 0.2
+REPEAT_RATE = 0.1
+
+
+def dictionary_words():
+    """Palabras (4+ letras) de los diccionarios, en orden estable"""
+    words = []
+    seen = set()
+    for name in sorted(os.listdir(DICTIONARIES_DIR)):
+        if not name.endswith('.txt'):
+            continue
+        with open(os.path.join(DICTIONARIES_DIR, name), 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith('#'):
+                    continue
+                for word in line.lower().split():
+                    word = word.strip('.,;:()')
+                    if len(word) >= 4 and word.isalpha() and word not in seen:
+                        seen.add(word)
+                        words.append(word)
+    return words
+
+
+def misspellings(word):
+    """Variantes erróneas típicas del reconocedor: sin tildes, letra omitida, letras traspuestas"""
+    variants = [word.translate(_ACCENTS)]
+    variants += [word[:i] + word[i + 1:] for i in range(1, len(word) - 1)]
+    variants += [word[:i] + word[i + 1] + word[i] + word[i + 2:] for i in range(1, len(word) - 2)]
+    return [variant for variant in variants if variant != word]
+
+
+def synthetic_terms(words, size, rng):
+    """Diccionario de correcciones {variante: término} de ``size`` entradas"""
+    candidates = sorted({(variant, word) for word in words for variant in misspellings(word)})
+    # Por encima de las variantes de una palabra se usan pares de palabras
+    if len(candidates) < size:
+        pairs = set()
+        while len(candidates) + len(pairs) < size:
+            first, second = rng.sample(words, 2)
+            variant = rng.choice(misspellings(second) or [second])
+            pairs.add((f"{first} {variant}", f"{first} {second}"))
+        candidates += sorted(pairs)
+    return dict(rng.sample(candidates, size))
+
+
+def synthetic_phrases(words, terms, length, count, rng):
+    """Frases de ``length`` palabras con un 20 % de variantes a corregir y un 10 % de repeticiones"""
+    variants = sorted(terms)
+    phrases = []
+    for _ in range(count):
+        if phrases and rng.random() < REPEAT_RATE:
+            phrases.append(rng.choice(phrases[-5:]))
+            continue
+        phrase = [rng.choice(variants) if rng.random() < MISSPELLING_RATE else rng.choice(words)
+                  for _ in range(length)]
+        phrases.append(" ".join(phrase))
+    return phrases
+
+
+def measure(func, items, repeat, min_time=0.05):
+    """Microsegundos por elemento: mejor de ``repeat`` pasadas de al menos ``min_time`` s"""
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            for item in items:
+                func(item)
+            calls += len(items)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        per_call = elapsed / calls * 1e6
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def measure_pipeline(phrases, terms):
+    """Microsegundos por frase del pipeline completo, de la entrada al segmento registrado"""
+    host = HeadlessHost(pause_seconds=0.05)
+    host.medical_corrector.medical_terms = terms
+    pipeline = ProcessingPipeline(host, queue_size=len(phrases) + 1)
+    pipeline.start()
+    start = time.perf_counter()
+    for phrase in phrases:
+        pipeline.submit(phrase)
+    pipeline.stop(timeout=30)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(phrases) * 1e6
+
+
+def run(repeat, phrases_per_case, seed):
+    rng = random.Random(seed)
+    words = dictionary_words()
+    results = {}
+
+    corrector = MedicalCorrector()
+    for size in DICTIONARY_SIZES:
+        terms = synthetic_terms(words, size, rng)
+        corrector.medical_terms = terms
+        for length in PHRASE_LENGTHS:
+            phrases = synthetic_phrases(words, terms, length, phrases_per_case, rng)
+            results[f"correct_text/terms={size}/words={length}"] = measure(corrector.correct_text, phrases, repeat)
+
+    terms = synthetic_terms(words, 1000, rng)
+    for window in REPETITION_WINDOWS:
+        for length in PHRASE_LENGTHS:
+            phrases = synthetic_phrases(words, terms, length, phrases_per_case, rng)
+
+            def check(phrase, detector=RepetitionDetector(window=window)):
+                detector.is_repetition(phrase)
+
+            results[f"is_repetition/window={window}/words={length}"] = measure(check, phrases, repeat)
+
+    stats = StatsCollector()
+    for length in PHRASE_LENGTHS:
+        phrases = synthetic_phrases(words, terms, length, phrases_per_case, rng)
+        results[f"stats_update/words={length}"] = measure(
+            lambda phrase: stats.update(phrase, corrections=1), phrases, repeat)
+
+    for length in PHRASE_LENGTHS:
+        phrases = synthetic_phrases(words, terms, length, phrases_per_case, rng)
+        results[f"pipeline/terms=1000/words={length}"] = min(
+            measure_pipeline(phrases, terms) for _ in range(repeat))
+
+    return {name: round(value, 3) for name, value in results.items()}
+
+
+def compare(results, baseline, tolerance):
+    """Casos más lentos que la referencia × (1 + tolerancia)"""
+    regressions = []
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference and value > reference * (1 + tolerance):
+            regressions.append({'case': name, 'us': value, 'baseline_us': reference,
+                                'ratio': round(value / reference, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help="guardar este resultado como referencia")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="margen sobre la referencia (0.5 = +50 %%)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--phrases', type=int, default=50, help="frases por caso")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.phrases, args.seed)
+    output = {'unit': 'us_per_phrase', 'results': results}
+
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        output['baseline_updated'] = args.baseline
+        regressions = []
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        output['baseline'] = args.baseline
+        output['missing_in_baseline'] = sorted(set(results) - set(baseline))
+    else:
+        # Sin referencia no hay nada con que comparar: no es un resultado válido
+        print(json.dumps(output, indent=2))
+        print(f"Referencia no encontrada: {args.baseline} (use --update-baseline para crearla)", file=sys.stderr)
+        sys.exit(2)
+
+    output['tolerance'] = args.tolerance
+    output['regressions'] = regressions
+    print(json.dumps(output, indent=2))
+    if regressions:
+        for regression in regressions:
+            print(f"REGRESIÓN {regression['case']}: {regression['us']} us/frase "
+                  f"(referencia {regression['baseline_us']}, x{regression['ratio']})", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
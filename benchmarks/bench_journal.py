@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark del diario de sesión (SessionJournal)
+Mide la amplificación de escritura y los fsync por frase dictada
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from VBC_v225 import SessionJournal, TranscriptSegment  # noqa: E402
+
+SAMPLE_PHRASES = [
+    "fragmentos de mucosa gástrica con gastritis crónica moderada activa",
+    "metaplasia intestinal incompleta antral",
+    "presencia de helicobacter spp",
+    "células atípicas en la capa basal",
+    "márgenes libres de neoplasia",
+    "sin evidencia de malignidad",
+]
+
+
+def run(phrases, rate, commit_interval, phrases_per_segment):
+    """Simular un dictado de ``phrases`` frases a ``rate`` frases por segundo"""
+    with tempfile.TemporaryDirectory() as directory:
+        journal = SessionJournal(os.path.join(directory, 'journal_bench.jsonl'),
+                                 commit_interval=commit_interval)
+        journal.record('session_start')
+        pending = []
+        segment_id = 0
+        start = time.perf_counter()
+
+        for phrase_id in range(phrases):
+            text = random.choice(SAMPLE_PHRASES)
+            journal.record('recognized', len(text.encode('utf-8')), phrase_id=phrase_id, text=text)
+            journal.record('corrected', phrase_id=phrase_id, text=text)
+            pending.append((phrase_id, text))
+
+            if len(pending) >= phrases_per_segment:
+                segment = TranscriptSegment(" ".join(t for _, t in pending), " ".join(t for _, t in pending),
+                                            segment_id=segment_id, phrase_ids=[p for p, _ in pending])
+                journal.record('flushed', **segment.to_dict())
+                segment_id += 1
+                pending = []
+
+            if rate > 0:
+                time.sleep(1.0 / rate)
+
+        journal.close(clean=True)
+        elapsed = time.perf_counter() - start
+        stats = journal.stats()
+
+    stats.update({
+        'phrases': phrases,
+        'rate': rate,
+        'commit_interval': commit_interval,
+        'elapsed_s': elapsed,
+        'bytes_per_phrase': stats['bytes_written'] / phrases,
+        'fsyncs_per_phrase': stats['fsyncs'] / phrases,
+    })
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--phrases', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=50.0, help="frases por segundo (0 = sin pausa)")
+    parser.add_argument('--commit-interval', type=float, default=0.2)
+    parser.add_argument('--phrases-per-segment', type=int, default=3)
+    args = parser.parse_args()
+
+    result = run(args.phrases, args.rate, args.commit_interval, args.phrases_per_segment)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark y corpus de referencia del normalizador de formas habladas
+Verifica config/normalizacion/golden_<idioma>.tsv y mide el tiempo por frase
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from VBC_v225 import NORMALIZATION_DIR, SpokenFormNormalizer  # noqa: E402
+
+
+def load_golden(path):
+    """Pares (frase dictada, forma escrita esperada) del corpus"""
+    pairs = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            spoken, written = line.split('\t')
+            pairs.append((spoken, written))
+    return pairs
+
+
+def run(language, iterations):
+    normalizer = SpokenFormNormalizer(language)
+    pairs = load_golden(os.path.join(NORMALIZATION_DIR, f"golden_{language}.tsv"))
+
+    failures = []
+    for spoken, written in pairs:
+        result = normalizer.normalize(spoken)
+        if result != written:
+            failures.append({'input': spoken, 'expected': written, 'got': result})
+
+    phrases = [spoken for spoken, _ in pairs]
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for phrase in phrases:
+            normalizer.normalize(phrase)
+    elapsed = time.perf_counter() - start
+    calls = iterations * len(phrases)
+
+    return {
+        'language': language,
+        'golden_phrases': len(pairs),
+        'golden_failures': failures,
+        'calls': calls,
+        'us_per_phrase': elapsed / calls * 1e6,
+        'phrases_per_second': calls / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--language', default='es')
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    result = run(args.language, args.iterations)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    sys.exit(1 if result['golden_failures'] else 0)
+
+
+if __name__ == "__main__":
+    main()
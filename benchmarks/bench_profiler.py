@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark del perfilador por muestreo (SamplingProfiler)
+Reproduce una traza sintética contra el pipeline con y sin el perfilador activo,
+mide el sobrecoste (el que declara el propio perfilador y la diferencia de tiempo
+real) y comprueba que la salida de pilas plegadas es legible por flamegraph.pl
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from VBC_v225 import SamplingProfiler  # noqa: E402
+from bench_replay import replay, synthetic_trace  # noqa: E402
+
+
+def read_folded(path):
+    """[(pila, muestras)] validando el formato "marco;marco;… cuenta" """
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if not stack or not count.isdigit():
+                raise ValueError(f"línea no plegada: {line!r}")
+            entries.append((stack, int(count)))
+    return entries
+
+
+def run(phrases, hz, repeat, max_overhead):
+    with tempfile.TemporaryDirectory() as directory:
+        trace = os.path.join(directory, 'trace.jsonl')
+        synthetic_trace(trace, phrases)
+
+        # Pasadas alternas con y sin perfilador para que la deriva de la máquina afecte a ambas
+        baseline = []
+        profiled = []
+        profiler = SamplingProfiler(hz=hz, max_overhead=max_overhead, out_dir=directory)
+        for _ in range(repeat):
+            baseline.append(replay(trace, 0, 0.05)['elapsed_s'])
+            profiler.start()
+            elapsed = replay(trace, 0, 0.05)['elapsed_s']
+            result = profiler.stop()
+            profiled.append((elapsed, result))
+        baseline = min(baseline)
+        elapsed, result = min(profiled, key=lambda item: item[0])
+        entries = read_folded(result['path'])
+
+    threads = {stack.split(';', 1)[0] for stack, _ in entries}
+    return {
+        'phrases': phrases,
+        'hz': hz,
+        'baseline_s': baseline,
+        'profiled_s': elapsed,
+        'wall_overhead': elapsed / baseline - 1,
+        'reported_overhead': result['overhead'],
+        'samples': result['samples'],
+        'effective_hz': result['effective_hz'],
+        'stacks': len(entries),
+        'threads': sorted(threads),
+        'top_functions': [[function, round(share, 3)] for function, share in profiler.top_functions()],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--phrases', type=int, default=2000)
+    parser.add_argument('--hz', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--max-overhead', type=float, default=0.03, help="presupuesto del perfilador")
+    args = parser.parse_args()
+
+    result = run(args.phrases, args.hz, args.repeat, args.max_overhead)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    # El sobrecoste declarado es la cota que se garantiza; el de tiempo real es ruidoso con pocas CPU
+    ok = result['samples'] and result['stacks'] and result['reported_overhead'] <= args.max_overhead * 1.5
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
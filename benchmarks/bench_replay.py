@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark del pipeline completo con el motor de reproducción de trazas
+Reproduce una traza de eventos de reconocimiento (grabada con ``record_trace`` o
+sintética a partir de los diccionarios) a N× velocidad contra el pipeline real,
+sin Azure ni micrófono. Mide el rendimiento y comprueba que dos reproducciones
+entregan exactamente el mismo texto
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from VBC_v225 import (DICTIONARIES_DIR, CommandEngine, HypothesisRescorer, MedicalCorrector,  # noqa: E402
+                      PhraseTracer, ProcessingPipeline, RecognitionEvent, ReplayRecognitionEngine,
+                      RepetitionDetector, SpokenFormNormalizer, StatsCollector)
+
+TICKS_PER_SECOND = 10_000_000
+
+
+class HeadlessHost:
+    """Lo que VoiceBridge224 ofrece al pipeline, sin Tk, Azure ni Claude"""
+
+    def __init__(self, pause_seconds):
+        self.config = {'auto_send_claude': False, 'auto_correct': True}
+        self.logger = logging.getLogger('bench_replay')
+        self.journal = None
+        self.claude = SimpleNamespace(is_configured=lambda: False)
+        self.ui = SimpleNamespace(set_latest=lambda *args: None, call=lambda func, *args: None)
+        self.medical_pause_seconds = pause_seconds
+        self.medical_corrector = MedicalCorrector()
+        self.repetition_detector = RepetitionDetector()
+        self.stats_collector = StatsCollector()
+        self.normalizer = SpokenFormNormalizer()
+        self.rescorer = HypothesisRescorer(confidence_threshold=0.2)
+        self.rescorer.load_dictionaries()
+        self.commands = CommandEngine(os.path.join(DICTIONARIES_DIR, "frases_completas.txt"))
+        self.tracer = PhraseTracer()
+        self.segments = []
+        self.commands_run = []
+
+    def log_to_gui(self, message):
+        pass
+
+    def match_command(self, text):
+        return self.commands.match(text)
+
+    def run_command(self, command):
+        self.commands_run.append(command.action)
+
+    def add_segment(self, segment):
+        # Sin Tk el segmento se da por mostrado al registrarse
+        segment.segment_id = len(self.segments)
+        self.segments.append(segment.corrected_text)
+        self.tracer.dispatched(segment)
+        self.tracer.rendered([segment])
+
+    def send_to_claude_auto(self, segment):
+        pass
+
+
+def dictionary_phrases():
+    """Frases de los diccionarios (sin órdenes de voz) para la traza sintética"""
+    phrases = []
+    for name in sorted(os.listdir(DICTIONARIES_DIR)):
+        with open(os.path.join(DICTIONARIES_DIR, name), 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and not line.lower().startswith('claude'):
+                    phrases.append(line)
+    return phrases
+
+
+def synthetic_trace(path, phrases, seed=0, words_per_second=2.5):
+    """Traza JSONL de un dictado: parciales por palabra, resultado con N-best y pausas variables"""
+    rng = random.Random(seed)
+    corpus = dictionary_phrases()
+    t = 0.0
+    with open(path, 'w', encoding='utf-8') as f:
+        def write(evt):
+            f.write(json.dumps(dict({'t': round(t, 3)}, **evt.to_dict()), ensure_ascii=False) + '\n')
+
+        write(RecognitionEvent('session_started'))
+        for _ in range(phrases):
+            words = rng.choice(corpus).split()
+            offset = int(t * TICKS_PER_SECOND)
+            step = 1.0 / words_per_second
+            for count in range(1, len(words) + 1):
+                t += step
+                write(RecognitionEvent('recognizing', " ".join(words[:count]), offset,
+                                       int(count * step * TICKS_PER_SECOND)))
+            t += 0.3
+            text = " ".join(words)
+            detail = {'NBest': [{'Display': text, 'Confidence': round(rng.uniform(0.6, 0.95), 2), 'Words': [
+                {'Word': word, 'Offset': offset + int(i * step * TICKS_PER_SECOND),
+                 'Duration': int(step * TICKS_PER_SECOND)} for i, word in enumerate(words)]}]}
+            write(RecognitionEvent('recognized', text, offset, int(len(words) * step * TICKS_PER_SECOND),
+                                   json.dumps(detail, ensure_ascii=False)))
+            t += rng.uniform(0.4, 2.5)
+        write(RecognitionEvent('session_stopped'))
+    return t
+
+
+def replay(path, speed, pause_seconds):
+    """Reproducir la traza contra el pipeline y esperar a que se vacíe"""
+    host = HeadlessHost(pause_seconds)
+    pipeline = ProcessingPipeline(host)
+    engine = ReplayRecognitionEngine(path, speed)
+    partials = []
+    engine.recognizing.connect(lambda evt: partials.append(evt.text))
+    engine.recognized.connect(
+        lambda evt: evt.text and pipeline.submit(evt.text, HypothesisRescorer.parse_nbest(evt.json),
+                                                  audio_span=evt.audio_span()))
+
+    pipeline.start()
+    start = time.perf_counter()
+    engine.start()
+    engine.wait()
+    replayed = time.perf_counter() - start
+    pipeline.stop()
+    elapsed = time.perf_counter() - start
+    return {
+        'events': engine.events_played,
+        'partials': len(partials),
+        'recognized': sum(1 for _, evt in engine.trace if evt.kind == 'recognized'),
+        'segments': len(host.segments),
+        'dropped': pipeline.dropped,
+        'replay_s': replayed,
+        'elapsed_s': elapsed,
+        'max_event_lag_ms': engine.max_lag_ms,
+        'median_display_latency_ms': (pipeline.median_display_latency() or 0.0) * 1000,
+        'latency_ms': {stage: {'n': n, 'p50': round(p50, 3), 'p95': round(p95, 3), 'p99': round(p99, 3)}
+                       for stage, (n, p50, p95, p99) in host.tracer.percentiles().items()},
+        'text': " ".join(host.segments),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trace', help="traza JSONL grabada (por defecto una sintética)")
+    parser.add_argument('--phrases', type=int, default=200, help="frases de la traza sintética")
+    parser.add_argument('--speed', type=float, default=20.0, help="velocidad de reproducción (0 = sin esperas)")
+    parser.add_argument('--pause', type=float, default=2.0, help="pausa médica del segmentador (s)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.trace
+        if not path:
+            path = os.path.join(directory, 'trace.jsonl')
+            synthetic_trace(path, args.phrases, args.seed)
+        trace_seconds = ReplayRecognitionEngine.load(path)[-1][0]
+        first = replay(path, args.speed, args.pause)
+        second = replay(path, args.speed, args.pause)
+
+    text = first.pop('text')
+    result = dict(first, **{
+        'trace_seconds': trace_seconds,
+        'speed': args.speed,
+        'speedup_vs_realtime': trace_seconds / first['elapsed_s'],
+        'phrases_per_second': first['recognized'] / first['elapsed_s'],
+        'deterministic': text == second['text'],
+        'transcript_chars': len(text),
+    })
+    print(json.dumps(result, indent=2))
+    sys.exit(0 if result['deterministic'] and not result['dropped'] else 1)
+
+
+if __name__ == "__main__":
+    main()
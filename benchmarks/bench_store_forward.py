@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Benchmark del modo store-and-forward (AudioSpool + SpoolForwarder)
+Acumula en el spool un dictado sintético como si Azure estuviera caído y lo reenvía
+a un reconocedor local de sustitución, con y sin un corte a mitad del reenvío.
+Mide la velocidad de recuperación; tests/test_store_forward.py comprueba que no se
+pierden ni duplican frases
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import wave
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from VBC_v225 import AudioSpool, EnergyVAD, RecognitionEngine, RecognitionEvent, SpoolForwarder  # noqa: E402
+from bench_audio_capture import write_fixture  # noqa: E402
+
+TICKS_PER_SECOND = 10_000_000
+
+
+class StandInStream:
+    """Flujo push de sustitución"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, data):
+        with self.condition:
+            self.data.extend(data)
+            self.condition.notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class StandInRecognizer(RecognitionEngine):
+    """Motor local: una frase por tramo de voz, a ``speed`` veces tiempo real
+
+    Con ``fail_after`` frases emite una cancelación por error, como un corte de red.
+    """
+
+    def __init__(self, stream, sample_rate, speed, fail_after=None):
+        super().__init__()
+        self.stream = stream
+        self.sample_rate = sample_rate
+        self.speed = speed
+        self.fail_after = fail_after
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        pass
+
+    def _run(self):
+        frame = self.sample_rate * 30 // 1000 * 2
+        vad = EnergyVAD()
+        position = 0
+        speech_start = None
+        emitted = 0
+        while True:
+            with self.stream.condition:
+                while len(self.stream.data) - position < frame and not self.stream.closed:
+                    self.stream.condition.wait()
+                if len(self.stream.data) - position < frame:
+                    break
+                chunk = bytes(self.stream.data[position:position + frame])
+            time.sleep(0.03 / self.speed)
+            speaking = vad.update(EnergyVAD.level_dbfs(np.frombuffer(chunk, dtype=np.int16)))
+            if speaking and speech_start is None:
+                speech_start = position
+            elif not speaking and speech_start is not None:
+                if self.fail_after is not None and emitted >= self.fail_after:
+                    self.emit(RecognitionEvent('canceled', reason='Error', error="conexión perdida"))
+                    return
+                offset = speech_start // 2 * TICKS_PER_SECOND // self.sample_rate
+                duration = (position - speech_start) // 2 * TICKS_PER_SECOND // self.sample_rate
+                emitted += 1
+                self.emit(RecognitionEvent('recognized', f"frase {offset // TICKS_PER_SECOND}", offset, duration))
+                speech_start = None
+            position += frame
+        self.emit(RecognitionEvent('session_stopped'))
+
+
+def spool_fixture(path, spool_path, sample_rate, captured_at):
+    """Escribir el WAV en el spool en bloques de 30 ms fechados desde ``captured_at``"""
+    with wave.open(path, 'rb') as wav:
+        frames = wav.readframes(wav.getnframes())
+    capacity = len(frames) + sample_rate * 2
+    spool = AudioSpool(spool_path, capacity, sample_rate)
+    block = sample_rate * 30 // 1000 * 2
+    for offset in range(0, len(frames), block):
+        spool.write(frames[offset:offset + block], offset // 2)
+        spool.chunk_times[-1] = captured_at + offset / 2 / sample_rate
+    return spool
+
+
+def forward(spool, sample_rate, speed, fail_after=None):
+    results = []
+
+    def make_recognizer():
+        stream = StandInStream()
+        return StandInRecognizer(stream, sample_rate, speed, fail_after), stream
+
+    forwarder = SpoolForwarder(spool, make_recognizer,
+                               lambda text, hypotheses, spoken_at: results.append((spoken_at, text)),
+                               caught_up=lambda: True, timeout=30)
+    ok = forwarder.run()
+    return ok, results
+
+
+def run(sample_rate, seconds, speed):
+    bursts = [(1.0 + 2.5 * i, 2.2 + 2.5 * i) for i in range(int((seconds - 1) // 2.5))]
+    captured_at = time.time() - seconds
+    with tempfile.TemporaryDirectory() as directory:
+        wav_path = os.path.join(directory, 'fixture.wav')
+        write_fixture(wav_path, sample_rate, seconds, bursts)
+
+        # Reenvío completo
+        spool = spool_fixture(wav_path, os.path.join(directory, 'spool_a.pcm'), sample_rate, captured_at)
+        start = time.perf_counter()
+        ok, results = forward(spool, sample_rate, speed)
+        elapsed = time.perf_counter() - start
+        spool.close()
+
+        # Reenvío cortado a mitad y reanudado desde la última frase confirmada
+        spool = spool_fixture(wav_path, os.path.join(directory, 'spool_b.pcm'), sample_rate, captured_at)
+        start = time.perf_counter()
+        _, first = forward(spool, sample_rate, speed, fail_after=len(bursts) // 2)
+        _, resumed = forward(spool, sample_rate, speed)
+        resume_elapsed = time.perf_counter() - start
+        spool.close()
+
+    times = [spoken_at for spoken_at, _ in results]
+    return {
+        'backlog_seconds': seconds,
+        'expected_phrases': len(bursts),
+        'forwarded_phrases': len(results),
+        'forward_ok': ok,
+        'max_timestamp_error_ms': max(abs(t - (captured_at + start)) for t, (start, _) in zip(times, bursts)) * 1000
+        if len(times) == len(bursts) else None,
+        'elapsed_s': elapsed,
+        'speedup_vs_realtime': seconds / elapsed,
+        'phrases_before_cut': len(first),
+        'phrases_after_resume': len(first) + len(resumed),
+        'resume_elapsed_s': resume_elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sample-rate', type=int, default=16000)
+    parser.add_argument('--seconds', type=float, default=60.0)
+    parser.add_argument('--speed', type=float, default=20.0, help="velocidad del reconocedor de sustitución")
+    args = parser.parse_args()
+
+    result = run(args.sample_rate, args.seconds, args.speed)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la síntesis de voz con caché (TTSCache + TTSPlayer)
+Sustituye Azure por un sintetizador simulado con latencia fija y el altavoz por
+un sumidero que consume el audio en tiempo real. Mide cuánto tarda en empezar a
+sonar una confirmación sin caché, desde el LRU en memoria y desde disco (con un
+reproductor nuevo, como tras reiniciar la aplicación), comprueba que ``say`` no
+bloquea, que la salida se abre una sola vez, que el anti-acoplamiento cubre toda
+la reproducción y su cola de eco (y decide por el intervalo en que se habló, no
+por cuándo llega el resultado), y que la caché distingue voces y respeta sus límites
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import wave
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from VBC_v225 import TTS_CONFIRMATIONS, TTS_OUTPUT_FORMAT, MetricsRegistry, TTSCache, TTSPlayer  # noqa: E402
+
+RATE = 16000
+
+
+def fake_wav(text, seconds_per_char):
+    """WAV de 16 kHz con un tono cuya duración depende del texto"""
+    frames = int(RATE * seconds_per_char * len(text))
+    pcm = bytearray()
+    for i in range(frames):
+        pcm += int(8000 * math.sin(2 * math.pi * 440 * i / RATE)).to_bytes(2, 'little', signed=True)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(bytes(pcm))
+    return buffer.getvalue()
+
+
+class FakeSynthesizer:
+    def __init__(self, latency, seconds_per_char):
+        self.latency = latency
+        self.seconds_per_char = seconds_per_char
+        self.calls = 0
+
+    def __call__(self, text, voice, fmt):
+        self.calls += 1
+        time.sleep(self.latency)
+        return fake_wav(text, self.seconds_per_char)
+
+
+class Probe:
+    """Fábrica de sumideros que anota cada reproducción y si la puerta estaba cerrada al escribir"""
+
+    def __init__(self):
+        self.player = None
+        self.opens = 0
+        self.closes = 0
+        self.starts = []
+        self.writes = 0
+        self.open_writes = 0
+        self.done = threading.Event()
+
+    def __call__(self, rate, channels):
+        self.opens += 1
+        return ProbeSink(self, rate * channels * 2)
+
+    def on_playing(self, playing):
+        if playing:
+            self.starts.append(time.perf_counter())
+        else:
+            self.done.set()
+
+
+class ProbeSink:
+    def __init__(self, probe, bytes_per_second):
+        self.probe = probe
+        self.bytes_per_second = bytes_per_second
+
+    def write(self, data):
+        self.probe.writes += 1
+        if not self.probe.player.gated():
+            self.probe.open_writes += 1
+        time.sleep(len(data) / self.bytes_per_second)
+
+    def close(self):
+        self.probe.closes += 1
+
+
+def make_player(directory, synthesizer, tail_ms, memory_clips=32):
+    probe = Probe()
+    player = TTSPlayer(synthesizer, TTSCache(directory, memory_clips=memory_clips), 'es-CO-SalomeNeural',
+                       TTS_OUTPUT_FORMAT, registry=MetricsRegistry(), tail_ms=tail_ms, sink_factory=probe,
+                       on_playing=probe.on_playing)
+    probe.player = player
+    return player.start(), probe
+
+
+def time_to_sound(player, probe, text):
+    """(ms hasta que empieza a sonar, µs que tarda ``say``)"""
+    probe.done.clear()
+    start = time.perf_counter()
+    player.say(text)
+    said = time.perf_counter()
+    probe.done.wait(10)
+    return (probe.starts[-1] - start) * 1000, (said - start) * 1e6
+
+
+def run(synth_latency, seconds_per_char, tail_ms, repeat):
+    text = TTS_CONFIRMATIONS['clear']
+    result = {}
+    with tempfile.TemporaryDirectory() as directory:
+        synthesizer = FakeSynthesizer(synth_latency, seconds_per_char)
+        player, probe = make_player(directory, synthesizer, tail_ms)
+        cold_ms, say_us = time_to_sound(player, probe, text)
+        time.sleep(tail_ms / 1000 / 2)
+        gated_in_tail = player.gated()
+        time.sleep(tail_ms / 1000)
+        open_after_tail = not player.gated()
+
+        memory_ms = []
+        say_times = [say_us]
+        for _ in range(repeat):
+            elapsed_ms, say_us = time_to_sound(player, probe, text)
+            memory_ms.append(elapsed_ms)
+            say_times.append(say_us)
+
+        # Resultados del micrófono del SDK, que llegan después de la reproducción
+        begin, end = player.played[-1]
+        echo = player.covers(begin + 0.02, end - 0.02)
+        # Dictado que empezó antes de la primera confirmación y terminó al empezar a sonar
+        begin, end = player.played[0]
+        dictation = player.covers(begin - 1.5, begin + 0.05)
+        player.stop()
+        stats_first = player.cache.stats()
+        first_opens, first_closes = probe.opens, probe.closes
+
+        # Reproductor nuevo sobre el mismo directorio: primer acierto desde disco
+        player, probe = make_player(directory, synthesizer, tail_ms)
+        disk_ms, _ = time_to_sound(player, probe, text)
+        other_voice = TTSCache(directory).get(text, 'es-ES-ElviraNeural', TTS_OUTPUT_FORMAT)
+        player.stop()
+        stats_disk = player.cache.stats()
+
+        # Límites: LRU de 4 clips y poda del disco a un presupuesto pequeño
+        bounded = TTSCache(os.path.join(directory, 'bounded'), memory_clips=4)
+        for index in range(10):
+            bounded.put(f"frase {index}", 'voz', TTS_OUTPUT_FORMAT, fake_wav(f"frase {index}", 0.001))
+        clip_bytes = os.path.getsize(bounded.path(bounded.key("frase 0", 'voz', TTS_OUTPUT_FORMAT)))
+        pruned = TTSCache(bounded.directory, disk_bytes=clip_bytes * 3).pruned
+
+        result.update({
+            'synth_latency_ms': synth_latency * 1000,
+            'clip_seconds': seconds_per_char * len(text),
+            'cold_start_ms': cold_ms,
+            'memory_start_ms': statistics.median(memory_ms),
+            'disk_start_ms': disk_ms,
+            'say_us_max': max(say_times),
+            'synth_calls': synthesizer.calls,
+            'cache_first_player': stats_first,
+            'cache_second_player': stats_disk,
+            'sink_opens': first_opens,
+            'sink_closed_on_stop': first_closes == first_opens,
+            'echo_gated': echo,
+            'dictation_kept': not dictation,
+            'writes': probe.writes,
+            'writes_ungated': probe.open_writes,
+            'gated_in_tail': gated_in_tail,
+            'open_after_tail': open_after_tail,
+            'other_voice_miss': other_voice is None,
+            'lru_clips': bounded.stats()['memory_clips'],
+            'pruned': pruned,
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--synth-latency', type=float, default=0.25, help="latencia simulada de Azure (s)")
+    parser.add_argument('--seconds-per-char', type=float, default=0.01)
+    parser.add_argument('--tail-ms', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    result = run(args.synth_latency, args.seconds_per_char, args.tail_ms, args.repeat)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    ok = (result['synth_calls'] == 1
+          and result['memory_start_ms'] < result['cold_start_ms'] / 5
+          and result['disk_start_ms'] < result['cold_start_ms'] / 5
+          and result['cache_second_player']['disk_hits'] == 1
+          and result['say_us_max'] < 1000
+          and result['writes'] and not result['writes_ungated']
+          and result['gated_in_tail'] and result['open_after_tail']
+          and result['sink_opens'] == 1 and result['sink_closed_on_stop']
+          and result['echo_gated'] and result['dictation_kept']
+          and result['other_voice_miss']
+          and result['lru_clips'] == 4 and result['pruned'] == 7)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
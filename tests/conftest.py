@@ -0,0 +1,21 @@
+"""
+Configuración común de las pruebas
+Las pruebas importan VBC_v225 desde la raíz del repositorio y reutilizan los
+generadores de datos sintéticos de benchmarks/ y el sustituto de tools/
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for directory in (ROOT, os.path.join(ROOT, 'benchmarks'), os.path.join(ROOT, 'tools')):
+    sys.path.insert(0, os.path.abspath(directory))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Cada prueba corre en un directorio temporal: nada se escribe en el repositorio"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
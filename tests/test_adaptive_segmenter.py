@@ -0,0 +1,36 @@
+"""
+Pruebas de AdaptiveSegmenter: pausas aprendidas del audio y palabras de fin de oración
+"""
+
+import pytest
+
+from VBC_v225 import AdaptiveSegmenter, RecognitionEvent
+
+
+def test_pauses_come_from_audio_spans_not_arrivals():
+    segmenter = AdaptiveSegmenter(min_samples=4)
+    start = 0.0
+    for _ in range(10):
+        # Frases de 3 s separadas por 0.5 s de silencio: llegan cada 3.5 s
+        evt = RecognitionEvent('recognized', 'frase', int(start * 1e7), int(3.0 * 1e7))
+        segmenter.observe(*evt.audio_span())
+        start += 3.5
+
+    assert list(segmenter.gaps) == pytest.approx([0.5] * 9)
+    assert segmenter.flush_delay('sin alteraciones') == pytest.approx(0.5 * 1.2)
+
+
+def test_restarted_recognizer_does_not_learn_a_negative_pause():
+    segmenter = AdaptiveSegmenter()
+    segmenter.observe(100.0, 102.0)
+    segmenter.observe(0.5, 2.0)
+    segmenter.observe(2.4, 4.0)
+    assert list(segmenter.gaps) == [pytest.approx(0.4)]
+
+
+def test_final_words_match_whole_words_only():
+    segmenter = AdaptiveSegmenter()
+    assert segmenter.flush_delay('dolor en el contrapunto') == segmenter.base_delay
+    assert segmenter.flush_delay('sin alteraciones punto') == segmenter.min_delay
+    assert segmenter.flush_delay('punto y aparte') == segmenter.min_delay
+    assert segmenter.flush_delay('abdomen blando punto final') == segmenter.min_delay
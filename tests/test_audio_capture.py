@@ -0,0 +1,56 @@
+"""
+Pruebas de la captura de audio propia (AudioCapture + EnergyVAD)
+"""
+
+import wave
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from VBC_v225 import AudioCapture, EnergyVAD, WavFileSource  # noqa: E402
+from bench_audio_capture import write_fixture  # noqa: E402
+
+SAMPLE_RATE = 16000
+SECONDS = 12.0
+BURSTS = [(1.0, 2.5), (4.0, 4.8), (6.0, 8.5), (10.0, 11.0)]
+
+
+@pytest.fixture
+def captured(tmp_path):
+    path = str(tmp_path / 'fixture.wav')
+    record_path = str(tmp_path / 'recorded.wav')
+    write_fixture(path, SAMPLE_RATE, SECONDS, BURSTS)
+    sent = bytearray()
+    vad = EnergyVAD()
+    capture = AudioCapture(WavFileSource(path), sent.extend, sample_rate=SAMPLE_RATE,
+                           vad=vad, record_path=record_path)
+    capture.start()
+    capture._thread.join()
+    capture.stop()
+    capture.source.close()
+    return capture, vad, sent, record_path
+
+
+def test_vad_detects_each_speech_segment(captured):
+    capture, _, _, _ = captured
+    onsets = [(start + capture.preroll_samples) / SAMPLE_RATE for start in capture.onsets_captured]
+    assert len(onsets) == len(BURSTS)
+    for onset, (start, _) in zip(onsets, BURSTS):
+        assert abs(onset - start) < 0.15
+
+
+def test_only_speech_is_sent_to_the_recognizer(captured):
+    _, vad, sent, _ = captured
+    speech = sum(end - start for start, end in BURSTS)
+    sent_seconds = len(sent) / 2 / SAMPLE_RATE
+    # Cada tramo enviado incluye pre-roll y cola de mantenimiento, pero nunca el silencio completo
+    assert speech <= sent_seconds < SECONDS - 2
+    assert 0 < vad.voiced_frames < vad.total_frames
+
+
+def test_recording_keeps_the_whole_session(captured):
+    _, _, _, record_path = captured
+    with wave.open(record_path, 'rb') as wav:
+        assert wav.getframerate() == SAMPLE_RATE
+        assert wav.getnframes() / SAMPLE_RATE == pytest.approx(SECONDS, abs=0.05)
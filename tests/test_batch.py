@@ -0,0 +1,59 @@
+"""
+Pruebas de la transcripción por lotes (run_batch) con el motor de reproducción
+"""
+
+import logging
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from VBC_v225 import main_batch, parse_args, run_batch  # noqa: E402
+from bench_batch import make_corpus, read_output  # noqa: E402
+
+FILES = 6
+PHRASES = 12
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    audio_dir = tmp_path / 'audio'
+    audio_dir.mkdir()
+    make_corpus(str(audio_dir), FILES, PHRASES)
+    return str(audio_dir)
+
+
+def transcribe(audio_dir, out, workers, **kwargs):
+    summary = run_batch(audio_dir, str(out), workers, 'replay', logger=logging.getLogger('test_batch'), **kwargs)
+    return summary, {record['file']: record['text'] for record in read_output(str(out))}
+
+
+def test_output_does_not_depend_on_worker_count(corpus, tmp_path):
+    serial, serial_text = transcribe(corpus, tmp_path / 'serial.jsonl', 1)
+    parallel, parallel_text = transcribe(corpus, tmp_path / 'parallel.jsonl', 3)
+    assert not serial['failed'] and not parallel['failed']
+    assert len(serial_text) == FILES
+    assert all(serial_text.values())
+    assert parallel_text == serial_text
+
+
+def test_resume_skips_finished_files_and_redoes_the_torn_line(corpus, tmp_path):
+    out = tmp_path / 'batch.jsonl'
+    transcribe(corpus, out, 2)
+    lines = out.read_text(encoding='utf-8').splitlines(keepends=True)
+    # Interrupción simulada: la mitad de los resultados y una línea a medio escribir
+    out.write_text("".join(lines[:FILES // 2]) + lines[FILES // 2][:20], encoding='utf-8')
+
+    resumed, _ = transcribe(corpus, out, 2, resume=True)
+    files = [record['file'] for record in read_output(str(out))]
+    assert resumed['skipped'] == FILES // 2
+    assert resumed['processed'] == FILES - FILES // 2
+    assert not resumed['failed']
+    assert sorted(files) == sorted(set(files)) and len(files) == FILES
+
+
+def test_missing_directory_is_reported_on_the_log_and_exit_code(tmp_path, caplog):
+    args = parse_args(['--batch', str(tmp_path / 'no_existe'), '--engine', 'replay'])
+    with caplog.at_level(logging.ERROR):
+        assert main_batch(args, logging.getLogger('test_batch')) == 2
+    assert 'no_existe' in caplog.text
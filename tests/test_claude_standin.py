@@ -0,0 +1,89 @@
+"""
+Pruebas del camino de Claude contra el sustituto local de la API
+"""
+
+import json
+
+import pytest
+
+requests = pytest.importorskip('requests')
+
+from VBC_v225 import ClaudeIntegration  # noqa: E402
+from anthropic_standin import StandInServer, count_tokens  # noqa: E402
+from bench_claude import run_load  # noqa: E402
+from bench_replay import dictionary_phrases  # noqa: E402
+
+CLIENT_TIMEOUT = 0.5
+
+
+def read_stream(base_url, text):
+    """Texto y tipos de evento de una respuesta SSE"""
+    payload = {'model': 'standin', 'max_tokens': 1024, 'stream': True,
+               'messages': [{'role': 'user', 'content': text}]}
+    response = requests.post(f"{base_url}/v1/messages", json=payload, stream=True, timeout=10,
+                             headers={'x-api-key': 'standin-key', 'anthropic-version': '2023-06-01'})
+    events, pieces = [], []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith('event: '):
+            events.append(line[7:])
+        elif line.startswith('data: '):
+            data = json.loads(line[6:])
+            if data['type'] == 'content_block_delta':
+                pieces.append(data['delta']['text'])
+    return "".join(pieces), events
+
+
+@pytest.fixture
+def standin():
+    servers = []
+
+    def start(**kwargs):
+        server = StandInServer(timeout_seconds=CLIENT_TIMEOUT * 4, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture(scope='module')
+def texts():
+    phrases = dictionary_phrases()
+    return [phrases[i % len(phrases)] for i in range(24)]
+
+
+@pytest.mark.parametrize('fault', ['429', '529', 'timeout'])
+def test_injected_fault_reaches_the_client_as_an_error(standin, fault):
+    server = standin()
+    claude = ClaudeIntegration('standin-key', base_url=server.base_url, timeout=CLIENT_TIMEOUT)
+    claude.session.headers['x-standin-fault'] = fault
+    with pytest.raises(Exception, match="Claude"):
+        claude.send_medical_text("carcinoma ductal infiltrante")
+    assert server.stats.to_dict()['faults'] == {fault: 1}
+
+
+def test_every_random_fault_is_one_client_error(standin, texts):
+    server = standin(latency='fixed:0.01', rate_429=0.2, rate_529=0.1, rate_timeout=0.1, seed=3)
+    _, summary = run_load(server, texts, 4, CLIENT_TIMEOUT)
+    injected = sum(server.stats.to_dict()['faults'].values())
+    assert injected
+    assert summary['errors'] == injected
+    assert summary['ok'] == len(texts) - injected
+
+
+def test_token_accounting_matches_the_replies(standin, texts):
+    server = standin()
+    results, summary = run_load(server, texts, 4, CLIENT_TIMEOUT * 10)
+    stats = server.stats.to_dict()
+    assert not summary['errors']
+    assert stats['input_tokens'] > 0
+    assert stats['output_tokens'] == sum(count_tokens(reply) for _, reply, _ in results)
+
+
+def test_stream_delivers_the_blocking_text(standin, texts):
+    server = standin()
+    blocking = ClaudeIntegration('standin-key', base_url=server.base_url).send_prompt("", texts[0])
+    streamed, events = read_stream(server.base_url, texts[0])
+    assert streamed == blocking
+    assert events[0] == 'message_start' and events[-1] == 'message_stop'
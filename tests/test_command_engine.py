@@ -0,0 +1,16 @@
+"""
+Pruebas de la gramática de órdenes de voz (CommandEngine)
+"""
+
+from VBC_v225 import CommandEngine
+
+
+def test_dictation_starting_with_plantilla_is_not_a_command():
+    engine = CommandEngine()
+    assert engine.match("plantilla de parafina con tinción habitual") is None
+    assert engine.match("claude plantilla gástrica") is None
+
+
+def test_template_command_still_matches():
+    match = CommandEngine().match("Claude consultar plantilla gástrica")
+    assert (match.action, match.payload) == ('template', "gástrica")
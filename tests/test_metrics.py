@@ -0,0 +1,42 @@
+"""
+Pruebas de la vista de diccionario de StatsCollector sobre el registro de métricas
+"""
+
+import threading
+
+import pytest
+
+from VBC_v225 import StatsCollector
+
+
+def test_counters_keep_supporting_in_place_increments():
+    collector = StatsCollector()
+    collector.stats['phrases_count'] += 1
+    collector.stats['claude_calls'] += 2
+    collector.update(phrase="sin alteraciones", claude_call=True)
+
+    assert collector.stats['phrases_count'] == 2
+    assert collector.stats['claude_calls'] == 3
+    with pytest.raises(ValueError):
+        collector.stats['phrases_count'] = 0
+    with pytest.raises(TypeError):
+        collector.stats['phrase_words'] = 1
+
+
+def test_update_and_direct_increments_share_the_metric_lock():
+    collector = StatsCollector()
+    counter = collector.metrics.get('phrases_count')
+
+    def worker():
+        for _ in range(2000):
+            collector.update(phrase="una frase")
+            counter.inc()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert collector.stats['phrases_count'] == 4 * 2000 * 2
+    assert collector.stats['words_count'] == 4 * 2000 * 2
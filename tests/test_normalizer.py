@@ -0,0 +1,22 @@
+"""
+Corpus de referencia del normalizador de formas habladas (config/normalizacion/golden_es.tsv)
+"""
+
+import os
+
+import pytest
+
+from VBC_v225 import NORMALIZATION_DIR, SpokenFormNormalizer
+from bench_normalizer import load_golden
+
+GOLDEN = load_golden(os.path.join(NORMALIZATION_DIR, "golden_es.tsv"))
+
+
+@pytest.fixture(scope='module')
+def normalizer():
+    return SpokenFormNormalizer('es')
+
+
+@pytest.mark.parametrize('spoken, written', GOLDEN, ids=[spoken for spoken, _ in GOLDEN])
+def test_golden_phrase(normalizer, spoken, written):
+    assert normalizer.normalize(spoken) == written
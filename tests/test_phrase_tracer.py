@@ -0,0 +1,28 @@
+"""
+Pruebas de los percentiles por etapa de PhraseTracer
+"""
+
+import pytest
+
+from VBC_v225 import PhraseTracer
+
+
+def test_percentiles_come_from_running_histograms():
+    tracer = PhraseTracer(capacity=10)
+    for index in range(1, 1001):
+        tracer.span(index, 'correct', 0, index * 1000)  # 0.001 .. 1 ms
+    n, p50, p95, p99 = tracer.percentiles()['correct']
+    # El deque solo guarda los últimos spans; el histograma los cuenta todos
+    assert len(tracer.spans) == 10
+    assert n == 1000
+    assert p50 == pytest.approx(0.5, rel=0.25)
+    assert p95 == pytest.approx(0.95, rel=0.25)
+    assert p99 == pytest.approx(0.99, rel=0.25)
+    assert tracer.quantile('correct', 0.95) == p95
+
+
+def test_instant_spans_and_unknown_stages_have_no_percentiles():
+    tracer = PhraseTracer()
+    tracer.received(1, 5)
+    assert tracer.percentiles() == {}
+    assert tracer.quantile('end_to_end', 0.95) is None
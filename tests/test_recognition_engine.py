@@ -0,0 +1,72 @@
+"""
+Pruebas de la interfaz de motores de reconocimiento
+"""
+
+import json
+
+import pytest
+
+from VBC_v225 import RecognitionEngine, RecognitionEvent, ReplayRecognitionEngine
+
+
+class ListEngine(RecognitionEngine):
+    """Motor mínimo que emite una lista de eventos al arrancar"""
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    def start(self):
+        for evt in self.events:
+            self.emit(evt)
+
+    def stop(self):
+        pass
+
+
+def test_engine_without_start_and_stop_cannot_be_instantiated():
+    class Incomplete(RecognitionEngine):
+        def start(self):
+            pass
+
+    with pytest.raises(TypeError):
+        RecognitionEngine()
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_events_reach_handlers_until_disconnected():
+    engine = ListEngine([RecognitionEvent('recognized', "pleomorfismo nuclear")])
+    texts = []
+    engine.recognized.connect(lambda evt: texts.append(evt.text))
+    engine.start()
+    engine.disconnect_all()
+    engine.start()
+    assert texts == ["pleomorfismo nuclear"]
+
+
+def play(path, speed):
+    """Todos los eventos que emite una reproducción de la traza, en orden"""
+    engine = ReplayRecognitionEngine(path, speed)
+    events = []
+    for event in engine.EVENTS:
+        getattr(engine, event).connect(lambda evt: events.append(evt.to_dict()))
+    engine.start()
+    assert engine.wait(timeout=10)
+    return events
+
+
+def test_replay_delivers_the_same_sequence_at_any_speed(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    trace = [{'t': 0.0, 'event': 'session_started'}]
+    for index in range(20):
+        t = 0.02 * index
+        offset = index * 2 * 10 ** 7
+        trace.append({'t': t, 'event': 'recognizing', 'text': f"frase {index}", 'offset': offset})
+        trace.append({'t': t + 0.01, 'event': 'recognized', 'text': f"frase {index} completa",
+                      'offset': offset, 'duration': 15 * 10 ** 6})
+    path.write_text("".join(json.dumps(event) + "\n" for event in trace), encoding='utf-8')
+
+    instant = play(str(path), 0)
+    assert len(instant) == len(trace) + 1  # session_stopped al terminar
+    assert play(str(path), 10) == instant
@@ -0,0 +1,30 @@
+"""
+Pruebas de la importación de exportaciones .txt al archivo de sesiones
+"""
+
+import threading
+
+from VBC_v225 import SessionArchive
+
+
+def test_import_runs_off_the_calling_thread_with_progress(tmp_path):
+    exports = tmp_path / 'exports'
+    exports.mkdir()
+    for index in range(3):
+        (exports / f'sesion{index}.txt').write_text(
+            f"[10:00:0{index}] biopsia gástrica número {index}\n", encoding='utf-8')
+    archive = SessionArchive(str(tmp_path / 'archive.sqlite3'))
+    progress = []
+    result = []
+
+    # Como SearchWindow.import_exports: el trabajo va en un hilo y el progreso se reporta
+    worker = threading.Thread(target=lambda: result.append(archive.import_directory(
+        str(exports), progress=lambda done, total: progress.append((done, total)))))
+    worker.start()
+    worker.join(timeout=10)
+    try:
+        assert result == [(3, 3)]
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+        assert archive.search("gástrica")
+    finally:
+        archive.close()
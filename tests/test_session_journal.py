@@ -0,0 +1,122 @@
+"""
+Pruebas de la búsqueda y la poda de diarios de sesión (SessionJournal)
+"""
+
+import itertools
+import json
+import logging
+import os
+import time
+from types import SimpleNamespace
+
+import VBC_v225
+from VBC_v225 import (PhraseTracer, PipelineItem, SessionJournal, TranscriptModel, TranscriptSegment,
+                      VoiceBridge224)
+
+
+def write_journal(directory, stamp, types, tail=b"", age_days=0):
+    path = os.path.join(str(directory), f"journal_{stamp}.jsonl")
+    with open(path, 'wb') as f:
+        for kind in types:
+            f.write(json.dumps({'type': kind, 't': 0}).encode('utf-8') + b"\n")
+        f.write(tail)
+    if age_days:
+        old = time.time() - age_days * 86400
+        os.utime(path, (old, old))
+    return path
+
+
+def test_newest_interrupted_journal_is_found(tmp_path):
+    write_journal(tmp_path, '20250101_080000', ['session_start', 'session_end'])
+    newest = write_journal(tmp_path, '20250102_080000', ['session_start', 'recognized'],
+                           tail=b'{"type":"flushed","seg')
+    assert SessionJournal.find_unfinished(str(tmp_path)) == newest
+    assert SessionJournal.last_record(newest)['type'] == 'recognized'
+
+
+def test_search_stops_at_the_first_finished_journal(tmp_path):
+    write_journal(tmp_path, '20250101_080000', ['session_start', 'recognized'])
+    write_journal(tmp_path, '20250102_080000', ['session_start', 'session_end'])
+    write_journal(tmp_path, '20250103_080000', [])
+    assert SessionJournal.find_unfinished(str(tmp_path)) is None
+
+
+def test_last_record_reads_past_the_tail_block(tmp_path):
+    path = write_journal(tmp_path, '20250101_080000', ['session_start'] * 50 + ['session_end'])
+    assert SessionJournal.last_record(path, block=16)['type'] == 'session_end'
+
+
+def test_prune_removes_only_old_finished_journals(tmp_path):
+    old_finished = write_journal(tmp_path, '20250101_080000', ['session_start', 'session_end'], age_days=40)
+    old_unfinished = write_journal(tmp_path, '20250102_080000', ['session_start'], age_days=40)
+    recent = write_journal(tmp_path, '20250103_080000', ['session_start', 'session_end'], age_days=2)
+    newest = write_journal(tmp_path, '20250104_080000', ['session_start', 'session_end'], age_days=40)
+
+    assert SessionJournal.prune(str(tmp_path), keep_days=0) == 0
+    assert SessionJournal.prune(str(tmp_path), keep_days=30) == 1
+    assert not os.path.exists(old_finished)
+    assert all(os.path.exists(path) for path in (old_unfinished, recent, newest))
+
+
+class RecoveryHost:
+    """Lo que ``open_journal`` usa de VoiceBridge224, sin Tk"""
+
+    open_journal = VoiceBridge224.open_journal
+    add_segment = VoiceBridge224.add_segment
+    set_session_name = VoiceBridge224.set_session_name
+
+    def __init__(self, directory):
+        self.config = {'journal_commit_interval': 0.01}
+        self.logger = logging.getLogger('test_session_journal')
+        self.transcript = TranscriptModel(spill_dir=str(directory))
+        self.ui = SimpleNamespace(call=lambda *args: None, append=lambda *args: None)
+        self.transcript_view = SimpleNamespace(show_tail=None)
+        self.archive = None
+        self.journal = None
+        self.tracer = PhraseTracer(enabled=False)
+        self.transcription_count = 0
+
+    def log_to_gui(self, message):
+        pass
+
+    def recognize(self, text):
+        item = PipelineItem(text)
+        self.journal.record('recognized', phrase_id=item.phrase_id, text=text)
+        return item.phrase_id
+
+    def crash(self):
+        self.journal.close(clean=False)
+        self.transcript.close()
+
+
+def start_process(monkeypatch, directory):
+    """Proceso nuevo: el contador de frases vuelve a empezar"""
+    monkeypatch.setattr(VBC_v225, '_phrase_ids', itertools.count(1))
+    host = RecoveryHost(directory)
+    host.open_journal()
+    return host
+
+
+def test_second_crash_does_not_bring_back_recovered_phrases(tmp_path, monkeypatch):
+    host = start_process(monkeypatch, tmp_path)
+    first_ids = [host.recognize("uno"), host.recognize("dos")]
+    host.crash()
+
+    # Primera recuperación: las frases pendientes vuelven como un segmento
+    host = start_process(monkeypatch, tmp_path)
+    assert [segment.corrected_text for segment in host.transcript.range(0, 10)] == ["uno dos"]
+    tres = host.recognize("tres")
+    assert tres > max(first_ids)
+    host.add_segment(TranscriptSegment("tres", "tres", phrase_ids=[tres]))
+    cuatro = host.recognize("cuatro")
+    host.crash()
+
+    segments, pending, _, last_phrase_id = SessionJournal.replay(SessionJournal.find_unfinished())
+    assert [segment.corrected_text for segment in segments] == ["uno dos", "tres"]
+    assert pending == {cuatro: "cuatro"}
+    assert last_phrase_id == cuatro
+
+    host = start_process(monkeypatch, tmp_path)
+    texts = [segment.corrected_text for segment in host.transcript.range(0, 10)]
+    host.crash()
+    assert texts == ["uno dos", "tres", "cuatro"]
@@ -0,0 +1,134 @@
+"""
+Pruebas del modo store-and-forward (AudioSpool + SpoolForwarder)
+"""
+
+import logging
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from VBC_v225 import SpoolForwarder, VoiceBridge224  # noqa: E402
+from bench_audio_capture import write_fixture  # noqa: E402
+from bench_store_forward import StandInRecognizer, StandInStream, forward, spool_fixture  # noqa: E402
+
+SAMPLE_RATE = 16000
+SECONDS = 20.0
+SPEED = 100.0
+BURSTS = [(1.0 + 2.5 * i, 2.2 + 2.5 * i) for i in range(int((SECONDS - 1) // 2.5))]
+
+
+@pytest.fixture
+def backlog(tmp_path):
+    """Fabrica spools con el mismo dictado, capturado hace ``SECONDS`` segundos"""
+    wav_path = str(tmp_path / 'fixture.wav')
+    write_fixture(wav_path, SAMPLE_RATE, SECONDS, BURSTS)
+    captured_at = time.time() - SECONDS
+    spools = []
+
+    def make(name):
+        spool = spool_fixture(wav_path, str(tmp_path / name), SAMPLE_RATE, captured_at)
+        spools.append(spool)
+        return spool
+
+    make.captured_at = captured_at
+    yield make
+    for spool in spools:
+        spool.close()
+
+
+def test_forward_delivers_every_phrase_in_capture_order(backlog):
+    ok, results = forward(backlog('spool.pcm'), SAMPLE_RATE, SPEED)
+    assert ok
+    times = [spoken_at for spoken_at, _ in results]
+    assert len(times) == len(BURSTS)
+    assert times == sorted(times)
+    for spoken_at, (start, _) in zip(times, BURSTS):
+        assert spoken_at == pytest.approx(backlog.captured_at + start, abs=0.1)
+
+
+def test_resume_after_a_cut_neither_loses_nor_duplicates(backlog):
+    spool = backlog('spool.pcm')
+    first_ok, first = forward(spool, SAMPLE_RATE, SPEED, fail_after=len(BURSTS) // 2)
+    assert not first_ok
+    assert len(first) == len(BURSTS) // 2
+
+    resumed_ok, resumed = forward(spool, SAMPLE_RATE, SPEED)
+    assert resumed_ok
+    # Las frases se identifican por su hora de captura (el texto del sustituto es relativo al flujo)
+    recovered = [round(spoken_at, 1) for spoken_at, _ in first + resumed]
+    assert len(recovered) == len(set(recovered)) == len(BURSTS)
+    assert recovered == sorted(recovered)
+
+
+class ForwardingHost:
+    """Lo que ``_run_forwarder`` usa de VoiceBridge224, sin Tk ni Azure"""
+
+    _run_forwarder = VoiceBridge224._run_forwarder
+    release_held_results = VoiceBridge224.release_held_results
+
+    def __init__(self, spool):
+        self.logger = logging.getLogger('test_store_forward')
+        self.forward_lock = threading.Lock()
+        self.spool = spool
+        self.spool_receiving = True
+        self.recognizer_down = False
+        self.forwarding = True
+        self.hold_live = True
+        self.held_results = []
+        self.redirects = []
+        self.audio_capture = SimpleNamespace(redirect=lambda sink, new_stream=False: self.redirects.append(sink))
+        self.scheduled = []
+        self.root = SimpleNamespace(after=None)
+        self.ui = SimpleNamespace(call=lambda func, *args: self.scheduled.append(args))
+        self.processed = []
+
+    def log_to_gui(self, message):
+        pass
+
+    def restart_recognition(self):
+        pass
+
+    def process_recognized_text(self, text, hypotheses=None, spoken_at=None, audio_span=None):
+        self.processed.append(spoken_at)
+
+    def forward(self, fail_after=None):
+        """Un reenvío como el de ``reconnect_with_backlog`` con el reconocedor de sustitución"""
+        def caught_up():
+            if self.spool_receiving and not self.recognizer_down:
+                self.audio_capture.redirect('live')
+                self.spool_receiving = False
+            return True
+
+        def make_recognizer():
+            stream = StandInStream()
+            return StandInRecognizer(stream, SAMPLE_RATE, SPEED, fail_after), stream
+
+        with self.forward_lock:
+            self.forwarding = True
+            self.hold_live = True
+        self._run_forwarder(SpoolForwarder(self.spool, make_recognizer, self.process_recognized_text, caught_up,
+                                           timeout=30))
+
+
+def test_failed_forward_keeps_live_results_behind_the_backlog(backlog):
+    host = ForwardingHost(backlog('spool.pcm'))
+    host.forward(fail_after=len(BURSTS) // 2)
+
+    # El fallo llegó después de pasar la captura al reconocedor en vivo, que sigue funcionando
+    assert host.redirects == ['live']
+    assert host.spool is not None and host.hold_live
+    assert len(host.scheduled) == 1
+    live_at = time.time()
+    host.held_results.append(("frase en vivo", None, live_at, None))
+    assert len(host.processed) == len(BURSTS) // 2
+
+    host.forward()
+    assert host.redirects == ['live']
+    assert host.spool is None and not host.hold_live
+    assert len(host.processed) == len(BURSTS) + 1
+    assert host.processed == sorted(host.processed)
+    assert host.processed[-1] == live_at
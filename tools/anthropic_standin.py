@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Sustituto local de la API de Anthropic para pruebas de carga y de fallos
+Implementa POST /v1/messages (respuesta completa y streaming SSE) con latencias
+guionizadas, inyección de errores 429/529 y de timeouts, y contabilidad de tokens.
+GET /stats devuelve los contadores en JSON y POST /stats/reset los pone a cero.
+
+    python tools/anthropic_standin.py --port 8765 --latency lognormal:1.5,0.5 --rate-429 0.05
+    # en voice_bridge_config.json: "claude_base_url": "http://127.0.0.1:8765"
+
+Distribuciones de latencia (segundos): ``fixed:S``, ``uniform:A,B``,
+``lognormal:MEDIANA,SIGMA`` y ``trace:ARCHIVO`` (una latencia por línea, en bucle).
+La cabecera ``x-standin-fault`` (429, 529 o timeout) fuerza un fallo en una petición.
+"""
+
+import argparse
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ERROR_TYPES = {
+    400: 'invalid_request_error',
+    401: 'authentication_error',
+    429: 'rate_limit_error',
+    529: 'overloaded_error',
+}
+_WORD_RE = re.compile(r'\w+|[^\w\s]')
+
+
+def count_tokens(text):
+    """Estimación de tokens: palabras y signos (suficiente para contabilidad relativa)"""
+    return len(_WORD_RE.findall(text))
+
+
+class LatencyModel:
+    """Distribución de latencia guionizada a partir de una especificación ``tipo:parámetros``"""
+
+    def __init__(self, spec, seed=0):
+        self.spec = spec
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        if kind == 'trace':
+            with open(params, 'r', encoding='utf-8') as f:
+                values = [float(line) for line in f if line.strip()]
+            self._trace = itertools.cycle(values)
+        else:
+            self.params = [float(value) for value in params.split(',')] if params else []
+            if kind not in ('fixed', 'uniform', 'lognormal'):
+                raise ValueError(f"distribución desconocida: {spec}")
+
+    def sample(self):
+        with self._lock:
+            if self.kind == 'trace':
+                return next(self._trace)
+            if self.kind == 'fixed':
+                return self.params[0] if self.params else 0.0
+            if self.kind == 'uniform':
+                return self.rng.uniform(*self.params)
+            median, sigma = self.params
+            return median * math.exp(self.rng.gauss(0.0, sigma))
+
+
+class StandInStats:
+    """Contadores del sustituto (seguros entre hilos)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.streamed = 0
+            self.by_status = {}
+            self.faults = {}
+            self.input_tokens = 0
+            self.output_tokens = 0
+            self.active = 0
+            self.max_concurrency = 0
+            self.latencies = []
+
+    def begin(self):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.max_concurrency = max(self.max_concurrency, self.active)
+
+    def fault(self, fault):
+        with self._lock:
+            self.faults[fault] = self.faults.get(fault, 0) + 1
+
+    def end(self, status, latency=None, input_tokens=0, output_tokens=0, streamed=False):
+        with self._lock:
+            self.active -= 1
+            self.by_status[str(status)] = self.by_status.get(str(status), 0) + 1
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.streamed += streamed
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def to_dict(self):
+        with self._lock:
+            values = sorted(self.latencies)
+
+            def percentile(q):
+                if not values:
+                    return None
+                return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+            return {
+                'requests': self.requests,
+                'streamed': self.streamed,
+                'by_status': dict(self.by_status),
+                'faults': dict(self.faults),
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+                'active': self.active,
+                'max_concurrency': self.max_concurrency,
+                'latency_s': {'p50': percentile(0.50), 'p95': percentile(0.95),
+                              'p99': percentile(0.99)},
+            }
+
+
+class StandInServer:
+    """Servidor /v1/messages en un hilo propio; ``port=0`` elige un puerto libre"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency='fixed:0', first_token='fixed:0',
+                 token_rate=0.0, rate_429=0.0, rate_529=0.0, rate_timeout=0.0, timeout_seconds=60.0,
+                 retry_after=1, seed=0, require_key=True):
+        self.latency = LatencyModel(latency, seed)
+        self.first_token = LatencyModel(first_token, seed + 1)
+        self.token_rate = token_rate
+        self.rate_429 = rate_429
+        self.rate_529 = rate_529
+        self.rate_timeout = rate_timeout
+        self.timeout_seconds = timeout_seconds
+        self.retry_after = retry_after
+        self.require_key = require_key
+        self.stats = StandInStats()
+        self.rng = random.Random(seed + 2)
+        self._rng_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._closing = threading.Event()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='anthropic-standin',
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        # Las peticiones colgadas (timeout inyectado) se liberan al cerrar
+        self._closing.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def pick_fault(self, forced):
+        """None, '429', '529' o 'timeout' según las tasas configuradas o la cabecera"""
+        if forced:
+            return forced
+        with self._rng_lock:
+            draw = self.rng.random()
+        rates = (('429', self.rate_429), ('529', self.rate_529), ('timeout', self.rate_timeout))
+        for fault, rate in rates:
+            if draw < rate:
+                return fault
+            draw -= rate
+        return None
+
+    def reply_text(self, payload):
+        """Respuesta determinista: eco resumido del último mensaje del usuario"""
+        content = ''
+        for message in payload.get('messages', []):
+            if message.get('role') == 'user':
+                content = message.get('content', '')
+        if isinstance(content, list):
+            content = " ".join(block.get('text', '') for block in content
+                               if isinstance(block, dict))
+        words = content.split()
+        limit = max(1, int(payload.get('max_tokens', 1024)))
+        return " ".join(["Análisis:"] + words)[:limit * 6] if words else "OK"
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, status, body, headers=()):
+                data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.send_header('request-id', f"req_standin_{next(server._ids)}")
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _error(self, status, message, headers=()):
+                error = {'type': ERROR_TYPES.get(status, 'api_error'), 'message': message}
+                self._json(status, {'type': 'error', 'error': error}, headers)
+
+            def do_GET(self):
+                if self.path == '/stats':
+                    self._json(200, server.stats.to_dict())
+                else:
+                    self._error(404, f"ruta desconocida: {self.path}")
+
+            def do_POST(self):
+                if self.path == '/stats/reset':
+                    server.stats.reset()
+                    self._json(200, {'reset': True})
+                    return
+                if self.path.split('?')[0] != '/v1/messages':
+                    self._error(404, f"ruta desconocida: {self.path}")
+                    return
+
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    payload = json.loads(self.rfile.read(length) or b'{}')
+                except ValueError:
+                    self._error(400, "JSON inválido")
+                    return
+                if server.require_key and not self.headers.get('x-api-key'):
+                    self._error(401, "falta x-api-key")
+                    return
+                if not payload.get('messages') or 'max_tokens' not in payload:
+                    self._error(400, "messages y max_tokens son obligatorios")
+                    return
+
+                server.stats.begin()
+                start = time.perf_counter()
+                fault = server.pick_fault(self.headers.get('x-standin-fault'))
+                if fault:
+                    server.stats.fault(fault)
+                if fault == 'timeout':
+                    # Sin respuesta: el cliente agota su timeout
+                    server._closing.wait(server.timeout_seconds)
+                    server.stats.end(0)
+                    self.close_connection = True
+                    return
+                if fault in ('429', '529'):
+                    status = int(fault)
+                    headers = [('retry-after', str(server.retry_after))] if status == 429 else []
+                    message = "límite de peticiones" if status == 429 else "sobrecargado"
+                    self._error(status, message, headers)
+                    server.stats.end(status)
+                    return
+
+                system = payload.get('system', '')
+                if isinstance(system, list):
+                    system = " ".join(block.get('text', '') for block in system
+                                      if isinstance(block, dict))
+                prompt = system + " " + json.dumps(payload.get('messages'), ensure_ascii=False)
+                input_tokens = count_tokens(prompt)
+                text = server.reply_text(payload)
+                output_tokens = count_tokens(text)
+                message_id = f"msg_standin_{next(server._ids)}"
+
+                if payload.get('stream'):
+                    self._stream(payload, message_id, text, input_tokens, output_tokens)
+                    server.stats.end(200, time.perf_counter() - start, input_tokens, output_tokens,
+                                     streamed=True)
+                    return
+
+                time.sleep(server.latency.sample())
+                self._json(200, {
+                    'id': message_id,
+                    'type': 'message',
+                    'role': 'assistant',
+                    'model': payload.get('model', 'standin'),
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn',
+                    'stop_sequence': None,
+                    'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens},
+                })
+                server.stats.end(200, time.perf_counter() - start, input_tokens, output_tokens)
+
+            def _stream(self, payload, message_id, text, input_tokens, output_tokens):
+                """Eventos SSE en el orden de la API: message_start … message_stop"""
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+
+                def event(name, data):
+                    body = json.dumps(data, ensure_ascii=False)
+                    self.wfile.write(f"event: {name}\ndata: {body}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+
+                time.sleep(server.first_token.sample())
+                event('message_start', {'type': 'message_start', 'message': {
+                    'id': message_id, 'type': 'message', 'role': 'assistant',
+                    'model': payload.get('model', 'standin'), 'content': [], 'stop_reason': None,
+                    'usage': {'input_tokens': input_tokens, 'output_tokens': 0}}})
+                event('content_block_start', {'type': 'content_block_start', 'index': 0,
+                                              'content_block': {'type': 'text', 'text': ''}})
+                event('ping', {'type': 'ping'})
+                delay = 1.0 / server.token_rate if server.token_rate else 0.0
+                for piece in re.findall(r'\S+\s*', text):
+                    if delay:
+                        time.sleep(delay)
+                    event('content_block_delta', {'type': 'content_block_delta', 'index': 0,
+                                                  'delta': {'type': 'text_delta', 'text': piece}})
+                event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+                event('message_delta', {'type': 'message_delta',
+                                        'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                        'usage': {'output_tokens': output_tokens}})
+                event('message_stop', {'type': 'message_stop'})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:1.5,0.5',
+                        help="latencia de la respuesta completa")
+    parser.add_argument('--first-token', default='lognormal:0.6,0.4',
+                        help="latencia hasta el primer evento SSE")
+    parser.add_argument('--token-rate', type=float, default=50.0,
+                        help="tokens por segundo en streaming")
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-529', type=float, default=0.0)
+    parser.add_argument('--rate-timeout', type=float, default=0.0)
+    parser.add_argument('--timeout-seconds', type=float, default=60.0,
+                        help="cuánto cuelga un timeout inyectado")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = StandInServer(args.host, args.port, args.latency, args.first_token, args.token_rate,
+                           args.rate_429, args.rate_529, args.rate_timeout, args.timeout_seconds,
+                           seed=args.seed)
+    print(f"Sustituto de Anthropic en {server.base_url}/v1/messages (estadísticas en /stats)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.stats.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()